@@ -0,0 +1,302 @@
+"""
+Métricas da aplicação no formato texto do Prometheus (GET /metrics)
+
+Tudo em memória, no próprio processo:
+  - MiddlewareMetricas (ASGI puro) mede cada requisição por método, rota
+    (o template, ex: /clientes/{cliente_id}) e status, e conta as em andamento;
+  - OuvinteComandos (CommandListener do pymongo) mede os comandos do MongoDB
+    por comando e coleção;
+  - OuvintePool (ConnectionPoolListener) mede a espera por uma conexão do pool.
+Os ouvintes são registrados no cliente em connect_to_mongo. Com vários
+workers, cada processo tem as suas métricas: cada coleta do /metrics
+responde pelo worker que a atendeu.
+
+MiddlewareMetricas também registra no log (logger "app", configurado por
+configurar_logs) as requisições lentas e as que terminam em erro, com os
+campos estruturados em extra={"campos": {...}}.
+"""
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Sequence, Tuple
+
+from pymongo import monitoring
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE_METRICAS = "text/plain; version=0.0.4; charset=utf-8"
+
+# Limites dos buckets em segundos
+LIMITES_PADRAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Rótulo de rota para requisições que não casaram com nenhuma rota (evita
+# uma série por URL inventada)
+ROTA_DESCONHECIDA = "desconhecida"
+
+
+class FormatadorEstruturado(logging.Formatter):
+    """Mensagem seguida dos campos estruturados do registro, como chave=valor (JSON)"""
+
+    def formatMessage(self, registro: logging.LogRecord) -> str:
+        # Antes do traceback, quando houver
+        texto = super().formatMessage(registro)
+        campos = getattr(registro, "campos", None)
+        if campos:
+            texto += " " + " ".join(
+                f"{chave}={json.dumps(valor, ensure_ascii=False, default=str)}"
+                for chave, valor in campos.items()
+            )
+        return texto
+
+
+def configurar_logs():
+    """Handler do logger "app" (chamado uma vez, ao importar a aplicação)"""
+    raiz = logging.getLogger("app")
+    if raiz.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(FormatadorEstruturado("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    raiz.addHandler(handler)
+    raiz.setLevel(logging.DEBUG if settings.DEBUG else logging.INFO)
+    raiz.propagate = False
+
+
+def _rotulos(nomes: Sequence[str], valores: Sequence[str]) -> str:
+    pares = []
+    for nome, valor in zip(nomes, valores):
+        valor = str(valor).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pares.append(f'{nome}="{valor}"')
+    return ",".join(pares)
+
+
+class Histograma:
+    """Histograma com rótulos; observar é seguro entre threads (ouvintes do pymongo)"""
+
+    def __init__(self, nome: str, descricao: str, rotulos: Sequence[str], limites: Sequence[float] = LIMITES_PADRAO):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.limites = tuple(limites)
+        # valores dos rótulos -> [contagens por bucket (+Inf no fim), soma]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._trava = threading.Lock()
+
+    def observar(self, valores: Tuple[str, ...], segundos: float):
+        indice = bisect_left(self.limites, segundos)
+        with self._trava:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * (len(self.limites) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += segundos
+
+    def exportar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        with self._trava:
+            series = [(valores, list(contagens), soma) for valores, (contagens, soma) in self._series.items()]
+        for valores, contagens, soma in sorted(series):
+            rotulos = _rotulos(self.rotulos, valores)
+            separador = "," if rotulos else ""
+            acumulado = 0
+            for limite, contagem in zip(self.limites + (float("inf"),), contagens):
+                acumulado += contagem
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                linhas.append(f'{self.nome}_bucket{{{rotulos}{separador}le="{le}"}} {acumulado}')
+            linhas.append(f"{self.nome}_sum{{{rotulos}}} {soma}")
+            linhas.append(f"{self.nome}_count{{{rotulos}}} {acumulado}")
+        return linhas
+
+
+class Medidor:
+    """Valor instantâneo (gauge), alterado só no event loop"""
+
+    def __init__(self, nome: str, descricao: str):
+        self.nome = nome
+        self.descricao = descricao
+        self.valor = 0
+
+    def exportar(self) -> List[str]:
+        return [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} gauge", f"{self.nome} {self.valor}"]
+
+
+duracao_requisicoes = Histograma(
+    "fluxor_requisicoes_duracao_segundos",
+    "Duração das requisições HTTP por método, rota e status",
+    ("metodo", "rota", "status"),
+)
+requisicoes_em_andamento = Medidor(
+    "fluxor_requisicoes_em_andamento",
+    "Requisições HTTP sendo atendidas",
+)
+duracao_comandos_mongo = Histograma(
+    "fluxor_mongo_comandos_duracao_segundos",
+    "Duração dos comandos do MongoDB por comando e coleção",
+    ("comando", "colecao"),
+)
+espera_pool_mongo = Histograma(
+    "fluxor_mongo_pool_espera_segundos",
+    "Espera por uma conexão do pool do MongoDB",
+    ("resultado",),
+    limites=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+class MiddlewareMetricas:
+    """Mede duração e status de cada requisição HTTP"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        requisicoes_em_andamento.valor += 1
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            await self.app(scope, receive, enviar)
+        except Exception as e:
+            erro = e
+            raise
+        finally:
+            requisicoes_em_andamento.valor -= 1
+            duracao = time.perf_counter() - inicio
+            # O roteador do FastAPI grava a rota escolhida no scope
+            rota = getattr(scope.get("route"), "path", ROTA_DESCONHECIDA)
+            duracao_requisicoes.observar((scope["method"], rota, str(status)), duracao)
+            _registrar_no_log(scope["method"], rota, status, duracao, erro)
+
+
+def _registrar_no_log(metodo: str, rota: str, status: int, duracao: float, erro: Exception = None):
+    """Requisições com erro (5xx ou exceção) e lentas no log estruturado"""
+    duracao_ms = duracao * 1000
+    if erro is None and status < 500 and duracao_ms <= settings.MONITORAMENTO_REQUISICAO_LENTA_MS:
+        return
+    campos = {"metodo": metodo, "rota": rota, "status": status, "duracao_ms": round(duracao_ms, 1)}
+    if erro is not None:
+        logger.error("Exceção na requisição", exc_info=erro, extra={"campos": campos})
+    elif status >= 500:
+        logger.error("Erro na requisição", extra={"campos": campos})
+    else:
+        logger.warning("Requisição lenta", extra={"campos": campos})
+
+
+def colecao_do_comando(nome: str, comando: dict) -> str:
+    """Coleção alvo de um comando do MongoDB ('' para comandos sem coleção)"""
+    if nome == "getMore":
+        return comando.get("collection", "")
+    alvo = comando.get(nome)
+    return alvo if isinstance(alvo, str) else ""
+
+
+class OuvinteComandos(monitoring.CommandListener):
+    """Mede cada comando do MongoDB (executado nas threads do Motor)"""
+
+    def __init__(self):
+        # (conexão, request_id) -> coleção, do início até o fim do comando
+        self._colecoes: Dict[Tuple[Any, int], str] = {}
+
+    def started(self, evento: monitoring.CommandStartedEvent):
+        self._colecoes[(evento.connection_id, evento.request_id)] = colecao_do_comando(
+            evento.command_name, evento.command
+        )
+
+    def succeeded(self, evento: monitoring.CommandSucceededEvent):
+        self._registrar(evento)
+
+    def failed(self, evento: monitoring.CommandFailedEvent):
+        self._registrar(evento)
+
+    def _registrar(self, evento):
+        colecao = self._colecoes.pop((evento.connection_id, evento.request_id), "")
+        duracao_comandos_mongo.observar((evento.command_name, colecao), evento.duration_micros / 1_000_000)
+
+
+class OuvintePool(monitoring.ConnectionPoolListener):
+    """Mede a espera por conexão: o checkout começa e termina na mesma thread"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def connection_check_out_started(self, evento):
+        self._local.inicio = time.perf_counter()
+
+    def connection_checked_out(self, evento):
+        self._observar("ok")
+
+    def connection_check_out_failed(self, evento):
+        self._observar("falha")
+
+    def _observar(self, resultado: str):
+        inicio = getattr(self._local, "inicio", None)
+        if inicio is not None:
+            espera_pool_mongo.observar((resultado,), time.perf_counter() - inicio)
+            self._local.inicio = None
+
+    def pool_created(self, evento):
+        pass
+
+    def pool_ready(self, evento):
+        pass
+
+    def pool_cleared(self, evento):
+        pass
+
+    def pool_closed(self, evento):
+        pass
+
+    def connection_created(self, evento):
+        pass
+
+    def connection_ready(self, evento):
+        pass
+
+    def connection_closed(self, evento):
+        pass
+
+    def connection_checked_in(self, evento):
+        pass
+
+
+def ouvintes_mongo() -> list:
+    """Ouvintes registrados no cliente do MongoDB (event_listeners)"""
+    return [OuvinteComandos(), OuvintePool()]
+
+
+def _exportar_caches(caches: Dict[str, Dict[str, Any]]) -> List[str]:
+    series = [
+        ("fluxor_cache_acertos_total", "counter", "Leituras encontradas no cache", "acertos"),
+        ("fluxor_cache_erros_total", "counter", "Leituras não encontradas (ou expiradas) no cache", "erros"),
+        ("fluxor_cache_taxa_acerto", "gauge", "Acertos / leituras do cache", "taxa_acerto"),
+        ("fluxor_cache_itens", "gauge", "Itens no cache", "tamanho"),
+    ]
+    linhas = []
+    for nome, tipo, descricao, campo in series:
+        linhas += [f"# HELP {nome} {descricao}", f"# TYPE {nome} {tipo}"]
+        for cache, estatisticas in sorted(caches.items()):
+            linhas.append(f"{nome}{{{_rotulos(('cache',), (cache,))}}} {estatisticas[campo]}")
+    return linhas
+
+
+def exportar_metricas(caches: Dict[str, Dict[str, Any]]) -> str:
+    """Texto do /metrics; `caches` são as estatísticas de estatisticas_caches()"""
+    linhas: List[str] = []
+    for metrica in (duracao_requisicoes, requisicoes_em_andamento, duracao_comandos_mongo, espera_pool_mongo):
+        linhas += metrica.exportar()
+    linhas += _exportar_caches(caches)
+    return "\n".join(linhas) + "\n"
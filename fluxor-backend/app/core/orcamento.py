@@ -0,0 +1,226 @@
+"""
+Orçamento de consultas por requisição e detecção de N+1
+
+MiddlewareOrcamento abre um ConsultasRequisicao em uma contextvar para cada
+requisição. O Motor executa o pymongo em threads com uma cópia do contexto,
+então OuvinteOrcamento (CommandListener registrado em connect_to_mongo)
+encontra o objeto da requisição e soma nele os comandos e o tempo no banco.
+Ao final da requisição:
+  - a resposta recebe o header Server-Timing (db e app), medido até o início
+    da resposta;
+  - requisições acima de ORCAMENTO_MAXIMO_COMANDOS ou
+    ORCAMENTO_MAXIMO_TEMPO_DB_MS são registradas no log;
+  - consultas com o mesmo formato (comando, coleção e filtro sem os valores)
+    repetidas ORCAMENTO_REPETICOES_N_MAIS_1 vezes ou mais são apontadas como
+    provável N+1 (um find_one por item de uma lista);
+  - em DEBUG, cada formato novo de consulta passa por explain, fora da
+    requisição, e os que fazem COLLSCAN são registrados.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pymongo import monitoring
+
+from app.core.config import get_settings
+from app.core.monitoramento import ROTA_DESCONHECIDA, colecao_do_comando
+from app.database.indices import usa_collscan
+
+settings = get_settings()
+# Mesmo handler e formato estruturado do logger "app" (configurar_logs)
+logger = logging.getLogger(__name__)
+
+HEADER_SERVER_TIMING = "Server-Timing"
+
+# Argumento de cada comando com o filtro que define o formato da consulta
+ARGUMENTO_FILTRO = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "aggregate": "pipeline",
+    "update": "updates",
+    "delete": "deletes",
+}
+
+# Comandos que passam por explain em DEBUG
+COMANDOS_EXPLAIN = ("find", "count", "distinct", "aggregate")
+
+# Campos de sessão e do protocolo que não fazem parte da consulta
+_CAMPOS_PROTOCOLO = {"lsid", "txnNumber", "autocommit", "startTransaction"}
+
+# Itens de uma lista de subdocumentos ($or, pipeline, bulk) considerados no formato
+LIMITE_ITENS_FORMA = 10
+
+Forma = Tuple[str, str, str]
+
+
+def forma_valor(valor: Any) -> Any:
+    """Estrutura do filtro com os valores trocados por '?' (os operadores permanecem)"""
+    if isinstance(valor, dict):
+        return {chave: forma_valor(v) for chave, v in sorted(valor.items())}
+    if isinstance(valor, list) and valor and all(isinstance(v, dict) for v in valor):
+        return [forma_valor(v) for v in valor[:LIMITE_ITENS_FORMA]]
+    return "?"
+
+
+def forma_comando(nome: str, comando: dict) -> Forma:
+    argumento = ARGUMENTO_FILTRO.get(nome)
+    filtro = repr(forma_valor(comando.get(argumento))) if argumento else ""
+    return nome, colecao_do_comando(nome, comando), filtro
+
+
+class ConsultasRequisicao:
+    """Comandos do MongoDB de uma requisição (atualizado pelas threads do Motor)"""
+
+    def __init__(self):
+        self.comandos = 0
+        self.tempo_db = 0.0
+        self.formas: Counter = Counter()
+        # Primeiro comando de cada formato, para o explain em DEBUG
+        self.exemplos: Dict[Forma, dict] = {}
+        self._trava = threading.Lock()
+
+    def iniciar(self, nome: str, comando: dict):
+        if nome == "getMore":
+            # Lotes seguintes de um cursor já contado
+            return
+        forma = forma_comando(nome, comando)
+        with self._trava:
+            self.formas[forma] += 1
+            if settings.DEBUG and nome in COMANDOS_EXPLAIN and forma not in self.exemplos:
+                self.exemplos[forma] = {
+                    chave: valor for chave, valor in comando.items()
+                    if not chave.startswith("$") and chave not in _CAMPOS_PROTOCOLO
+                }
+
+    def concluir(self, segundos: float):
+        with self._trava:
+            self.comandos += 1
+            self.tempo_db += segundos
+
+    def repetidas(self) -> List[Tuple[Forma, int]]:
+        """Formatos repetidos a partir do limite de N+1"""
+        limite = settings.ORCAMENTO_REPETICOES_N_MAIS_1
+        return [(forma, vezes) for forma, vezes in self.formas.most_common() if vezes >= limite]
+
+
+_consultas_atuais: ContextVar[Optional[ConsultasRequisicao]] = ContextVar("consultas_atuais", default=None)
+
+
+class OuvinteOrcamento(monitoring.CommandListener):
+    """Soma cada comando do MongoDB na requisição que o executou"""
+
+    def started(self, evento: monitoring.CommandStartedEvent):
+        consultas = _consultas_atuais.get()
+        if consultas is not None:
+            consultas.iniciar(evento.command_name, evento.command)
+
+    def succeeded(self, evento: monitoring.CommandSucceededEvent):
+        self._concluir(evento)
+
+    def failed(self, evento: monitoring.CommandFailedEvent):
+        self._concluir(evento)
+
+    def _concluir(self, evento):
+        consultas = _consultas_atuais.get()
+        if consultas is not None:
+            consultas.concluir(evento.duration_micros / 1_000_000)
+
+
+def _descrever(forma: Forma) -> str:
+    nome, colecao, filtro = forma
+    return f"{nome} {colecao} {filtro}".strip()
+
+
+# Formatos que já passaram por explain neste processo
+_explicadas: Set[Forma] = set()
+_tarefas_explain: Set[asyncio.Task] = set()
+
+
+async def _explicar(rota: str, exemplos: Dict[Forma, dict]):
+    """Executa explain nos formatos ainda não vistos e registra os que fazem COLLSCAN"""
+    from app.database.mongodb import get_database
+
+    # O explain não conta no orçamento de nenhuma requisição
+    _consultas_atuais.set(None)
+    for forma, comando in exemplos.items():
+        if forma in _explicadas:
+            continue
+        _explicadas.add(forma)
+        campos = {"rota": rota, "consulta": _descrever(forma)}
+        try:
+            explain = await get_database().command({"explain": comando, "verbosity": "queryPlanner"})
+        except Exception as e:
+            logger.warning("Erro no explain", extra={"campos": {**campos, "erro": str(e)}})
+            continue
+        if usa_collscan(explain):
+            logger.warning("Consulta sem índice (COLLSCAN)", extra={"campos": campos})
+
+
+def registrar_requisicao(rota: str, consultas: ConsultasRequisicao):
+    """Registra no log orçamento excedido e prováveis N+1 da requisição"""
+    tempo_db_ms = consultas.tempo_db * 1000
+    if (consultas.comandos > settings.ORCAMENTO_MAXIMO_COMANDOS
+            or tempo_db_ms > settings.ORCAMENTO_MAXIMO_TEMPO_DB_MS):
+        logger.warning("Orçamento de consultas excedido", extra={"campos": {
+            "rota": rota,
+            "comandos": consultas.comandos,
+            "tempo_db_ms": round(tempo_db_ms, 1),
+            "limite_comandos": settings.ORCAMENTO_MAXIMO_COMANDOS,
+            "limite_tempo_db_ms": settings.ORCAMENTO_MAXIMO_TEMPO_DB_MS,
+        }})
+    for forma, vezes in consultas.repetidas():
+        logger.warning("Provável N+1", extra={"campos": {
+            "rota": rota, "consulta": _descrever(forma), "repeticoes": vezes
+        }})
+
+    novas = {forma: comando for forma, comando in consultas.exemplos.items() if forma not in _explicadas}
+    if novas:
+        tarefa = asyncio.get_running_loop().create_task(_explicar(rota, novas))
+        _tarefas_explain.add(tarefa)
+        tarefa.add_done_callback(_tarefas_explain.discard)
+
+
+def server_timing(consultas: ConsultasRequisicao, total: float) -> str:
+    """Valor do header Server-Timing: tempo no banco e no restante da aplicação (ms)"""
+    db = consultas.tempo_db * 1000
+    app = max(total * 1000 - db, 0.0)
+    return f'db;dur={db:.1f};desc="{consultas.comandos} comandos", app;dur={app:.1f}'
+
+
+class MiddlewareOrcamento:
+    """Mede os comandos do MongoDB de cada requisição"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ORCAMENTO_ATIVO:
+            await self.app(scope, receive, send)
+            return
+
+        consultas = ConsultasRequisicao()
+        marcador = _consultas_atuais.set(consultas)
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                headers = list(mensagem.get("headers", []))
+                headers.append((
+                    HEADER_SERVER_TIMING.lower().encode("latin-1"),
+                    server_timing(consultas, time.perf_counter() - inicio).encode("latin-1")
+                ))
+                mensagem = {**mensagem, "headers": headers}
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _consultas_atuais.reset(marcador)
+            rota = f"{scope['method']} {getattr(scope.get('route'), 'path', ROTA_DESCONHECIDA)}"
+            registrar_requisicao(rota, consultas)
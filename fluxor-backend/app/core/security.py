@@ -1,20 +1,38 @@
 """
 Funções de segurança: autenticação, autorização, JWT
 """
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import asyncio
 import hashlib
+import time
 
 from app.core.config import get_settings
 
 settings = get_settings()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 security = HTTPBearer()
 
+# Tipos de token emitidos
+TOKEN_ACESSO = "access"
+TOKEN_REFRESH = "refresh"
+
+# Campos do usuário embutidos no access token (modo stateless)
+CLAIMS_USUARIO = ("nome", "email", "tipo", "ativo", "criado_em", "atualizado_em")
+
+# Pool limitado para o bcrypt, que é lento de propósito e bloquearia o event loop
+_hash_executor: Optional[ThreadPoolExecutor] = None
+
+# user_id -> instante da revogação. Access tokens emitidos até esse instante são rejeitados.
+# O instante também é gravado no usuário (tokens_revogados_em) e os outros
+# workers o recarregam (app/services/sincronizacao.py).
+_revogacoes: Dict[str, float] = {}
+
 
 def _prepare_password(password: str) -> str:
     """
@@ -36,6 +54,45 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(prepared)
 
 
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="bcrypt"
+        )
+    return _hash_executor
+
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    prepared = _prepare_password(plain_password)
+    return pwd_context.verify_and_update(prepared, hashed_password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica a senha no pool de hash, sem bloquear o event loop.
+    Retorna (valida, novo_hash); novo_hash é preenchido quando o hash armazenado
+    usa parâmetros antigos (ex: BCRYPT_ROUNDS alterado) e deve ser regravado.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_hash_executor(), _verify_and_update, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Gera hash da senha no pool de hash, sem bloquear o event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_hash_executor(), get_password_hash, password)
+
+
+def shutdown_hash_executor():
+    """Encerra o pool de hash (chamado no shutdown da aplicação)"""
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True)
+        _hash_executor = None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Cria token JWT"""
     to_encode = data.copy()
@@ -45,11 +102,54 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.setdefault("type", TOKEN_ACESSO)
+    to_encode.update({"exp": expire, "iat": time.time()})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
+def create_refresh_token(user_id: str) -> str:
+    """Cria refresh token JWT (longa duração, contém apenas o ID do usuário)"""
+    return create_access_token(
+        data={"sub": user_id, "type": TOKEN_REFRESH},
+        expires_delta=timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+
+
+def claims_usuario(user: dict) -> dict:
+    """Monta as claims do access token a partir do documento do usuário"""
+    claims = {"sub": str(user["_id"])}
+    for campo in CLAIMS_USUARIO:
+        valor = user.get(campo)
+        claims[campo] = valor.isoformat() if isinstance(valor, datetime) else valor
+    return claims
+
+
+def revogar_tokens_usuario(user_id: str, instante: Optional[float] = None) -> float:
+    """Revoga todos os access tokens já emitidos para o usuário; retorna o instante da revogação"""
+    agora = time.time()
+    instante = instante or agora
+    _revogacoes[str(user_id)] = max(instante, _revogacoes.get(str(user_id), 0))
+    
+    # Revogações mais antigas que a validade do access token não são mais necessárias
+    limite = agora - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    for chave in [k for k, v in _revogacoes.items() if v < limite]:
+        del _revogacoes[chave]
+    return instante
+
+
+def carregar_revogacoes(revogacoes: Dict[str, float]):
+    """Incorpora revogações feitas por outros workers (user_id -> instante)"""
+    for user_id, instante in revogacoes.items():
+        revogar_tokens_usuario(user_id, instante)
+
+
+def token_revogado(payload: dict) -> bool:
+    """Verifica se o token foi emitido antes de uma revogação do usuário"""
+    revogado_em = _revogacoes.get(str(payload.get("sub")))
+    return revogado_em is not None and payload.get("iat", 0) <= revogado_em
+
+
 def decode_token(token: str) -> dict:
     """Decodifica token JWT"""
     try:
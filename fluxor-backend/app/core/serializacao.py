@@ -0,0 +1,105 @@
+"""
+Serialização rápida de respostas JSON
+
+As listagens retornavam um modelo Pydantic por documento, que o FastAPI
+validava de novo contra o response_model e codificava com o encoder padrão.
+Para documentos vindos do próprio MongoDB essa validação é redundante:
+resposta_lista projeta cada documento nos campos do modelo (mesmas chaves,
+aliases e valores padrão da resposta validada) e serializa direto em bytes com
+orjson, que trata datetime nativamente e ObjectId via _padrao.
+
+Com RESPOSTAS_VALIDAR_MODELOS=true (desenvolvimento), a lista inteira é
+validada de uma vez por um TypeAdapter do modelo e serializada pelo
+pydantic-core, acusando documentos fora do schema.
+"""
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Tuple, Type
+
+import orjson
+from bson import Decimal128, ObjectId
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# (chave na resposta, chaves aceitas no documento, valor padrão)
+Campo = Tuple[str, Tuple[str, ...], Any]
+
+
+def _padrao(valor: Any) -> Any:
+    """Tipos do BSON que o orjson não serializa sozinho"""
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    if isinstance(valor, Decimal128):
+        return float(valor.to_decimal())
+    if isinstance(valor, Decimal):
+        return float(valor)
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def serializar_json(conteudo: Any) -> bytes:
+    return orjson.dumps(conteudo, default=_padrao, option=orjson.OPT_NON_STR_KEYS)
+
+
+class RespostaJSON(Response):
+    """Resposta JSON serializada com orjson (aceita bytes já serializados)"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return serializar_json(content)
+
+
+@lru_cache(maxsize=None)
+def campos_resposta(modelo: Type[BaseModel]) -> Tuple[Campo, ...]:
+    """Campos do modelo como aparecem na resposta (by_alias), com seus padrões"""
+    campos = []
+    for nome, campo in modelo.model_fields.items():
+        chave = campo.alias or nome
+        padrao = None if campo.is_required() else campo.get_default(call_default_factory=True)
+        campos.append((chave, (chave, nome) if chave != nome else (nome,), padrao))
+    return tuple(campos)
+
+
+def projetar(documento: dict, campos: Tuple[Campo, ...]) -> dict:
+    """Documento com exatamente os campos do modelo, na ordem do modelo"""
+    resultado = {}
+    for chave, origens, padrao in campos:
+        for origem in origens:
+            if origem in documento:
+                resultado[chave] = documento[origem]
+                break
+        else:
+            resultado[chave] = padrao
+    return resultado
+
+
+@lru_cache(maxsize=None)
+def _adaptador_lista(modelo: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[modelo])
+
+
+def resposta_lista(
+    documentos: Iterable[dict],
+    modelo: Optional[Type[BaseModel]] = None,
+    **kwargs
+) -> RespostaJSON:
+    """
+    Resposta para uma lista de documentos confiáveis do MongoDB.
+    Com modelo, a saída tem o mesmo formato do response_model correspondente.
+    """
+    documentos = list(documentos)
+    if modelo is None:
+        return RespostaJSON(documentos, **kwargs)
+
+    if settings.RESPOSTAS_VALIDAR_MODELOS:
+        adaptador = _adaptador_lista(modelo)
+        corpo = adaptador.dump_json(adaptador.validate_python(documentos), by_alias=True)
+        return RespostaJSON(corpo, **kwargs)
+
+    campos = campos_resposta(modelo)
+    return RespostaJSON([projetar(documento, campos) for documento in documentos], **kwargs)
@@ -46,6 +46,21 @@ def to_utc(dt: datetime) -> datetime:
     return dt.astimezone(timezone.utc)
 
 
+def to_local_naive(dt: datetime) -> datetime:
+    """
+    Converte para o horário local sem timezone, formato em que data_hora é armazenado.
+    Datetimes sem timezone são considerados já locais.
+    """
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(get_timezone()).replace(tzinfo=None)
+
+
+def inicio_do_dia(dt: datetime) -> datetime:
+    """Retorna a meia-noite do dia da datetime informada"""
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
 def parse_datetime_local(dt_string: str) -> datetime:
     """
     Parseia uma string de datetime e retorna como datetime no fuso local.
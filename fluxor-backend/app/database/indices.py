@@ -0,0 +1,228 @@
+"""
+Registro declarativo de índices do MongoDB
+
+Cada coleção declara seus índices em INDICES. A aplicação cria os índices no
+startup de forma idempotente, e relatorio_uso_indices executa explain nas
+consultas canônicas das rotas para apontar qualquer COLLSCAN.
+
+Uso como comando administrativo:
+    python -m app.database.indices            # aplica índices e mostra o relatório
+    python -m app.database.indices --relatorio  # apenas o relatório
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+STATUS_ATIVOS = ["agendado", "confirmado", "em_atendimento"]
+
+
+INDICES: Dict[str, List[IndexModel]] = {
+    "agendamentos": [
+        # Conflitos e disponibilidade por profissional
+        IndexModel(
+            [("profissional_id", ASCENDING), ("data_hora", ASCENDING), ("status", ASCENDING)],
+            name="profissional_data_status"
+        ),
+        # Listagens (cursor data_hora,_id), relatórios e próximos agendamentos por período
+        IndexModel([("data_hora", ASCENDING), ("_id", ASCENDING)], name="data_hora_id"),
+        # Atividades recentes (últimos confirmados/cancelados)
+        IndexModel([("status", ASCENDING), ("atualizado_em", DESCENDING)], name="status_atualizado_em"),
+        # Estatísticas do link de agendamento
+        IndexModel([("cliente_id", ASCENDING), ("origem", ASCENDING)], name="cliente_origem"),
+        # Propagação do nome do serviço para os agendamentos
+        IndexModel([("servico_id", ASCENDING)], name="servico_id"),
+    ],
+    "clientes": [
+        # CPF é único apenas quando preenchido
+        IndexModel(
+            [("cpf", ASCENDING)],
+            name="cpf_unico",
+            unique=True,
+            partialFilterExpression={"cpf": {"$gt": ""}}
+        ),
+        IndexModel([("criado_em", DESCENDING)], name="criado_em"),
+    ],
+    "links_agendamento": [
+        IndexModel([("token", ASCENDING)], name="token_unico", unique=True),
+        IndexModel([("cliente_id", ASCENDING)], name="cliente_id"),
+    ],
+    "lista_espera": [
+        # Listagem por cursor (prioridade, criado_em, _id), com e sem filtro de status
+        IndexModel(
+            [("prioridade", DESCENDING), ("criado_em", ASCENDING), ("_id", ASCENDING)],
+            name="prioridade_criado_em_id"
+        ),
+        IndexModel(
+            [("status", ASCENDING), ("prioridade", DESCENDING), ("criado_em", ASCENDING), ("_id", ASCENDING)],
+            name="status_prioridade_criado_em_id"
+        ),
+    ],
+    "reservas_horario": [
+        # Um único agendamento por profissional e grânulo de horário
+        IndexModel(
+            [("profissional_id", ASCENDING), ("inicio", ASCENDING)],
+            name="profissional_inicio_unico",
+            unique=True
+        ),
+        IndexModel([("agendamento_id", ASCENDING)], name="agendamento_id"),
+        # Reservas pendentes de um agendamento que não chegou a ser gravado
+        IndexModel([("pendente_ate", ASCENDING)], name="pendente_ate_ttl", expireAfterSeconds=0),
+    ],
+    "rollups_diarios": [
+        IndexModel(
+            [("dia", ASCENDING), ("profissional_id", ASCENDING), ("servico_id", ASCENDING)],
+            name="dia_profissional_servico",
+            unique=True
+        ),
+        IndexModel([("profissional_id", ASCENDING), ("dia", ASCENDING)], name="profissional_dia"),
+    ],
+    "usuarios": [
+        IndexModel([("email", ASCENDING)], name="email_unico", unique=True),
+        # Revogações recentes recarregadas pelos workers
+        IndexModel([("tokens_revogados_em", ASCENDING)], name="tokens_revogados_em", sparse=True),
+    ],
+}
+
+
+async def aplicar_indices(db: AsyncIOMotorDatabase) -> Dict[str, List[str]]:
+    """
+    Cria os índices do registro. É idempotente: índices já existentes com a
+    mesma definição são ignorados pelo MongoDB. Falhas (ex: dados duplicados
+    impedindo um índice único) são reportadas sem interromper o startup.
+    """
+    criados: Dict[str, List[str]] = {}
+    for colecao, indices in INDICES.items():
+        criados[colecao] = []
+        for indice in indices:
+            try:
+                nomes = await db[colecao].create_indexes([indice])
+                criados[colecao].extend(nomes)
+            except OperationFailure as e:
+                print(f"✗ Falha ao criar índice {indice.document['name']} em {colecao}: {e}")
+    return criados
+
+
+def _consultas_canonicas() -> List[dict]:
+    """Consultas representativas de cada rota, com valores de exemplo"""
+    agora = datetime.utcnow()
+    inicio = agora - timedelta(days=30)
+    exemplo_id = str(ObjectId())
+
+    return [
+        {"rota": "GET /agendamentos/", "colecao": "agendamentos",
+         "filtro": {"data_hora": {"$gte": inicio, "$lte": agora}}, "ordenacao": {"data_hora": 1, "_id": 1}},
+        {"rota": "POST /agendamento-online/agendar/{token}", "colecao": "agendamentos",
+         "filtro": {"profissional_id": exemplo_id, "data_hora": agora, "status": {"$in": STATUS_ATIVOS}}},
+        {"rota": "GET /agendamento-online/disponibilidade/{token}", "colecao": "agendamentos",
+         "filtro": {"profissional_id": exemplo_id, "data_hora": {"$gte": inicio, "$lte": agora},
+                    "status": {"$in": STATUS_ATIVOS}}},
+        {"rota": "GET /relatorios/proximos-agendamentos", "colecao": "agendamentos",
+         "filtro": {"data_hora": {"$gte": agora}, "status": {"$in": ["agendado", "confirmado"]}},
+         "ordenacao": {"data_hora": 1}},
+        {"rota": "GET /relatorios/atividades-recentes", "colecao": "agendamentos",
+         "filtro": {"status": "confirmado"}, "ordenacao": {"atualizado_em": -1}},
+        {"rota": "GET /agendamento-online/estatisticas/{cliente_id}", "colecao": "agendamentos",
+         "filtro": {"cliente_id": exemplo_id, "origem": "link_online"}},
+        {"rota": "POST /agendamento-online/validar-cpf", "colecao": "clientes",
+         "filtro": {"cpf": "00000000000", "ativo": True}},
+        {"rota": "GET /relatorios/atividades-recentes", "colecao": "clientes",
+         "filtro": {}, "ordenacao": {"criado_em": -1}},
+        {"rota": "GET /agendamento-online/validar/{token}", "colecao": "links_agendamento",
+         "filtro": {"token": "token-exemplo", "ativo": True}},
+        {"rota": "POST /agendamento-online/gerar-link/{cliente_id}", "colecao": "links_agendamento",
+         "filtro": {"cliente_id": ObjectId(exemplo_id)}},
+        {"rota": "GET /lista-espera/", "colecao": "lista_espera",
+         "filtro": {"status": "aguardando"}, "ordenacao": {"prioridade": -1, "criado_em": 1, "_id": 1}},
+        {"rota": "POST /auth/login", "colecao": "usuarios",
+         "filtro": {"email": "exemplo@fluxor.com"}},
+    ]
+
+
+def _estagios(plano: dict) -> List[dict]:
+    """Percorre a árvore do plano de execução e retorna todos os estágios"""
+    if not plano:
+        return []
+    plano = plano.get("queryPlan", plano)
+    estagios = [plano]
+    if "inputStage" in plano:
+        estagios.extend(_estagios(plano["inputStage"]))
+    for entrada in plano.get("inputStages", []):
+        estagios.extend(_estagios(entrada))
+    return estagios
+
+
+def planos_vencedores(explain: Any) -> List[dict]:
+    """Planos escolhidos em um explain (find ou aggregate, inclusive em estágios $cursor)"""
+    if isinstance(explain, list):
+        return [plano for item in explain for plano in planos_vencedores(item)]
+    if not isinstance(explain, dict):
+        return []
+    if "winningPlan" in explain:
+        return [explain["winningPlan"]]
+    return [plano for valor in explain.values() for plano in planos_vencedores(valor)]
+
+
+def usa_collscan(explain: dict) -> bool:
+    """Indica se algum plano do explain varre a coleção inteira"""
+    return any(
+        estagio.get("stage") == "COLLSCAN"
+        for plano in planos_vencedores(explain)
+        for estagio in _estagios(plano)
+    )
+
+
+async def relatorio_uso_indices(db: AsyncIOMotorDatabase) -> List[dict]:
+    """Executa explain nas consultas canônicas e indica o plano escolhido para cada uma"""
+    relatorio = []
+    for consulta in _consultas_canonicas():
+        comando = {"find": consulta["colecao"], "filter": consulta["filtro"]}
+        if consulta.get("ordenacao"):
+            comando["sort"] = consulta["ordenacao"]
+
+        explain = await db.command({"explain": comando, "verbosity": "queryPlanner"})
+        estagios = _estagios(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        nomes = [e.get("stage") for e in estagios]
+        indices = [e["indexName"] for e in estagios if e.get("indexName")]
+
+        relatorio.append({
+            "rota": consulta["rota"],
+            "colecao": consulta["colecao"],
+            "estagios": nomes,
+            "indices": indices,
+            "collscan": "COLLSCAN" in nomes,
+        })
+    return relatorio
+
+
+def imprimir_relatorio(relatorio: List[dict]):
+    """Imprime o relatório de uso de índices"""
+    for item in relatorio:
+        if item["collscan"]:
+            print(f"✗ COLLSCAN: {item['rota']} ({item['colecao']})")
+        else:
+            indices = ", ".join(item["indices"]) or "/".join(item["estagios"])
+            print(f"✓ {item['rota']} ({item['colecao']}): {indices}")
+
+
+async def _main(argumentos: List[str]):
+    from app.database.mongodb import connect_to_mongo, close_mongo_connection, get_database
+
+    await connect_to_mongo(aplicar=False)
+    try:
+        db = get_database()
+        if "--relatorio" not in argumentos:
+            await aplicar_indices(db)
+            print("✓ Índices aplicados")
+        imprimir_relatorio(await relatorio_uso_indices(db))
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1:]))
@@ -1,8 +1,23 @@
 """
 Conexão e gerenciamento do MongoDB
+
+O cliente é criado com as opções de pool, compressão e timeouts de Settings
+(opcoes_cliente). O cliente é criado no lifespan da aplicação, então cada worker (processo)
+tem o seu próprio cliente e pool de conexões. Com vários workers, os índices
+são aplicados uma única vez pelo processo principal (preparar_indices, chamado
+pelo run.py antes de iniciar os workers).
+
+As rotas de relatórios usam get_database_relatorios, que lê dos secundários
+com atraso limitado, para não disputar o primário e o pool com os agendamentos.
 """
+import os
+
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.read_preferences import SecondaryPreferred
 from app.core.config import get_settings
+from app.core.monitoramento import ouvintes_mongo
+from app.core.orcamento import OuvinteOrcamento
+from app.database.indices import aplicar_indices, relatorio_uso_indices, imprimir_relatorio
 
 settings = get_settings()
 
@@ -10,23 +25,79 @@ settings = get_settings()
 class MongoDB:
     client: AsyncIOMotorClient = None
     database: AsyncIOMotorDatabase = None
+    relatorios: AsyncIOMotorDatabase = None
 
 
 mongodb = MongoDB()
 
 
-async def connect_to_mongo():
-    """Conecta ao MongoDB"""
-    mongodb.client = AsyncIOMotorClient(settings.MONGODB_URL)
+def opcoes_cliente() -> dict:
+    """Opções do AsyncIOMotorClient (opções explícitas na MONGODB_URL também valem)"""
+    opcoes = {
+        "minPoolSize": settings.MONGODB_POOL_MINIMO,
+        "maxPoolSize": settings.MONGODB_POOL_MAXIMO,
+        "maxIdleTimeMS": settings.MONGODB_MAXIMO_OCIOSO_MS or None,
+        "waitQueueTimeoutMS": settings.MONGODB_TIMEOUT_FILA_MS or None,
+        "serverSelectionTimeoutMS": settings.MONGODB_TIMEOUT_SELECAO_SERVIDOR_MS,
+        "connectTimeoutMS": settings.MONGODB_TIMEOUT_CONEXAO_MS,
+    }
+    if settings.MONGODB_COMPRESSORES:
+        opcoes["compressors"] = settings.MONGODB_COMPRESSORES
+    return opcoes
+
+
+async def connect_to_mongo(aplicar: bool = True):
+    """Conecta ao MongoDB e, se configurado, aplica o registro de índices"""
+    mongodb.client = AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        event_listeners=ouvintes_mongo() + [OuvinteOrcamento()],
+        **opcoes_cliente()
+    )
     mongodb.database = mongodb.client[settings.DATABASE_NAME]
-    print(f"✓ Conectado ao MongoDB: {settings.DATABASE_NAME}")
+    if settings.MONGODB_RELATORIOS_SECUNDARIOS:
+        mongodb.relatorios = mongodb.client.get_database(
+            settings.DATABASE_NAME,
+            read_preference=SecondaryPreferred(
+                max_staleness=settings.MONGODB_RELATORIOS_ATRASO_MAXIMO_SEGUNDOS
+            )
+        )
+    else:
+        mongodb.relatorios = mongodb.database
+    print(f"✓ Conectado ao MongoDB: {settings.DATABASE_NAME} (pid {os.getpid()})")
+    
+    if aplicar and settings.MONGODB_CRIAR_INDICES:
+        await _aplicar_e_relatar(mongodb.database)
+
+
+async def _aplicar_e_relatar(database: AsyncIOMotorDatabase):
+    try:
+        await aplicar_indices(database)
+        print("✓ Índices do MongoDB aplicados")
+        if settings.MONGODB_RELATORIO_INDICES:
+            imprimir_relatorio(await relatorio_uso_indices(database))
+    except Exception as e:
+        print(f"✗ Erro ao aplicar índices: {e}")
+
+
+async def preparar_indices():
+    """Aplica os índices (e o relatório) com um cliente próprio, fechado em seguida"""
+    if not settings.MONGODB_CRIAR_INDICES:
+        return
+    client = AsyncIOMotorClient(settings.MONGODB_URL, **opcoes_cliente())
+    try:
+        await _aplicar_e_relatar(client[settings.DATABASE_NAME])
+    finally:
+        client.close()
 
 
 async def close_mongo_connection():
     """Fecha conexão com MongoDB"""
     if mongodb.client:
         mongodb.client.close()
-        print("✓ Conexão MongoDB fechada")
+        mongodb.client = None
+        mongodb.database = None
+        mongodb.relatorios = None
+        print(f"✓ Conexão MongoDB fechada (pid {os.getpid()})")
 
 
 def get_database() -> AsyncIOMotorDatabase:
@@ -34,6 +105,11 @@ def get_database() -> AsyncIOMotorDatabase:
     return mongodb.database
 
 
+def get_database_relatorios() -> AsyncIOMotorDatabase:
+    """Database para consultas de relatórios (secundários, com atraso limitado)"""
+    return mongodb.relatorios
+
+
 def get_collection(collection_name: str):
     """Retorna uma collection do MongoDB"""
     return mongodb.database[collection_name]
@@ -1,12 +1,20 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.core.config import get_settings
+from app.core.monitoramento import CONTENT_TYPE_METRICAS, MiddlewareMetricas, configurar_logs, exportar_metricas
+from app.core.orcamento import HEADER_SERVER_TIMING, MiddlewareOrcamento
+from app.core.security import shutdown_hash_executor
 from app.database.mongodb import connect_to_mongo, close_mongo_connection
+from app.services.cache import estatisticas_caches
+from app.services.acessos import encerrar_gravacao_acessos, iniciar_gravacao_acessos
+from app.services.paginacao import HEADER_PROXIMO_CURSOR, HEADER_TOTAL_ESTIMADO
+from app.services.sincronizacao import encerrar_sincronizacao, iniciar_sincronizacao
 from app.routes import auth, clientes, profissionais, servicos, agendamentos, lista_espera, relatorios, agendamento_online
 
 settings = get_settings()
+configurar_logs()
 
 
 @asynccontextmanager
@@ -14,9 +22,14 @@ async def lifespan(app: FastAPI):
     """Gerenciador de contexto para inicialização e encerramento"""
     # Startup
     await connect_to_mongo()
+    iniciar_gravacao_acessos()
+    iniciar_sincronizacao()
     yield
     # Shutdown
+    await encerrar_sincronizacao()
+    await encerrar_gravacao_acessos()
     await close_mongo_connection()
+    shutdown_hash_executor()
 
 
 app = FastAPI(
@@ -33,8 +46,18 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        HEADER_PROXIMO_CURSOR, HEADER_TOTAL_ESTIMADO, HEADER_SERVER_TIMING,
+        auth.HEADER_ACCESS_TOKEN, auth.HEADER_REFRESH_TOKEN,
+    ],
 )
 
+# Comandos do MongoDB por requisição (orçamento, N+1 e Server-Timing)
+app.add_middleware(MiddlewareOrcamento)
+
+# Latência e status por rota (a mais externa, para medir a requisição inteira)
+app.add_middleware(MiddlewareMetricas)
+
 # Rota raiz
 @app.get("/")
 async def root():
@@ -50,6 +73,11 @@ async def root():
 async def health_check():
     return {"status": "ok", "app": settings.APP_NAME}
 
+# Métricas no formato do Prometheus
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(exportar_metricas(estatisticas_caches()), media_type=CONTENT_TYPE_METRICAS)
+
 # Incluir rotas
 app.include_router(auth.router)
 app.include_router(clientes.router)
@@ -1,14 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Body, Query, Request
+from typing import List, Optional
 from pydantic import BaseModel
 import secrets
-from datetime import datetime
+from datetime import date, datetime
 from bson import ObjectId
 from app.database.mongodb import get_database
+from app.core.config import get_settings
 from app.schemas import Usuario
 from app.core.timezone import now_local, parse_datetime_local
+from app.services.acessos import buffer_acessos
+from app.services.catalogo import catalogo_profissionais, catalogo_servicos, resposta_catalogo
+from app.services.conflitos import invalidar_agenda, verificar_conflito
+from app.services.disponibilidade import disponibilidade_periodo, horarios_disponiveis
+from app.services.hidratacao import buscar_por_id, listar_ativos, variantes_id
+from app.services.links import cliente_do_token, invalidar_tokens
+from app.services.reservas import HorarioIndisponivel, reservar_horario
+from app.services.rollups import registrar_alteracao
 from .auth import get_current_user
 
+settings = get_settings()
 router = APIRouter(prefix="/agendamento-online", tags=["Agendamento Online"])
 
 
@@ -56,6 +66,8 @@ async def validar_cpf(request: ValidarCpfRequest):
         else:
             # Criar novo link
             await db.links_agendamento.insert_one(link_data)
+        
+        await invalidar_tokens(link.get("token") if link else None, token)
     
     return {
         "token": token,
@@ -114,6 +126,9 @@ async def gerar_link_cliente(
         # Criar novo link
         await db.links_agendamento.insert_one(link_data)
     
+    # O token anterior deixa de valer imediatamente
+    await invalidar_tokens(existing_link.get("token") if existing_link else None, token)
+    
     return {
         "cliente_id": cliente_id,
         "cliente_nome": cliente.get("nome"),
@@ -129,18 +144,15 @@ async def validar_token(token: str):
     
     db = get_database()
     
-    link = await db.links_agendamento.find_one({"token": token, "ativo": True})
-    if not link:
+    cliente_id = await cliente_do_token(db, token)
+    if cliente_id is None:
         raise HTTPException(status_code=404, detail="Link inválido ou expirado")
     
-    # Incrementar contador de acessos
-    await db.links_agendamento.update_one(
-        {"token": token},
-        {"$inc": {"acessos": 1}}
-    )
+    # Contar o acesso (gravado em lote, fora da requisição)
+    await buffer_acessos.registrar(token)
     
     # Buscar dados do cliente
-    cliente = await db.clientes.find_one({"_id": link["cliente_id"]})
+    cliente = await db.clientes.find_one({"_id": cliente_id})
     if not cliente:
         raise HTTPException(status_code=404, detail="Cliente não encontrado")
     
@@ -168,58 +180,42 @@ async def criar_agendamento_publico(
     
     db = get_database()
     
-    # Token é opcional para acesso público
-    if token and token != 'publico':
-        link = await db.links_agendamento.find_one({"token": token, "ativo": True})
-        if link:
-            cliente_id = link["cliente_id"]
-        else:
-            # Token inválido mas permite continuar sem cliente específico
-            cliente_id = None
-    else:
-        cliente_id = None
-    
-    # Verificar se serviço e profissional existem
-    try:
-        # Tentar converter para ObjectId se necessário
-        servico_oid = ObjectId(request.servico_id) if ObjectId.is_valid(request.servico_id) else request.servico_id
-        profissional_oid = ObjectId(request.profissional_id) if ObjectId.is_valid(request.profissional_id) else request.profissional_id
-    except:
-        # Se falhar, usar como string
-        servico_oid = request.servico_id
-        profissional_oid = request.profissional_id
+    # Token é opcional para acesso público; token inválido agenda sem cliente específico.
+    # Conferido no banco: um link desativado em outro worker não pode mais agendar
+    cliente_id = await cliente_do_token(db, token, usar_cache=False)
     
-    servico = await db.servicos.find_one({"_id": servico_oid})
-    profissional = await db.profissionais.find_one({"_id": profissional_oid})
+    # Verificar se serviço e profissional existem (IDs em string ou ObjectId)
+    servico = await buscar_por_id(db, "servicos", request.servico_id)
+    profissional = await buscar_por_id(db, "profissionais", request.profissional_id)
     
     if not servico or not profissional:
         raise HTTPException(status_code=404, detail="Serviço ou profissional não encontrado")
     
-    # Verificar se o horário está disponível
-    conflito = await db.agendamentos.find_one({
-        "profissional_id": request.profissional_id,
-        "data_hora": request.data_hora,
-        "status": {"$in": ["agendado", "confirmado", "em_atendimento"]}
-    })
-    
-    if conflito:
-        raise HTTPException(status_code=400, detail="Horário não disponível")
-    
     # Converter data_hora string para datetime local (sem UTC)
+    # parse_datetime_local retorna None para datas inválidas
     try:
-        if isinstance(request.data_hora, str):
-            data_hora_obj = parse_datetime_local(request.data_hora)
-        else:
-            data_hora_obj = request.data_hora
-    except:
+        data_hora_obj = parse_datetime_local(request.data_hora)
+    except (TypeError, ValueError):
+        data_hora_obj = None
+    if data_hora_obj is None:
         raise HTTPException(status_code=400, detail="Formato de data inválido")
     
-    # Criar agendamento
+    # Verificar se o horário se sobrepõe a outro agendamento (inclusive os sem reserva registrada)
+    if await verificar_conflito(db, request.profissional_id, data_hora_obj, servico.get("duracao")):
+        raise HTTPException(status_code=409, detail="Horário não disponível")
+    
+    cliente = await buscar_por_id(db, "clientes", cliente_id) if cliente_id else None
+    
+    # Criar agendamento (com snapshot de nomes, valor e duração)
     agendamento_data = {
+        "_id": ObjectId(),
         "cliente_id": str(cliente_id) if cliente_id else None,
         "servico_id": request.servico_id,
         "profissional_id": request.profissional_id,
         "data_hora": data_hora_obj,  # Salvar como datetime local
+        "cliente_nome": cliente["nome"] if cliente else None,
+        "profissional_nome": profissional["nome"],
+        "servico_nome": servico["nome"],
         "duracao": servico["duracao"],
         "valor": servico["valor"],
         "status": "agendado",
@@ -229,7 +225,14 @@ async def criar_agendamento_publico(
         "atualizado_em": now_local().replace(tzinfo=None)
     }
     
-    result = await db.agendamentos.insert_one(agendamento_data)
+    # Reservar o horário atomicamente em volta da gravação do agendamento
+    try:
+        async with reservar_horario(db, None, agendamento_data):
+            result = await db.agendamentos.insert_one(agendamento_data)
+    except HorarioIndisponivel:
+        raise HTTPException(status_code=409, detail="Horário não disponível")
+    invalidar_agenda(agendamento_data)
+    await registrar_alteracao(db, None, agendamento_data)
     
     return {
         "id": str(result.inserted_id),
@@ -249,115 +252,133 @@ async def criar_agendamento_publico(
 
 
 @router.get("/servicos-disponiveis/{token}")
-async def listar_servicos_disponiveis(token: str):
+async def listar_servicos_disponiveis(token: str, request: Request):
     """Lista serviços disponíveis para agendamento online (público)"""
     
     db = get_database()
     
-    # Token é opcional - qualquer pessoa pode ver os serviços
-    # Se tiver token, validamos (para tracking), mas não bloqueamos se inválido
-    if token and token != 'publico':
-        link = await db.links_agendamento.find_one({"token": token, "ativo": True})
-        if link:
-            # Incrementar contador de acessos se tiver link válido
-            await db.links_agendamento.update_one(
-                {"token": token},
-                {"$inc": {"acessos": 1}}
-            )
+    # Token é opcional - qualquer pessoa pode ver os serviços.
+    # Com token válido, o acesso é contado em memória e gravado em lote
+    if await cliente_do_token(db, token) is not None:
+        await buffer_acessos.registrar(token)
     
-    # Buscar serviços ativos
-    servicos = await db.servicos.find({"ativo": True}).to_list(length=100)
-    
-    return [
-        {
-            "_id": str(s["_id"]),
-            "nome": s["nome"],
-            "tipo": s["tipo"],
-            "duracao": s["duracao"],
-            "preco": s["valor"],  # Frontend espera "preco" não "valor"
-            "descricao": s.get("descricao"),
-            "profissionais_habilitados": s.get("profissionais_habilitados", [])
-        }
-        for s in servicos
-    ]
+    return await resposta_catalogo(request, "servicos", None, lambda: catalogo_servicos(db))
 
 
 @router.get("/profissionais-disponiveis/{token}")
-async def listar_profissionais_disponiveis(token: str, servico_id: Optional[str] = None):
+async def listar_profissionais_disponiveis(
+    token: str,
+    request: Request,
+    servico_id: Optional[str] = None
+):
     """Lista profissionais disponíveis para agendamento online (público)"""
     
     db = get_database()
     
     # Token é opcional - qualquer pessoa pode ver os profissionais
-    if token and token != 'publico':
-        link = await db.links_agendamento.find_one({"token": token, "ativo": True})
-        # Não bloqueamos se token inválido, apenas tracking
-    
-    # Se foi especificado um serviço, filtrar profissionais habilitados
-    if servico_id:
-        servico = await db.servicos.find_one({"_id": servico_id})
-        if servico and servico.get("profissionais_habilitados"):
-            profissionais = await db.profissionais.find({
-                "_id": {"$in": servico["profissionais_habilitados"]},
-                "ativo": True
-            }).to_list(length=100)
-        else:
-            profissionais = await db.profissionais.find({"ativo": True}).to_list(length=100)
-    else:
-        profissionais = await db.profissionais.find({"ativo": True}).to_list(length=100)
-    
-    return [
-        {
-            "_id": str(p["_id"]),
-            "nome": p["nome"],
-            "especialidades": p.get("especialidades", []),
-            "registro_profissional": p.get("registro_profissional")
-        }
-        for p in profissionais
-    ]
+    return await resposta_catalogo(
+        request, "profissionais", servico_id, lambda: catalogo_profissionais(db, servico_id)
+    )
 
 
 @router.get("/disponibilidade/{token}")
 async def obter_disponibilidade(
     token: str,
     profissional_id: str,
-    data: str
+    data: str,
+    servico_id: Optional[str] = None
 ):
-    """Retorna horários disponíveis para um profissional em uma data (público)"""
+    """
+    Retorna horários disponíveis para um profissional em uma data (público).
+    Considera o horario_trabalho do profissional, a duração real dos agendamentos
+    existentes e a duração do serviço escolhido.
+    """
     
     db = get_database()
     
-    # Token é opcional
-    if token and token != 'publico':
-        link = await db.links_agendamento.find_one({"token": token, "ativo": True})
-        # Não bloqueamos se token inválido
+    try:
+        dia = date.fromisoformat(data)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de data inválido")
     
-    # Buscar agendamentos do profissional na data
-    data_inicio = f"{data}T00:00:00"
-    data_fim = f"{data}T23:59:59"
+    profissional = await buscar_por_id(db, "profissionais", profissional_id)
+    if not profissional:
+        raise HTTPException(status_code=404, detail="Profissional não encontrado")
     
-    agendamentos = await db.agendamentos.find({
-        "profissional_id": profissional_id,
-        "data_hora": {"$gte": data_inicio, "$lte": data_fim},
-        "status": {"$in": ["agendado", "confirmado", "em_atendimento"]}
-    }).to_list(length=100)
-    
-    # Horários ocupados
-    horarios_ocupados = [ag["data_hora"] for ag in agendamentos]
-    
-    # Gerar horários disponíveis (8h às 18h, intervalos de 30 min)
-    horarios_disponiveis = []
-    for hora in range(8, 18):
-        for minuto in [0, 30]:
-            horario_completo = f"{data}T{hora:02d}:{minuto:02d}:00"
-            if horario_completo not in horarios_ocupados:
-                # Retornar apenas HH:MM para exibição
-                horarios_disponiveis.append(f"{hora:02d}:{minuto:02d}")
+    # Sem serviço informado, cada horário ocupa um passo da agenda
+    duracao = settings.DISPONIBILIDADE_PASSO_MINUTOS
+    if servico_id:
+        servico = await buscar_por_id(db, "servicos", servico_id)
+        if not servico:
+            raise HTTPException(status_code=404, detail="Serviço não encontrado")
+        duracao = servico.get("duracao") or duracao
+    
+    horarios = await horarios_disponiveis(db, profissional, dia, duracao)
     
     return {
         "data": data,
         "profissional_id": profissional_id,
-        "horarios_disponiveis": horarios_disponiveis
+        "horarios_disponiveis": horarios
+    }
+
+
+@router.get("/disponibilidade-periodo/{token}")
+async def obter_disponibilidade_periodo(
+    token: str,
+    data_inicio: str,
+    data_fim: str,
+    servico_id: str,
+    profissional_id: Optional[List[str]] = Query(None),
+):
+    """
+    Horários disponíveis de vários profissionais em vários dias (ex: visão semanal).
+    Sem profissional_id, considera todos os profissionais ativos habilitados para o serviço.
+    """
+    
+    db = get_database()
+    
+    try:
+        primeiro_dia = date.fromisoformat(data_inicio)
+        ultimo_dia = date.fromisoformat(data_fim)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de data inválido")
+    
+    if ultimo_dia < primeiro_dia:
+        raise HTTPException(status_code=400, detail="data_fim deve ser posterior a data_inicio")
+    if (ultimo_dia - primeiro_dia).days >= settings.DISPONIBILIDADE_MAXIMO_DIAS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Período máximo de {settings.DISPONIBILIDADE_MAXIMO_DIAS} dias"
+        )
+    
+    servico = await buscar_por_id(db, "servicos", servico_id)
+    if not servico:
+        raise HTTPException(status_code=404, detail="Serviço não encontrado")
+    
+    profissionais = await listar_ativos(db, "profissionais")
+    if profissional_id:
+        solicitados = set(profissional_id)
+        profissionais = [p for p in profissionais if str(p["_id"]) in solicitados]
+    elif servico.get("profissionais_habilitados"):
+        habilitados = {str(p) for p in servico["profissionais_habilitados"]}
+        profissionais = [p for p in profissionais if str(p["_id"]) in habilitados]
+    
+    duracao = servico.get("duracao") or settings.DISPONIBILIDADE_PASSO_MINUTOS
+    disponibilidade = await disponibilidade_periodo(db, profissionais, primeiro_dia, ultimo_dia, duracao)
+    
+    return {
+        "data_inicio": data_inicio,
+        "data_fim": data_fim,
+        "servico_id": servico_id,
+        "duracao": duracao,
+        "profissionais": [
+            {
+                "profissional_id": str(p["_id"]),
+                "nome": p["nome"],
+                "dias": disponibilidade[str(p["_id"])]
+            }
+            for p in profissionais
+        ]
     }
 
 
@@ -370,14 +391,18 @@ async def desativar_link_cliente(
     
     db = get_database()
     
-    result = await db.links_agendamento.update_one(
-        {"cliente_id": cliente_id},
+    # cliente_id é gravado como ObjectId nos links
+    link = await db.links_agendamento.find_one_and_update(
+        {"cliente_id": {"$in": variantes_id(cliente_id)}},
         {"$set": {"ativo": False}}
     )
     
-    if result.modified_count == 0:
+    if link is None or not link.get("ativo"):
         raise HTTPException(status_code=404, detail="Link não encontrado")
     
+    # A desativação vale imediatamente para o token em cache
+    await invalidar_tokens(link.get("token"))
+    
     return {"mensagem": "Link desativado com sucesso"}
 
 
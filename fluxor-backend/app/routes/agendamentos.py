@@ -1,19 +1,45 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Response, Query, status
+from typing import Optional
 from bson import ObjectId
 from datetime import datetime
+from pymongo import ReturnDocument
 
 from app.schemas import Agendamento, AgendamentoCreate, AgendamentoUpdate, AgendamentoExpandido, Usuario
 from app.database.mongodb import get_database
 from app.routes.auth import get_current_user
-from app.core.timezone import now_local, parse_datetime_local, format_datetime_iso
+from app.core.serializacao import resposta_lista
+from app.services.campos import (
+    DEPENDENCIAS_AGENDAMENTO, DESCRICAO_FIELDS, campos_solicitados, permitidos_do_modelo, projecao_mongo, recortar
+)
+from app.core.timezone import now_local, parse_datetime_local, to_local_naive
+from app.services.conflitos import invalidar_agenda, verificar_conflito_agendamento
+from app.services.exportacao import CAMPOS_AGENDAMENTO, filtro_periodo, linhas_agendamentos, resposta_exportacao
+from app.services.hidratacao import hidratar_agendamentos, buscar_por_id, variantes_id
+from app.services.paginacao import ORDENACAO_AGENDAMENTOS, paginar
+from app.services.reservas import CAMPOS_RESERVA, HorarioIndisponivel, liberar_agendamento, reservar_horario
+from app.services.rollups import registrar_alteracao
+from app.services.snapshots import RELACIONAMENTOS, montar_snapshot, snapshot_referencias
+
+# Campos aceitos em ?fields= (os do agendamento expandido e o snapshot de valor)
+CAMPOS_LISTAGEM = permitidos_do_modelo(AgendamentoExpandido) + ("valor", "origem")
 
 router = APIRouter(prefix="/agendamentos", tags=["Agendamentos"])
 
+
+def data_hora_local(valor):
+    """data_hora no formato armazenado: horário local sem timezone"""
+    if isinstance(valor, str):
+        return parse_datetime_local(valor)
+    return to_local_naive(valor)
+
 @router.get("/")
 async def listar_agendamentos(
-    skip: int = 0,
+    response: Response,
+    skip: int = Query(0, deprecated=True, description="Use cursor"),
     limit: int = 100,
+    cursor: Optional[str] = None,
+    incluir_total: bool = False,
+    fields: Optional[str] = Query(None, description=DESCRICAO_FIELDS),
     status_filtro: str = None,
     data_inicio: datetime = None,
     data_fim: datetime = None,
@@ -21,6 +47,7 @@ async def listar_agendamentos(
 ):
     db = get_database()
     query = {}
+    campos = campos_solicitados(fields, CAMPOS_LISTAGEM)
     
     if status_filtro:
         query["status"] = status_filtro
@@ -28,55 +55,46 @@ async def listar_agendamentos(
     if data_inicio or data_fim:
         query["data_hora"] = {}
         if data_inicio:
-            query["data_hora"]["$gte"] = data_inicio
+            query["data_hora"]["$gte"] = to_local_naive(data_inicio)
         if data_fim:
-            query["data_hora"]["$lte"] = data_fim
+            query["data_hora"]["$lte"] = to_local_naive(data_fim)
+    
+    agendamentos = await paginar(
+        response, db.agendamentos, query, ORDENACAO_AGENDAMENTOS, limit,
+        cursor=cursor, skip=skip, incluir_total=incluir_total,
+        projecao=projecao_mongo(campos, DEPENDENCIAS_AGENDAMENTO)
+    )
     
-    agendamentos = await db.agendamentos.find(query).skip(skip).limit(limit).to_list(length=limit)
+    await hidratar_agendamentos(db, agendamentos, campos)
     
-    resultado = []
+    # Datas e ObjectIds restantes são serializados diretamente pelo orjson
     for agendamento in agendamentos:
-        # Buscar dados relacionados
-        cliente = None
-        if agendamento.get("cliente_id"):
-            try:
-                cliente_id = ObjectId(agendamento["cliente_id"]) if ObjectId.is_valid(agendamento["cliente_id"]) else agendamento["cliente_id"]
-                cliente = await db.clientes.find_one({"_id": cliente_id})
-            except:
-                pass
-        
-        profissional = None
-        try:
-            prof_id = ObjectId(agendamento["profissional_id"]) if ObjectId.is_valid(agendamento["profissional_id"]) else agendamento["profissional_id"]
-            profissional = await db.profissionais.find_one({"_id": prof_id})
-        except:
-            pass
-        
-        servico = None
-        try:
-            serv_id = ObjectId(agendamento["servico_id"]) if ObjectId.is_valid(agendamento["servico_id"]) else agendamento["servico_id"]
-            servico = await db.servicos.find_one({"_id": serv_id})
-        except:
-            pass
-        
         agendamento["_id"] = str(agendamento["_id"])
         agendamento["id"] = agendamento["_id"]  # Garantir que id seja igual a _id
-        agendamento["cliente_nome"] = cliente["nome"] if cliente else "Cliente não informado"
-        agendamento["profissional_nome"] = profissional["nome"] if profissional else "Profissional não encontrado"
-        agendamento["servico_nome"] = servico["nome"] if servico else "Serviço não encontrado"
-        agendamento["duracao"] = servico["duracao"] if servico else 0
-        
-        # Converter datetime para string ISO
-        if "data_hora" in agendamento:
-            agendamento["data_hora"] = agendamento["data_hora"].isoformat() if isinstance(agendamento["data_hora"], datetime) else agendamento["data_hora"]
-        if "criado_em" in agendamento:
-            agendamento["criado_em"] = agendamento["criado_em"].isoformat() if isinstance(agendamento["criado_em"], datetime) else agendamento["criado_em"]
-        if "atualizado_em" in agendamento:
-            agendamento["atualizado_em"] = agendamento["atualizado_em"].isoformat() if isinstance(agendamento["atualizado_em"], datetime) else agendamento["atualizado_em"]
-        
-        resultado.append(agendamento)
-    
-    return resultado
+    
+    return resposta_lista(recortar(agendamentos, campos), headers=response.headers)
+
+@router.get("/exportar")
+async def exportar_agendamentos(
+    formato: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    data_inicio: datetime = None,
+    data_fim: datetime = None,
+    status_filtro: str = None,
+    profissional_id: Optional[str] = None,
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Exporta os agendamentos do período em NDJSON ou CSV (streaming)"""
+    db = get_database()
+    query = filtro_periodo(to_local_naive(data_inicio), to_local_naive(data_fim))
+    
+    if status_filtro:
+        query["status"] = status_filtro
+    if profissional_id:
+        query["profissional_id"] = {"$in": variantes_id(profissional_id)}
+    
+    return resposta_exportacao(
+        linhas_agendamentos(db, query), formato, CAMPOS_AGENDAMENTO, "agendamentos"
+    )
 
 @router.get("/{agendamento_id}", response_model=AgendamentoExpandido)
 async def obter_agendamento(
@@ -94,34 +112,10 @@ async def obter_agendamento(
         raise HTTPException(status_code=404, detail="Agendamento não encontrado")
     
     # Buscar dados relacionados
-    cliente = None
-    if agendamento.get("cliente_id"):
-        try:
-            cliente_id = ObjectId(agendamento["cliente_id"]) if ObjectId.is_valid(agendamento["cliente_id"]) else agendamento["cliente_id"]
-            cliente = await db.clientes.find_one({"_id": cliente_id})
-        except:
-            pass
-    
-    profissional = None
-    try:
-        prof_id = ObjectId(agendamento["profissional_id"]) if ObjectId.is_valid(agendamento["profissional_id"]) else agendamento["profissional_id"]
-        profissional = await db.profissionais.find_one({"_id": prof_id})
-    except:
-        pass
-    
-    servico = None
-    try:
-        serv_id = ObjectId(agendamento["servico_id"]) if ObjectId.is_valid(agendamento["servico_id"]) else agendamento["servico_id"]
-        servico = await db.servicos.find_one({"_id": serv_id})
-    except:
-        pass
+    await hidratar_agendamentos(db, [agendamento])
     
     agendamento["_id"] = str(agendamento["_id"])
     agendamento["id"] = str(agendamento["_id"])  # Adicionar id também para compatibilidade
-    agendamento["cliente_nome"] = cliente["nome"] if cliente else "Cliente não informado"
-    agendamento["profissional_nome"] = profissional["nome"] if profissional else "Profissional não encontrado"
-    agendamento["servico_nome"] = servico["nome"] if servico else "Serviço não encontrado"
-    agendamento["duracao"] = servico["duracao"] if servico else 0
     
     return AgendamentoExpandido(**agendamento)
 
@@ -144,25 +138,40 @@ async def criar_agendamento(
     if not cliente:
         raise HTTPException(status_code=404, detail="Cliente não encontrado")
     
-    profissional = await db.profissionais.find_one({"_id": ObjectId(agendamento_data.profissional_id)})
+    profissional = await buscar_por_id(db, "profissionais", agendamento_data.profissional_id)
     if not profissional:
         raise HTTPException(status_code=404, detail="Profissional não encontrado")
     
-    servico = await db.servicos.find_one({"_id": ObjectId(agendamento_data.servico_id)})
+    servico = await buscar_por_id(db, "servicos", agendamento_data.servico_id)
     if not servico:
         raise HTTPException(status_code=404, detail="Serviço não encontrado")
     
     agendamento_dict = agendamento_data.model_dump()
     
-    # Converter data_hora para datetime local (sem UTC)
-    if isinstance(agendamento_dict.get("data_hora"), str):
-        agendamento_dict["data_hora"] = parse_datetime_local(agendamento_dict["data_hora"])
+    # Snapshot de nomes, valor e duração no momento do agendamento
+    agendamento_dict.update(montar_snapshot(cliente, profissional, servico))
+    
+    # Converter data_hora para datetime local (sem UTC): o pydantic já entrega
+    # datetime, com timezone quando o cliente envia "Z" ou offset
+    agendamento_dict["data_hora"] = data_hora_local(agendamento_dict.get("data_hora"))
     
+    agendamento_dict["_id"] = ObjectId()
     agendamento_dict["criado_em"] = now_local().replace(tzinfo=None)
     agendamento_dict["atualizado_em"] = now_local().replace(tzinfo=None)
     
-    result = await db.agendamentos.insert_one(agendamento_dict)
+    # Recusar horários que se sobrepõem a outro agendamento do profissional
+    if await verificar_conflito_agendamento(db, agendamento_dict):
+        raise HTTPException(status_code=409, detail="Horário não disponível para o profissional")
+    
+    # Reservar o horário do profissional em volta da gravação
+    try:
+        async with reservar_horario(db, None, agendamento_dict):
+            result = await db.agendamentos.insert_one(agendamento_dict)
+    except HorarioIndisponivel:
+        raise HTTPException(status_code=409, detail="Horário não disponível para o profissional")
+    invalidar_agenda(agendamento_dict)
     created_agendamento = await db.agendamentos.find_one({"_id": result.inserted_id})
+    await registrar_alteracao(db, None, created_agendamento)
     created_agendamento["_id"] = str(created_agendamento["_id"])
     
     return Agendamento(**created_agendamento)
@@ -184,20 +193,41 @@ async def atualizar_agendamento(
         raise HTTPException(status_code=400, detail="Nenhum dado para atualizar")
     
     # Converter data_hora para datetime local (sem UTC)
-    if "data_hora" in update_data and isinstance(update_data["data_hora"], str):
-        update_data["data_hora"] = parse_datetime_local(update_data["data_hora"])
+    if "data_hora" in update_data:
+        update_data["data_hora"] = data_hora_local(update_data["data_hora"])
+    
+    # Atualizar o snapshot das referências alteradas
+    referencias = {campo: update_data[campo] for campo in RELACIONAMENTOS if campo in update_data}
+    if referencias:
+        update_data.update(await snapshot_referencias(db, referencias))
     
     update_data["atualizado_em"] = now_local().replace(tzinfo=None)
     
-    result = await db.agendamentos.update_one(
-        {"_id": ObjectId(agendamento_id)},
-        {"$set": update_data}
-    )
+    # Remarcação, troca de profissional/serviço ou mudança de status: ajustar as reservas
+    atual = None
+    if CAMPOS_RESERVA.intersection(update_data):
+        atual = await db.agendamentos.find_one({"_id": ObjectId(agendamento_id)})
+        if atual is None:
+            raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+        if await verificar_conflito_agendamento(db, {**atual, **update_data}, ignorar_id=atual["_id"]):
+            raise HTTPException(status_code=409, detail="Horário não disponível para o profissional")
     
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    # Se a atualização falhar ou não encontrar o agendamento, as reservas voltam ao que eram
+    try:
+        async with reservar_horario(db, atual, {**atual, **update_data} if atual else None):
+            agendamento_anterior = await db.agendamentos.find_one_and_update(
+                {"_id": ObjectId(agendamento_id)},
+                {"$set": update_data},
+                return_document=ReturnDocument.BEFORE
+            )
+            if agendamento_anterior is None:
+                raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    except HorarioIndisponivel:
+        raise HTTPException(status_code=409, detail="Horário não disponível para o profissional")
     
     updated_agendamento = await db.agendamentos.find_one({"_id": ObjectId(agendamento_id)})
+    invalidar_agenda(agendamento_anterior, updated_agendamento)
+    await registrar_alteracao(db, agendamento_anterior, updated_agendamento)
     updated_agendamento["_id"] = str(updated_agendamento["_id"])
     
     return Agendamento(**updated_agendamento)
@@ -212,9 +242,13 @@ async def deletar_agendamento(
     if not ObjectId.is_valid(agendamento_id):
         raise HTTPException(status_code=400, detail="ID inválido")
     
-    result = await db.agendamentos.delete_one({"_id": ObjectId(agendamento_id)})
+    agendamento_removido = await db.agendamentos.find_one_and_delete({"_id": ObjectId(agendamento_id)})
     
-    if result.deleted_count == 0:
+    if agendamento_removido is None:
         raise HTTPException(status_code=404, detail="Agendamento não encontrado")
     
+    await liberar_agendamento(db, agendamento_removido["_id"])
+    invalidar_agenda(agendamento_removido)
+    await registrar_alteracao(db, agendamento_removido, None)
+    
     return None
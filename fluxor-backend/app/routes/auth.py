@@ -1,21 +1,43 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from datetime import timedelta, datetime
 from bson import ObjectId
 
-from app.schemas import LoginRequest, TokenResponse, UsuarioCreate, Usuario, UsuarioUpdate
-from app.core.security import verify_password, get_password_hash, create_access_token, decode_token
+from app.schemas import LoginRequest, RefreshTokenRequest, TokenResponse, UsuarioCreate, Usuario, UsuarioUpdate
+from app.core.security import (
+    verify_and_update_password, get_password_hash_async, create_access_token, create_refresh_token, decode_token,
+    claims_usuario, revogar_tokens_usuario, token_revogado, CLAIMS_USUARIO, TOKEN_ACESSO, TOKEN_REFRESH
+)
 from app.database.mongodb import get_database
 from app.core.config import get_settings
+from app.services.sincronizacao import REVOGACOES, avisar_workers
 
 settings = get_settings()
 router = APIRouter(prefix="/auth", tags=["Autenticação"])
 security = HTTPBearer()
 
+# Novo par de tokens após PUT /auth/me (o corpo continua sendo o Usuario)
+HEADER_ACCESS_TOKEN = "X-Access-Token"
+HEADER_REFRESH_TOKEN = "X-Refresh-Token"
+
+# Campos do próprio usuário que só um admin pode alterar
+CAMPOS_ADMIN = ("tipo", "ativo")
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
     payload = decode_token(token)
     
+    if payload.get("type", TOKEN_ACESSO) != TOKEN_ACESSO or token_revogado(payload):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido ou expirado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # Modo stateless: o próprio token carrega os dados do usuário
+    if settings.AUTH_STATELESS and all(campo in payload for campo in CLAIMS_USUARIO):
+        return Usuario(_id=payload["sub"], **{campo: payload[campo] for campo in CLAIMS_USUARIO})
+    
     db = get_database()
     user_id = payload.get("sub")
     user = await db.usuarios.find_one({"_id": ObjectId(user_id)})
@@ -29,12 +51,30 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     user["_id"] = str(user["_id"])
     return Usuario(**user)
 
+def gerar_tokens(user: dict) -> dict:
+    """Gera access token (com os dados do usuário no modo stateless) e refresh token"""
+    user_id = str(user["_id"])
+    dados = claims_usuario(user) if settings.AUTH_STATELESS else {"sub": user_id}
+    
+    return {
+        "access_token": create_access_token(
+            data=dados,
+            expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        ),
+        "refresh_token": create_refresh_token(user_id),
+        "token_type": "bearer"
+    }
+
 @router.post("/login", response_model=TokenResponse)
 async def login(login_data: LoginRequest):
     db = get_database()
     user = await db.usuarios.find_one({"email": login_data.email})
     
-    if not user or not verify_password(login_data.senha, user["senha"]):
+    senha_valida, novo_hash = (False, None)
+    if user:
+        senha_valida, novo_hash = await verify_and_update_password(login_data.senha, user["senha"])
+    
+    if not senha_valida:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou senha incorretos"
@@ -46,20 +86,58 @@ async def login(login_data: LoginRequest):
             detail="Usuário inativo"
         )
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user["_id"])},
-        expires_delta=access_token_expires
-    )
+    # Parâmetros do bcrypt mudaram: regravar o hash de forma transparente
+    if novo_hash:
+        await db.usuarios.update_one({"_id": user["_id"]}, {"$set": {"senha": novo_hash}})
+    
+    tokens = gerar_tokens(user)
     
     user["_id"] = str(user["_id"])
     del user["senha"]
     
-    return TokenResponse(
-        access_token=access_token,
-        token_type="bearer",
-        usuario=Usuario(**user)
-    )
+    return TokenResponse(**tokens, usuario=Usuario(**user))
+
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh(refresh_data: RefreshTokenRequest):
+    payload = decode_token(refresh_data.refresh_token)
+    
+    if payload.get("type") != TOKEN_REFRESH or not ObjectId.is_valid(payload.get("sub", "")):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    db = get_database()
+    user = await db.usuarios.find_one({"_id": ObjectId(payload["sub"])})
+    
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuário não encontrado"
+        )
+    
+    if not user.get("ativo", True):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Usuário inativo"
+        )
+    
+    # Refresh tokens emitidos antes de uma revogação (PUT /auth/me) deixam de valer.
+    # O instante gravado no usuário vale para todos os workers.
+    if payload.get("iat", 0) <= user.get("tokens_revogados_em", 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token revogado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    tokens = gerar_tokens(user)
+    
+    user["_id"] = str(user["_id"])
+    del user["senha"]
+    
+    return TokenResponse(**tokens, usuario=Usuario(**user))
 
 @router.post("/register", response_model=Usuario, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UsuarioCreate):
@@ -75,7 +153,7 @@ async def register(user_data: UsuarioCreate):
             )
         
         user_dict = user_data.model_dump()
-        user_dict["senha"] = get_password_hash(user_data.senha)
+        user_dict["senha"] = await get_password_hash_async(user_data.senha)
         user_dict["criado_em"] = datetime.utcnow()
         user_dict["atualizado_em"] = datetime.utcnow()
         
@@ -101,23 +179,46 @@ async def get_me(current_user: Usuario = Depends(get_current_user)):
 @router.put("/me", response_model=Usuario)
 async def update_me(
     user_update: UsuarioUpdate,
+    response: Response,
     current_user: Usuario = Depends(get_current_user)
 ):
     db = get_database()
     
     update_data = {k: v for k, v in user_update.model_dump().items() if v is not None}
     
+    if current_user.tipo != "admin" and any(campo in update_data for campo in CAMPOS_ADMIN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Apenas administradores podem alterar tipo ou status"
+        )
+    
     if "senha" in update_data:
-        update_data["senha"] = get_password_hash(update_data["senha"])
+        update_data["senha"] = await get_password_hash_async(update_data["senha"])
     
     update_data["atualizado_em"] = datetime.utcnow()
+    # Access e refresh tokens emitidos com os dados antigos deixam de valer;
+    # um novo par volta nos headers X-Access-Token e X-Refresh-Token
+    update_data["tokens_revogados_em"] = revogar_tokens_usuario(current_user.id)
     
     await db.usuarios.update_one(
         {"_id": ObjectId(current_user.id)},
         {"$set": update_data}
     )
+    await avisar_workers(REVOGACOES)
     
     updated_user = await db.usuarios.find_one({"_id": ObjectId(current_user.id)})
+    
+    # Usuário desativado: os tokens já foram revogados e nenhum novo é emitido
+    if not updated_user.get("ativo", True):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Usuário inativo"
+        )
+    
+    tokens = gerar_tokens(updated_user)
+    response.headers[HEADER_ACCESS_TOKEN] = tokens["access_token"]
+    response.headers[HEADER_REFRESH_TOKEN] = tokens["refresh_token"]
+    
     updated_user["_id"] = str(updated_user["_id"])
     del updated_user["senha"]
     
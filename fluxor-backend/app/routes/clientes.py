@@ -1,18 +1,29 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Response, Query, status
+from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime
 
 from app.schemas import Cliente, ClienteCreate, ClienteUpdate, Usuario
 from app.database.mongodb import get_database
 from app.routes.auth import get_current_user
+from app.core.serializacao import resposta_lista
+from app.services.campos import DESCRICAO_FIELDS, campos_solicitados, modelo_parcial, permitidos_do_modelo, projecao_mongo
+from app.services.paginacao import ORDENACAO_CADASTRO, paginar
+from app.services.snapshots import propagar_nome
+
+# Campos aceitos em ?fields=
+CAMPOS_CLIENTES = permitidos_do_modelo(Cliente)
 
 router = APIRouter(prefix="/clientes", tags=["Clientes"])
 
 @router.get("/", response_model=List[Cliente])
 async def listar_clientes(
-    skip: int = 0,
+    response: Response,
+    skip: int = Query(0, deprecated=True, description="Use cursor"),
     limit: int = 100,
+    cursor: Optional[str] = None,
+    incluir_total: bool = False,
+    fields: Optional[str] = Query(None, description=DESCRICAO_FIELDS),
     ativo: bool = None,
     current_user: Usuario = Depends(get_current_user)
 ):
@@ -22,12 +33,18 @@ async def listar_clientes(
     if ativo is not None:
         query["ativo"] = ativo
     
-    clientes = await db.clientes.find(query).skip(skip).limit(limit).to_list(length=limit)
+    campos = campos_solicitados(fields, CAMPOS_CLIENTES)
+    
+    clientes = await paginar(
+        response, db.clientes, query, ORDENACAO_CADASTRO, limit,
+        cursor=cursor, skip=skip, incluir_total=incluir_total,
+        projecao=projecao_mongo(campos)
+    )
     
     for cliente in clientes:
         cliente["_id"] = str(cliente["_id"])
     
-    return [Cliente(**cliente) for cliente in clientes]
+    return resposta_lista(clientes, modelo_parcial(Cliente, campos), headers=response.headers)
 
 @router.get("/{cliente_id}", response_model=Cliente)
 async def obter_cliente(
@@ -68,6 +85,7 @@ async def criar_cliente(
 async def atualizar_cliente(
     cliente_id: str,
     cliente_update: ClienteUpdate,
+    background_tasks: BackgroundTasks,
     current_user: Usuario = Depends(get_current_user)
 ):
     db = get_database()
@@ -90,6 +108,10 @@ async def atualizar_cliente(
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Cliente não encontrado")
     
+    # Renomeação: atualizar o nome gravado nos agendamentos em segundo plano
+    if "nome" in update_data:
+        background_tasks.add_task(propagar_nome, db, "cliente_id", cliente_id, update_data["nome"])
+    
     updated_cliente = await db.clientes.find_one({"_id": ObjectId(cliente_id)})
     updated_cliente["_id"] = str(updated_cliente["_id"])
     
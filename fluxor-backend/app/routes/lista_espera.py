@@ -1,18 +1,31 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Response, Query, status
+from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime
 
 from app.schemas import ListaEspera, ListaEsperaCreate, ListaEsperaUpdate, ListaEsperaExpandida, Usuario
 from app.database.mongodb import get_database
 from app.routes.auth import get_current_user
+from app.core.serializacao import resposta_lista
+from app.services.campos import (
+    DEPENDENCIAS_LISTA_ESPERA, DESCRICAO_FIELDS, campos_solicitados, modelo_parcial, permitidos_do_modelo, projecao_mongo
+)
+from app.services.hidratacao import hidratar_lista_espera
+from app.services.paginacao import ORDENACAO_LISTA_ESPERA, paginar
+
+# Campos aceitos em ?fields=
+CAMPOS_LISTA_ESPERA = permitidos_do_modelo(ListaEsperaExpandida)
 
 router = APIRouter(prefix="/lista-espera", tags=["Lista de Espera"])
 
 @router.get("/", response_model=List[ListaEsperaExpandida])
 async def listar_lista_espera(
-    skip: int = 0,
+    response: Response,
+    skip: int = Query(0, deprecated=True, description="Use cursor"),
     limit: int = 100,
+    cursor: Optional[str] = None,
+    incluir_total: bool = False,
+    fields: Optional[str] = Query(None, description=DESCRICAO_FIELDS),
     status_filtro: str = None,
     prioridade: str = None,
     current_user: Usuario = Depends(get_current_user)
@@ -29,24 +42,20 @@ async def listar_lista_espera(
         except ValueError:
             pass
     
-    lista_espera = await db.lista_espera.find(query).sort("prioridade", -1).skip(skip).limit(limit).to_list(length=limit)
+    campos = campos_solicitados(fields, CAMPOS_LISTA_ESPERA)
+    
+    lista_espera = await paginar(
+        response, db.lista_espera, query, ORDENACAO_LISTA_ESPERA, limit,
+        cursor=cursor, skip=skip, incluir_total=incluir_total,
+        projecao=projecao_mongo(campos, DEPENDENCIAS_LISTA_ESPERA)
+    )
+    
+    await hidratar_lista_espera(db, lista_espera, campos)
     
-    resultado = []
     for item in lista_espera:
-        # Buscar dados relacionados
-        cliente = await db.clientes.find_one({"_id": ObjectId(item["cliente_id"])})
-        servico = await db.servicos.find_one({"_id": ObjectId(item["servico_id"])})
-        
         item["_id"] = str(item["_id"])
-        item["cliente_nome"] = cliente["nome"] if cliente else "Cliente não encontrado"
-        item["cliente_telefone"] = cliente["telefone"] if cliente else ""
-        item["servico_nome"] = servico["nome"] if servico else "Serviço não encontrado"
-        item["profissional_id"] = None
-        item["profissional_nome"] = None
-        
-        resultado.append(ListaEsperaExpandida(**item))
-    
-    return resultado
+    
+    return resposta_lista(lista_espera, modelo_parcial(ListaEsperaExpandida, campos), headers=response.headers)
 
 @router.get("/{item_id}", response_model=ListaEsperaExpandida)
 async def obter_item_lista_espera(
@@ -64,15 +73,9 @@ async def obter_item_lista_espera(
         raise HTTPException(status_code=404, detail="Item não encontrado")
     
     # Buscar dados relacionados
-    cliente = await db.clientes.find_one({"_id": ObjectId(item["cliente_id"])})
-    servico = await db.servicos.find_one({"_id": ObjectId(item["servico_id"])})
+    await hidratar_lista_espera(db, [item])
     
     item["_id"] = str(item["_id"])
-    item["cliente_nome"] = cliente["nome"] if cliente else "Cliente não encontrado"
-    item["cliente_telefone"] = cliente["telefone"] if cliente else ""
-    item["servico_nome"] = servico["nome"] if servico else "Serviço não encontrado"
-    item["profissional_id"] = None
-    item["profissional_nome"] = None
     
     return ListaEsperaExpandida(**item)
 
@@ -1,18 +1,31 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Response, Query, status
+from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime
 
 from app.schemas import Profissional, ProfissionalCreate, ProfissionalUpdate, Usuario
 from app.database.mongodb import get_database
 from app.routes.auth import get_current_user
+from app.core.serializacao import resposta_lista
+from app.services.campos import DESCRICAO_FIELDS, campos_solicitados, modelo_parcial, permitidos_do_modelo, projecao_mongo
+from app.services.cache import invalidar_referencia
+from app.services.sincronizacao import REFERENCIAS, avisar_workers
+from app.services.paginacao import ORDENACAO_CADASTRO, paginar
+from app.services.snapshots import propagar_nome
+
+# Campos aceitos em ?fields=
+CAMPOS_PROFISSIONAIS = permitidos_do_modelo(Profissional)
 
 router = APIRouter(prefix="/profissionais", tags=["Profissionais"])
 
 @router.get("/", response_model=List[Profissional])
 async def listar_profissionais(
-    skip: int = 0,
+    response: Response,
+    skip: int = Query(0, deprecated=True, description="Use cursor"),
     limit: int = 100,
+    cursor: Optional[str] = None,
+    incluir_total: bool = False,
+    fields: Optional[str] = Query(None, description=DESCRICAO_FIELDS),
     ativo: bool = None,
     current_user: Usuario = Depends(get_current_user)
 ):
@@ -22,12 +35,18 @@ async def listar_profissionais(
     if ativo is not None:
         query["ativo"] = ativo
     
-    profissionais = await db.profissionais.find(query).skip(skip).limit(limit).to_list(length=limit)
+    campos = campos_solicitados(fields, CAMPOS_PROFISSIONAIS)
+    
+    profissionais = await paginar(
+        response, db.profissionais, query, ORDENACAO_CADASTRO, limit,
+        cursor=cursor, skip=skip, incluir_total=incluir_total,
+        projecao=projecao_mongo(campos)
+    )
     
     for profissional in profissionais:
         profissional["_id"] = str(profissional["_id"])
     
-    return [Profissional(**profissional) for profissional in profissionais]
+    return resposta_lista(profissionais, modelo_parcial(Profissional, campos), headers=response.headers)
 
 @router.get("/{profissional_id}", response_model=Profissional)
 async def obter_profissional(
@@ -59,6 +78,8 @@ async def criar_profissional(
     profissional_dict["atualizado_em"] = datetime.utcnow()
     
     result = await db.profissionais.insert_one(profissional_dict)
+    invalidar_referencia("profissionais", result.inserted_id)
+    await avisar_workers(REFERENCIAS)
     created_profissional = await db.profissionais.find_one({"_id": result.inserted_id})
     created_profissional["_id"] = str(created_profissional["_id"])
     
@@ -68,6 +89,7 @@ async def criar_profissional(
 async def atualizar_profissional(
     profissional_id: str,
     profissional_update: ProfissionalUpdate,
+    background_tasks: BackgroundTasks,
     current_user: Usuario = Depends(get_current_user)
 ):
     db = get_database()
@@ -87,9 +109,16 @@ async def atualizar_profissional(
         {"$set": update_data}
     )
     
+    invalidar_referencia("profissionais", profissional_id)
+    await avisar_workers(REFERENCIAS)
+    
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Profissional não encontrado")
     
+    # Renomeação: atualizar o nome gravado nos agendamentos em segundo plano
+    if "nome" in update_data:
+        background_tasks.add_task(propagar_nome, db, "profissional_id", profissional_id, update_data["nome"])
+    
     updated_profissional = await db.profissionais.find_one({"_id": ObjectId(profissional_id)})
     updated_profissional["_id"] = str(updated_profissional["_id"])
     
@@ -106,6 +135,8 @@ async def deletar_profissional(
         raise HTTPException(status_code=400, detail="ID inválido")
     
     result = await db.profissionais.delete_one({"_id": ObjectId(profissional_id)})
+    invalidar_referencia("profissionais", profissional_id)
+    await avisar_workers(REFERENCIAS)
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Profissional não encontrado")
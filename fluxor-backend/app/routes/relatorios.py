@@ -1,23 +1,152 @@
+import asyncio
 from fastapi import APIRouter, Depends, Query
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 from bson import ObjectId
 
 from app.schemas import Usuario
-from app.database.mongodb import get_database
+from app.database.mongodb import get_database, get_database_relatorios
 from app.routes.auth import get_current_user
+from app.core.config import get_settings
+from app.core.timezone import now_local, inicio_do_dia, to_local_naive
+from app.services.hidratacao import carregar_relacionados, obter_relacionado
+from app.services.exportacao import lotes_de, resposta_exportacao
+from app.services.metricas import buckets_agendamentos, totalizar
+from app.services.rollups import buckets_por_dia, totais_por_status
 
+settings = get_settings()
 router = APIRouter(prefix="/relatorios", tags=["Relatórios"])
 
+# Status exibidos em agendamentos_por_status no dashboard
+STATUS_DASHBOARD = ["agendado", "confirmado", "finalizado", "cancelado"]
+
+
+def pipeline_dashboard(hoje: datetime, amanha: datetime, data_inicio: datetime) -> List[Dict]:
+    """
+    Agregação única com as métricas de agendamentos do período do dashboard:
+    agendamentos de hoje, receita, duração média e finalizados/cancelados.
+    O $match inicial limita a leitura ao período pelo índice de data_hora
+    (hoje está dentro do período); a contagem por status de todo o histórico
+    fica em contar_por_status.
+    """
+    return [
+        {"$match": {"data_hora": {"$gte": data_inicio, "$lt": amanha}}},
+        {"$project": {"data_hora": 1, "status": 1, "servico_id": 1, "valor": 1, "duracao": 1}},
+        {
+            "$facet": {
+                "hoje": [
+                    {"$match": {"data_hora": {"$gte": hoje}}},
+                    {"$count": "total"}
+                ],
+                "periodo_por_status": [
+                    {"$match": {"status": {"$in": ["finalizado", "cancelado"]}}},
+                    {"$group": {"_id": "$status", "total": {"$sum": 1}}}
+                ],
+                "finalizados": [
+                    {"$match": {"status": "finalizado"}},
+                    {
+                        "$addFields": {
+                            "servico_object_id": {
+                                "$convert": {"input": "$servico_id", "to": "objectId", "onError": "$servico_id"}
+                            }
+                        }
+                    },
+                    {
+                        "$lookup": {
+                            "from": "servicos",
+                            "localField": "servico_object_id",
+                            "foreignField": "_id",
+                            "as": "servico_info"
+                        }
+                    },
+                    {"$unwind": {"path": "$servico_info", "preserveNullAndEmptyArrays": True}},
+                    {
+                        "$group": {
+                            "_id": None,
+                            # Snapshot do agendamento; serviço apenas para documentos antigos
+                            "receita": {"$sum": {"$ifNull": ["$valor", "$servico_info.valor", 0]}},
+                            "duracao_media": {"$avg": {"$ifNull": ["$duracao", "$servico_info.duracao", 0]}}
+                        }
+                    }
+                ]
+            }
+        }
+    ]
+
+
+async def contar_por_status(db) -> Dict[str, int]:
+    """Contagem por status de todo o histórico (count pelo índice status_atualizado_em)"""
+    totais = await asyncio.gather(*[
+        db.agendamentos.count_documents({"status": status}) for status in STATUS_DASHBOARD
+    ])
+    return dict(zip(STATUS_DASHBOARD, totais))
+
+
+async def metricas_dashboard_facet(db, hoje: datetime, amanha: datetime, data_inicio: datetime) -> Dict:
+    """Métricas de agendamentos do dashboard a partir dos agendamentos ($facet)"""
+    resultado, por_status = await asyncio.gather(
+        db.agendamentos.aggregate(pipeline_dashboard(hoje, amanha, data_inicio)).to_list(1),
+        contar_por_status(db),
+    )
+    metricas = resultado[0] if resultado else {}
+    
+    finalizados = metricas["finalizados"][0] if metricas.get("finalizados") else {}
+    periodo_por_status = {item["_id"]: item["total"] for item in metricas.get("periodo_por_status", [])}
+    
+    return {
+        "agendamentos_hoje": metricas["hoje"][0]["total"] if metricas.get("hoje") else 0,
+        "por_status": por_status,
+        "receita": finalizados.get("receita", 0),
+        "duracao_media": finalizados.get("duracao_media"),
+        "finalizados_no_periodo": periodo_por_status.get("finalizado", 0),
+        "cancelados_no_periodo": periodo_por_status.get("cancelado", 0),
+    }
+
+
+async def metricas_dashboard_rollups(db, hoje: datetime, amanha: datetime, data_inicio: datetime) -> Dict:
+    """Métricas de agendamentos do dashboard a partir dos rollups diários"""
+    buckets, por_status = await asyncio.gather(
+        buckets_por_dia(db, data_inicio, amanha - timedelta(microseconds=1)),
+        totais_por_status(db),
+    )
+    periodo = totalizar(buckets)
+    finalizados = periodo["por_status"].get("finalizado", 0)
+    
+    return {
+        "agendamentos_hoje": buckets[hoje]["total"] if hoje in buckets else 0,
+        "por_status": por_status,
+        "receita": periodo["receita"].get("finalizado", 0),
+        "duracao_media": periodo["minutos"].get("finalizado", 0) / finalizados if finalizados else None,
+        "finalizados_no_periodo": finalizados,
+        "cancelados_no_periodo": periodo["por_status"].get("cancelado", 0),
+    }
+
+
+async def buckets_periodo(
+    db,
+    inicio: datetime,
+    fim: datetime,
+    profissional_id: Optional[str] = None
+) -> Dict[datetime, Dict]:
+    """
+    Métricas por dia local no intervalo [inicio, fim] (fim inclusivo).
+    Datas com timezone são convertidas para o horário local em que data_hora é armazenado.
+    """
+    inicio, fim = to_local_naive(inicio), to_local_naive(fim)
+    if settings.RELATORIOS_USAR_ROLLUPS:
+        return await buckets_por_dia(db, inicio, fim, profissional_id)
+    return await buckets_agendamentos(db, inicio, fim + timedelta(microseconds=1), profissional_id)
+
+
 @router.get("/dashboard", response_model=Dict)
 async def obter_dados_dashboard(
     periodo: str = Query("ultimos-7-dias", description="Período: ultimos-7-dias, ultimos-30-dias, este-mes"),
     current_user: Usuario = Depends(get_current_user)
 ):
-    db = get_database()
+    db = get_database_relatorios()
     
-    # Calcular datas baseado no período
-    hoje = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    # Calcular datas baseado no período (dias locais, como data_hora é armazenado)
+    hoje = inicio_do_dia(now_local().replace(tzinfo=None))
     amanha = hoje + timedelta(days=1)
     
     if periodo == "ultimos-7-dias":
@@ -29,116 +158,42 @@ async def obter_dados_dashboard(
     else:
         data_inicio = hoje - timedelta(days=7)
     
-    # Total de clientes ativos
-    total_clientes = await db.clientes.count_documents({"ativo": True})
-    
-    # Total de profissionais ativos
-    total_profissionais = await db.profissionais.count_documents({"ativo": True})
-    
-    # Total de serviços ativos
-    total_servicos = await db.servicos.count_documents({"ativo": True})
-    
-    # Agendamentos de hoje
-    agendamentos_hoje = await db.agendamentos.count_documents({
-        "data_hora": {"$gte": hoje, "$lt": amanha}
-    })
-    
-    # Agendamentos por status
-    agendamentos_agendados = await db.agendamentos.count_documents({"status": "agendado"})
-    agendamentos_confirmados = await db.agendamentos.count_documents({"status": "confirmado"})
-    agendamentos_finalizados = await db.agendamentos.count_documents({"status": "finalizado"})
-    agendamentos_cancelados = await db.agendamentos.count_documents({"status": "cancelado"})
-    
-    # Lista de espera
-    total_lista_espera = await db.lista_espera.count_documents({"status": "aguardando"})
+    # Métricas de agendamentos (rollups ou uma única agregação $facet),
+    # executadas em paralelo com os totais das demais coleções
+    if settings.RELATORIOS_USAR_ROLLUPS:
+        metricas_agendamentos = metricas_dashboard_rollups(db, hoje, amanha, data_inicio)
+    else:
+        metricas_agendamentos = metricas_dashboard_facet(db, hoje, amanha, data_inicio)
+    
+    (
+        metricas,
+        total_clientes,
+        total_profissionais,
+        total_servicos,
+        total_lista_espera,
+    ) = await asyncio.gather(
+        metricas_agendamentos,
+        db.clientes.count_documents({"ativo": True}),
+        db.profissionais.count_documents({"ativo": True}),
+        db.servicos.count_documents({"ativo": True}),
+        db.lista_espera.count_documents({"status": "aguardando"}),
+    )
+    
+    agendamentos_hoje = metricas["agendamentos_hoje"]
+    por_status = metricas["por_status"]
     
     # ====== ESTATÍSTICAS ADICIONAIS ======
     
-    # Receita mensal (soma dos valores dos SERVIÇOS dos agendamentos finalizados no período)
-    receita_pipeline = [
-        {
-            "$match": {
-                "status": "finalizado",
-                "data_hora": {"$gte": data_inicio, "$lt": amanha}
-            }
-        },
-        {
-            "$addFields": {
-                "servico_object_id": {"$toObjectId": "$servico_id"}
-            }
-        },
-        {
-            "$lookup": {
-                "from": "servicos",
-                "localField": "servico_object_id",
-                "foreignField": "_id",
-                "as": "servico_info"
-            }
-        },
-        {
-            "$unwind": {"path": "$servico_info", "preserveNullAndEmptyArrays": True}
-        },
-        {
-            "$group": {
-                "_id": None,
-                "total": {"$sum": {"$ifNull": ["$servico_info.valor", 0]}}
-            }
-        }
-    ]
-    receita_result = await db.agendamentos.aggregate(receita_pipeline).to_list(1)
-    receita_mensal = receita_result[0]["total"] if receita_result else 0
-    
-    # Tempo médio das consultas (duração do serviço vinculado)
-    tempo_pipeline = [
-        {
-            "$match": {
-                "status": "finalizado",
-                "data_hora": {"$gte": data_inicio, "$lt": amanha}
-            }
-        },
-        {
-            "$addFields": {
-                "servico_object_id": {"$toObjectId": "$servico_id"}
-            }
-        },
-        {
-            "$lookup": {
-                "from": "servicos",
-                "localField": "servico_object_id",
-                "foreignField": "_id",
-                "as": "servico_info"
-            }
-        },
-        {
-            "$unwind": {"path": "$servico_info", "preserveNullAndEmptyArrays": True}
-        },
-        {
-            "$group": {
-                "_id": None,
-                "media": {"$avg": {"$ifNull": ["$servico_info.duracao", 0]}}
-            }
-        }
-    ]
-    tempo_result = await db.agendamentos.aggregate(tempo_pipeline).to_list(1)
-    tempo_medio = int(tempo_result[0]["media"]) if tempo_result and tempo_result[0]["media"] else None
+    # Receita e tempo médio (valor/duração dos agendamentos finalizados no período)
+    receita_mensal = metricas["receita"]
+    tempo_medio = int(metricas["duracao_media"]) if metricas["duracao_media"] else None
     
-    # Taxa de comparecimento no período
-    total_no_periodo = await db.agendamentos.count_documents({
-        "data_hora": {"$gte": data_inicio, "$lt": amanha},
-        "status": {"$in": ["finalizado", "cancelado"]}
-    })
-    finalizados_no_periodo = await db.agendamentos.count_documents({
-        "data_hora": {"$gte": data_inicio, "$lt": amanha},
-        "status": "finalizado"
-    })
+    # Taxa de comparecimento e No-Show (cancelados / total) no período
+    finalizados_no_periodo = metricas["finalizados_no_periodo"]
+    cancelados_no_periodo = metricas["cancelados_no_periodo"]
+    total_no_periodo = finalizados_no_periodo + cancelados_no_periodo
     
     taxa_comparecimento = (finalizados_no_periodo / total_no_periodo * 100) if total_no_periodo > 0 else 0
-    
-    # Taxa de No-Show (cancelados / total)
-    cancelados_no_periodo = await db.agendamentos.count_documents({
-        "data_hora": {"$gte": data_inicio, "$lt": amanha},
-        "status": "cancelado"
-    })
     no_show = (cancelados_no_periodo / total_no_periodo * 100) if total_no_periodo > 0 else 0
     
     # Satisfação (simulada por enquanto - 4.5 de 5)
@@ -149,12 +204,7 @@ async def obter_dados_dashboard(
         "total_profissionais": total_profissionais,
         "total_servicos": total_servicos,
         "agendamentos_hoje": agendamentos_hoje,
-        "agendamentos_por_status": {
-            "agendado": agendamentos_agendados,
-            "confirmado": agendamentos_confirmados,
-            "finalizado": agendamentos_finalizados,
-            "cancelado": agendamentos_cancelados
-        },
+        "agendamentos_por_status": {status: por_status.get(status, 0) for status in STATUS_DASHBOARD},
         "total_lista_espera": total_lista_espera,
         # Estatísticas adicionais
         "receita_mensal": receita_mensal,
@@ -170,38 +220,18 @@ async def obter_resumo(
     data_fim: datetime,
     current_user: Usuario = Depends(get_current_user)
 ):
-    db = get_database()
+    db = get_database_relatorios()
     
-    # Agendamentos no período
-    total_agendamentos = await db.agendamentos.count_documents({
-        "data_hora": {"$gte": data_inicio, "$lte": data_fim}
-    })
-    
-    # Agendamentos confirmados
-    agendamentos_confirmados = await db.agendamentos.count_documents({
-        "data_hora": {"$gte": data_inicio, "$lte": data_fim},
-        "status": {"$in": ["confirmado", "finalizado"]}
-    })
+    periodo = totalizar(await buckets_periodo(db, data_inicio, data_fim))
     
-    # Calcular receita total
-    agendamentos_finalizados = await db.agendamentos.find({
-        "data_hora": {"$gte": data_inicio, "$lte": data_fim},
-        "status": "finalizado"
-    }).to_list(length=None)
-    
-    receita_total = 0
-    for agendamento in agendamentos_finalizados:
-        servico = await db.servicos.find_one({"_id": agendamento["servico_id"]})
-        if servico:
-            receita_total += servico.get("valor", 0)
-    
-    ticket_medio = receita_total / len(agendamentos_finalizados) if agendamentos_finalizados else 0
+    finalizados = periodo["por_status"].get("finalizado", 0)
+    receita_total = periodo["receita"].get("finalizado", 0)
     
     return {
-        "total_agendamentos": total_agendamentos,
-        "agendamentos_confirmados": agendamentos_confirmados,
+        "total_agendamentos": periodo["total"],
+        "agendamentos_confirmados": finalizados + periodo["por_status"].get("confirmado", 0),
         "receita_total": receita_total,
-        "ticket_medio": ticket_medio
+        "ticket_medio": receita_total / finalizados if finalizados else 0
     }
 
 @router.get("/agendamentos-por-periodo")
@@ -210,21 +240,13 @@ async def obter_agendamentos_por_periodo(
     data_fim: datetime,
     current_user: Usuario = Depends(get_current_user)
 ):
-    db = get_database()
-    
-    agendamentos = await db.agendamentos.find({
-        "data_hora": {"$gte": data_inicio, "$lte": data_fim}
-    }).to_list(length=1000)
+    db = get_database_relatorios()
     
-    # Agrupar por status
-    por_status = {}
-    for agendamento in agendamentos:
-        status = agendamento.get("status", "agendado")
-        por_status[status] = por_status.get(status, 0) + 1
+    periodo = totalizar(await buckets_periodo(db, data_inicio, data_fim))
     
     return {
-        "total": len(agendamentos),
-        "por_status": por_status,
+        "total": periodo["total"],
+        "por_status": {status: total for status, total in periodo["por_status"].items() if total},
         "periodo": {
             "inicio": data_inicio,
             "fim": data_fim
@@ -237,35 +259,57 @@ async def obter_receita_por_periodo(
     data_fim: datetime,
     current_user: Usuario = Depends(get_current_user)
 ):
-    db = get_database()
+    db = get_database_relatorios()
     
-    agendamentos = await db.agendamentos.find({
-        "data_hora": {"$gte": data_inicio, "$lte": data_fim},
-        "status": "finalizado"
-    }).to_list(length=1000)
-    
-    receita_total = 0
-    for agendamento in agendamentos:
-        servico = await db.servicos.find_one({"_id": agendamento.get("servico_id")})
-        if servico:
-            receita_total += servico.get("valor", 0)
+    periodo = totalizar(await buckets_periodo(db, data_inicio, data_fim))
     
     return {
-        "receita_total": receita_total,
-        "total_atendimentos": len(agendamentos),
+        "receita_total": periodo["receita"].get("finalizado", 0),
+        "total_atendimentos": periodo["por_status"].get("finalizado", 0),
         "periodo": {
             "inicio": data_inicio,
             "fim": data_fim
         }
     }
 
+STATUS_AGENDAMENTO = ["agendado", "confirmado", "em_atendimento", "finalizado", "cancelado"]
+CAMPOS_EXPORTACAO_DIARIA = ["dia", "total", *STATUS_AGENDAMENTO, "receita", "minutos"]
+
+
+@router.get("/exportar")
+async def exportar_metricas_diarias(
+    data_inicio: datetime,
+    data_fim: datetime,
+    formato: str = Query("csv", regex="^(ndjson|csv)$"),
+    profissional_id: Optional[str] = None,
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Exporta as métricas por dia do período (total, por status, receita e minutos finalizados)"""
+    db = get_database_relatorios()
+    
+    filtro_profissional = profissional_id if profissional_id != "todos" else None
+    buckets = await buckets_periodo(db, data_inicio, data_fim, filtro_profissional)
+    
+    linhas = []
+    for dia in sorted(buckets):
+        bucket = buckets[dia]
+        linhas.append({
+            "dia": dia.date().isoformat(),
+            "total": bucket["total"],
+            **{status: bucket["por_status"].get(status, 0) for status in STATUS_AGENDAMENTO},
+            "receita": bucket["receita"].get("finalizado", 0),
+            "minutos": bucket["minutos"].get("finalizado", 0),
+        })
+    
+    return resposta_exportacao(lotes_de(linhas), formato, CAMPOS_EXPORTACAO_DIARIA, "metricas_diarias")
+
 @router.get("/atividades-recentes", response_model=List[Dict])
 async def obter_atividades_recentes(
     limit: int = Query(10, le=50),
     current_user: Usuario = Depends(get_current_user)
 ):
     """Retorna as atividades recentes do sistema"""
-    db = get_database()
+    db = get_database_relatorios()
     atividades = []
     
     # Buscar últimos clientes criados
@@ -287,24 +331,15 @@ async def obter_atividades_recentes(
         {"status": "confirmado"}
     ).sort("atualizado_em", -1).limit(2).to_list(length=2)
     
+    # Relacionados lidos do primário: entram nos caches de referência compartilhados
+    relacionados = await carregar_relacionados(get_database(), agendamentos_confirmados, {
+        "cliente_id": "clientes",
+        "profissional_id": "profissionais",
+    })
+    
     for agendamento in agendamentos_confirmados:
-        cliente_id = agendamento.get("cliente_id")
-        cliente = None
-        if cliente_id:
-            try:
-                cliente_oid = ObjectId(cliente_id) if ObjectId.is_valid(cliente_id) else cliente_id
-                cliente = await db.clientes.find_one({"_id": cliente_oid})
-            except:
-                pass
-        
-        profissional_id = agendamento.get("profissional_id")
-        profissional = None
-        if profissional_id:
-            try:
-                prof_oid = ObjectId(profissional_id) if ObjectId.is_valid(profissional_id) else profissional_id
-                profissional = await db.profissionais.find_one({"_id": prof_oid})
-            except:
-                pass
+        cliente = obter_relacionado(relacionados["cliente_id"], agendamento.get("cliente_id"))
+        profissional = obter_relacionado(relacionados["profissional_id"], agendamento.get("profissional_id"))
         
         tempo_diff = datetime.utcnow() - agendamento.get("atualizado_em", datetime.utcnow())
         
@@ -326,15 +361,12 @@ async def obter_atividades_recentes(
         {"status": "cancelado"}
     ).sort("atualizado_em", -1).limit(2).to_list(length=2)
     
+    relacionados = await carregar_relacionados(get_database(), agendamentos_cancelados, {
+        "cliente_id": "clientes",
+    })
+    
     for agendamento in agendamentos_cancelados:
-        cliente_id = agendamento.get("cliente_id")
-        cliente = None
-        if cliente_id:
-            try:
-                cliente_oid = ObjectId(cliente_id) if ObjectId.is_valid(cliente_id) else cliente_id
-                cliente = await db.clientes.find_one({"_id": cliente_oid})
-            except:
-                pass
+        cliente = obter_relacionado(relacionados["cliente_id"], agendamento.get("cliente_id"))
         
         tempo_diff = datetime.utcnow() - agendamento.get("atualizado_em", datetime.utcnow())
         data_hora = agendamento.get("data_hora")
@@ -364,7 +396,7 @@ async def obter_proximos_agendamentos(
     current_user: Usuario = Depends(get_current_user)
 ):
     """Retorna os próximos agendamentos"""
-    db = get_database()
+    db = get_database_relatorios()
     
     # Filtro base: agendamentos futuros
     agora = datetime.utcnow()
@@ -383,27 +415,16 @@ async def obter_proximos_agendamentos(
     
     agendamentos = await db.agendamentos.find(filtro).sort("data_hora", 1).limit(limit).to_list(length=limit)
     
+    relacionados = await carregar_relacionados(get_database(), agendamentos, {
+        "cliente_id": "clientes",
+        "servico_id": "servicos",
+    })
+    
     resultado = []
     for agendamento in agendamentos:
-        # Buscar cliente (pode ser None para agendamentos públicos)
-        cliente_id = agendamento.get("cliente_id")
-        cliente = None
-        if cliente_id:
-            try:
-                cliente_oid = ObjectId(cliente_id) if ObjectId.is_valid(cliente_id) else cliente_id
-                cliente = await db.clientes.find_one({"_id": cliente_oid})
-            except:
-                pass
-        
-        # Buscar serviço (obrigatório)
-        servico_id = agendamento.get("servico_id")
-        servico = None
-        if servico_id:
-            try:
-                servico_oid = ObjectId(servico_id) if ObjectId.is_valid(servico_id) else servico_id
-                servico = await db.servicos.find_one({"_id": servico_oid})
-            except:
-                pass
+        # Cliente pode ser None para agendamentos públicos; serviço é obrigatório
+        cliente = obter_relacionado(relacionados["cliente_id"], agendamento.get("cliente_id"))
+        servico = obter_relacionado(relacionados["servico_id"], agendamento.get("servico_id"))
         
         # Pular apenas se não tem serviço
         if not servico:
@@ -452,10 +473,10 @@ async def obter_dados_grafico(
     current_user: Usuario = Depends(get_current_user)
 ):
     """Retorna dados para o gráfico de receita vs consultas"""
-    db = get_database()
+    db = get_database_relatorios()
     
-    # Calcular datas
-    hoje = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    # Calcular datas (dias locais, como data_hora é armazenado)
+    hoje = inicio_do_dia(now_local().replace(tzinfo=None))
     
     if periodo == "ultimos-7-dias":
         data_inicio = hoje - timedelta(days=6)
@@ -470,20 +491,6 @@ async def obter_dados_grafico(
         data_fim = hoje + timedelta(days=1)
         num_pontos = hoje.day
     
-    # Filtro base
-    filtro = {
-        "data_hora": {"$gte": data_inicio, "$lt": data_fim}
-    }
-    
-    # Filtro opcional por profissional
-    if profissional_id and profissional_id != "todos":
-        try:
-            filtro["profissional_id"] = ObjectId(profissional_id)
-        except:
-            pass
-    
-    agendamentos = await db.agendamentos.find(filtro).to_list(length=None)
-    
     # Inicializar arrays de dados
     labels = []
     receitas = [0.0] * num_pontos
@@ -498,29 +505,15 @@ async def obter_dados_grafico(
         else:
             labels.append(data.strftime("%d/%m"))
     
-    # Processar agendamentos
-    for agendamento in agendamentos:
-        data_hora = agendamento.get("data_hora")
-        if not data_hora:
-            continue
-        
-        # Calcular índice do dia
-        dias_diff = (data_hora.replace(hour=0, minute=0, second=0, microsecond=0) - data_inicio).days
+    # Filtro opcional por profissional
+    filtro_profissional = profissional_id if profissional_id != "todos" else None
+    buckets = await buckets_periodo(db, data_inicio, data_fim - timedelta(microseconds=1), filtro_profissional)
+    
+    for dia, bucket in buckets.items():
+        dias_diff = (dia - data_inicio).days
         if 0 <= dias_diff < num_pontos:
-            consultas[dias_diff] += 1
-            
-            # Somar receita se finalizado
-            if agendamento.get("status") == "finalizado":
-                servico_id = agendamento.get("servico_id")
-                # Tentar converter para ObjectId se for string
-                try:
-                    if isinstance(servico_id, str):
-                        servico_id = ObjectId(servico_id)
-                except:
-                    pass
-                servico = await db.servicos.find_one({"_id": servico_id})
-                if servico:
-                    receitas[dias_diff] += servico.get("valor", 0)
+            consultas[dias_diff] = bucket["total"]
+            receitas[dias_diff] = float(bucket["receita"].get("finalizado", 0))
     
     return {
         "labels": labels,
@@ -1,18 +1,31 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Response, Query, status
+from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime
 
 from app.schemas import Servico, ServicoCreate, ServicoUpdate, Usuario
 from app.database.mongodb import get_database
 from app.routes.auth import get_current_user
+from app.core.serializacao import resposta_lista
+from app.services.campos import DESCRICAO_FIELDS, campos_solicitados, modelo_parcial, permitidos_do_modelo, projecao_mongo
+from app.services.cache import invalidar_referencia
+from app.services.sincronizacao import REFERENCIAS, avisar_workers
+from app.services.paginacao import ORDENACAO_CADASTRO, paginar
+from app.services.snapshots import propagar_nome
+
+# Campos aceitos em ?fields=
+CAMPOS_SERVICOS = permitidos_do_modelo(Servico)
 
 router = APIRouter(prefix="/servicos", tags=["Serviços"])
 
 @router.get("/", response_model=List[Servico])
 async def listar_servicos(
-    skip: int = 0,
+    response: Response,
+    skip: int = Query(0, deprecated=True, description="Use cursor"),
     limit: int = 100,
+    cursor: Optional[str] = None,
+    incluir_total: bool = False,
+    fields: Optional[str] = Query(None, description=DESCRICAO_FIELDS),
     ativo: bool = None,
     current_user: Usuario = Depends(get_current_user)
 ):
@@ -22,12 +35,18 @@ async def listar_servicos(
     if ativo is not None:
         query["ativo"] = ativo
     
-    servicos = await db.servicos.find(query).skip(skip).limit(limit).to_list(length=limit)
+    campos = campos_solicitados(fields, CAMPOS_SERVICOS)
+    
+    servicos = await paginar(
+        response, db.servicos, query, ORDENACAO_CADASTRO, limit,
+        cursor=cursor, skip=skip, incluir_total=incluir_total,
+        projecao=projecao_mongo(campos)
+    )
     
     for servico in servicos:
         servico["_id"] = str(servico["_id"])
     
-    return [Servico(**servico) for servico in servicos]
+    return resposta_lista(servicos, modelo_parcial(Servico, campos), headers=response.headers)
 
 @router.get("/{servico_id}", response_model=Servico)
 async def obter_servico(
@@ -59,6 +78,8 @@ async def criar_servico(
     servico_dict["atualizado_em"] = datetime.utcnow()
     
     result = await db.servicos.insert_one(servico_dict)
+    invalidar_referencia("servicos", result.inserted_id)
+    await avisar_workers(REFERENCIAS)
     created_servico = await db.servicos.find_one({"_id": result.inserted_id})
     created_servico["_id"] = str(created_servico["_id"])
     
@@ -68,6 +89,7 @@ async def criar_servico(
 async def atualizar_servico(
     servico_id: str,
     servico_update: ServicoUpdate,
+    background_tasks: BackgroundTasks,
     current_user: Usuario = Depends(get_current_user)
 ):
     db = get_database()
@@ -87,9 +109,16 @@ async def atualizar_servico(
         {"$set": update_data}
     )
     
+    invalidar_referencia("servicos", servico_id)
+    await avisar_workers(REFERENCIAS)
+    
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Serviço não encontrado")
     
+    # Renomeação: atualizar o nome gravado nos agendamentos em segundo plano
+    if "nome" in update_data:
+        background_tasks.add_task(propagar_nome, db, "servico_id", servico_id, update_data["nome"])
+    
     updated_servico = await db.servicos.find_one({"_id": ObjectId(servico_id)})
     updated_servico["_id"] = str(updated_servico["_id"])
     
@@ -106,6 +135,8 @@ async def deletar_servico(
         raise HTTPException(status_code=400, detail="ID inválido")
     
     result = await db.servicos.delete_one({"_id": ObjectId(servico_id)})
+    invalidar_referencia("servicos", servico_id)
+    await avisar_workers(REFERENCIAS)
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Serviço não encontrado")
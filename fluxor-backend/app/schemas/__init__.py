@@ -8,7 +8,7 @@ from .profissional import ProfissionalBase, ProfissionalCreate, ProfissionalUpda
 from .servico import ServicoBase, ServicoCreate, ServicoUpdate, Servico
 from .agendamento import AgendamentoBase, AgendamentoCreate, AgendamentoUpdate, Agendamento, AgendamentoExpandido
 from .lista_espera import ListaEsperaBase, ListaEsperaCreate, ListaEsperaUpdate, ListaEspera, ListaEsperaExpandida
-from .auth import LoginRequest, TokenResponse
+from .auth import LoginRequest, RefreshTokenRequest, TokenResponse
 
 
 __all__ = [
@@ -55,5 +55,6 @@ __all__ = [
     
     # Auth
     "LoginRequest",
+    "RefreshTokenRequest",
     "TokenResponse",
 ]
@@ -1,6 +1,7 @@
 """
 Schemas de Autenticação
 """
+from typing import Optional
 from pydantic import BaseModel, EmailStr
 from .usuario import Usuario
 
@@ -10,7 +11,12 @@ class LoginRequest(BaseModel):
     senha: str
 
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str
     usuario: Usuario
+    refresh_token: Optional[str] = None
@@ -0,0 +1,117 @@
+"""
+Buffer de contadores de acesso dos links de agendamento
+
+As rotas públicas contam acessos em memória, agregados por token, sem
+escrever no MongoDB durante a requisição. Os incrementos acumulados são
+gravados periodicamente com um único bulk_write não ordenado (um $inc por
+token) e uma última vez no shutdown da aplicação.
+
+Incrementos ainda não gravados (pendentes + lote em gravação) nunca passam de
+ACESSOS_MAXIMO_NAO_GRAVADOS: ao atingir o limite, a requisição espera uma
+gravação. Esse é o máximo que se perde se o processo cair. Com o MongoDB fora
+do ar, os incrementos acima do limite são descartados e contados.
+"""
+import asyncio
+from collections import Counter
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from app.core.config import get_settings
+from app.database.mongodb import get_database
+
+settings = get_settings()
+
+
+class BufferAcessos:
+    """Agrega incrementos de acessos por token e grava em lote"""
+
+    def __init__(self, maximo_nao_gravados: int):
+        self.maximo_nao_gravados = maximo_nao_gravados
+        self.pendentes: Counter = Counter()
+        self.total_pendentes = 0
+        self.em_gravacao = 0
+        self.gravados = 0
+        self.descartados = 0
+        self._trava = asyncio.Lock()
+
+    @property
+    def nao_gravados(self) -> int:
+        return self.total_pendentes + self.em_gravacao
+
+    async def registrar(self, token: str):
+        """Conta um acesso ao link; só espera o banco se o limite de não gravados foi atingido"""
+        if self.nao_gravados >= self.maximo_nao_gravados:
+            async with self._trava:
+                # Outra requisição pode ter gravado enquanto esta esperava a trava
+                if self.nao_gravados >= self.maximo_nao_gravados:
+                    await self._gravar()
+                if self.nao_gravados >= self.maximo_nao_gravados:
+                    self.descartados += 1
+                    return
+        self.pendentes[token] += 1
+        self.total_pendentes += 1
+
+    async def descarregar(self) -> int:
+        """Grava os incrementos pendentes em um único bulk_write; retorna quantos foram gravados"""
+        async with self._trava:
+            return await self._gravar()
+
+    async def _gravar(self) -> int:
+        if not self.pendentes:
+            return 0
+        lote, self.pendentes = self.pendentes, Counter()
+        self.em_gravacao, self.total_pendentes = self.total_pendentes, 0
+        try:
+            await get_database().links_agendamento.bulk_write(
+                [
+                    UpdateOne({"token": token, "ativo": True}, {"$inc": {"acessos": quantidade}})
+                    for token, quantidade in lote.items()
+                ],
+                ordered=False
+            )
+        except BaseException as e:
+            # Devolve o lote para a próxima tentativa (inclusive se a tarefa foi cancelada)
+            self.pendentes.update(lote)
+            self.total_pendentes += self.em_gravacao
+            self.em_gravacao = 0
+            if not isinstance(e, Exception):
+                raise
+            print(f"✗ Erro ao gravar contadores de acesso: {e}")
+            return 0
+        gravados, self.em_gravacao = self.em_gravacao, 0
+        self.gravados += gravados
+        return gravados
+
+
+buffer_acessos = BufferAcessos(settings.ACESSOS_MAXIMO_NAO_GRAVADOS)
+
+_tarefa_descarga: Optional[asyncio.Task] = None
+
+
+async def _descarregar_periodicamente():
+    while True:
+        await asyncio.sleep(settings.ACESSOS_INTERVALO_GRAVACAO_SEGUNDOS)
+        await buffer_acessos.descarregar()
+
+
+def iniciar_gravacao_acessos():
+    """Inicia a gravação periódica dos contadores (chamado no startup da aplicação)"""
+    global _tarefa_descarga
+    if _tarefa_descarga is None:
+        _tarefa_descarga = asyncio.create_task(_descarregar_periodicamente())
+
+
+async def encerrar_gravacao_acessos():
+    """Para a gravação periódica e grava o que restou (chamado no shutdown, antes de fechar o MongoDB)"""
+    global _tarefa_descarga
+    if _tarefa_descarga is not None:
+        _tarefa_descarga.cancel()
+        try:
+            await _tarefa_descarga
+        except asyncio.CancelledError:
+            pass
+        _tarefa_descarga = None
+    gravados = await buffer_acessos.descarregar()
+    if gravados:
+        print(f"✓ {gravados} acessos de links gravados no encerramento")
@@ -0,0 +1,162 @@
+"""
+Cache em memória para dados de referência (serviços e profissionais)
+
+Serviços e profissionais mudam raramente e são lidos em quase toda requisição.
+O cache é limitado (LRU), com expiração por TTL e contadores de acerto/erro.
+As rotas de escrita chamam invalidar_referencia para manter o cache coerente.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+class CacheTTL:
+    """Cache LRU limitado com expiração por TTL"""
+
+    def __init__(self, nome: str, tamanho_maximo: int, ttl_segundos: float):
+        self.nome = nome
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl_segundos = ttl_segundos
+        self.acertos = 0
+        self.erros = 0
+        self._itens: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def obter(self, chave: Hashable) -> Tuple[bool, Any]:
+        """Retorna (encontrado, valor). Itens expirados contam como erro."""
+        item = self._itens.get(chave)
+        if item is None:
+            self.erros += 1
+            return False, None
+
+        expira_em, valor = item
+        if expira_em < time.monotonic():
+            del self._itens[chave]
+            self.erros += 1
+            return False, None
+
+        self._itens.move_to_end(chave)
+        self.acertos += 1
+        return True, valor
+
+    def definir(self, chave: Hashable, valor: Any, ttl_segundos: Optional[float] = None):
+        """Armazena um valor, removendo o menos usado se o limite for atingido"""
+        ttl = self.ttl_segundos if ttl_segundos is None else ttl_segundos
+        self._itens[chave] = (time.monotonic() + ttl, valor)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.tamanho_maximo:
+            self._itens.popitem(last=False)
+
+    def invalidar(self, chave: Hashable):
+        """Remove uma chave do cache"""
+        self._itens.pop(chave, None)
+
+    def invalidar_prefixo(self, prefixo: Hashable):
+        """Remove as chaves em tupla cujo primeiro elemento é o prefixo"""
+        for chave in [c for c in self._itens if isinstance(c, tuple) and c and c[0] == prefixo]:
+            del self._itens[chave]
+
+    def limpar(self):
+        """Remove todos os itens do cache"""
+        self._itens.clear()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Contadores de uso do cache"""
+        total = self.acertos + self.erros
+        return {
+            "nome": self.nome,
+            "tamanho": len(self._itens),
+            "tamanho_maximo": self.tamanho_maximo,
+            "acertos": self.acertos,
+            "erros": self.erros,
+            "taxa_acerto": round(self.acertos / total, 4) if total else 0.0,
+        }
+
+
+# Documentos indexados pelo _id em string
+CACHES_REFERENCIA: Dict[str, CacheTTL] = {
+    colecao: CacheTTL(
+        colecao,
+        tamanho_maximo=settings.CACHE_REFERENCIA_TAMANHO_MAXIMO,
+        ttl_segundos=settings.CACHE_REFERENCIA_TTL_SEGUNDOS,
+    )
+    for colecao in ("servicos", "profissionais")
+}
+
+# Listagens derivadas (ex: serviços ativos), indexadas por (coleção, nome da listagem)
+cache_listagens = CacheTTL(
+    "listagens",
+    tamanho_maximo=64,
+    ttl_segundos=settings.CACHE_REFERENCIA_TTL_SEGUNDOS,
+)
+
+
+# Agendas de profissionais por dia usadas na detecção de conflitos,
+# indexadas por (profissional_id, dia). TTL curto: as reservas de horário
+# garantem a exclusão mútua, este cache só evita consultas repetidas.
+cache_agendas = CacheTTL(
+    "agendas",
+    tamanho_maximo=settings.CACHE_AGENDAS_TAMANHO_MAXIMO,
+    ttl_segundos=settings.CACHE_AGENDAS_TTL_SEGUNDOS,
+)
+
+
+# Tokens de links de agendamento -> cliente_id do link ativo, ou None para
+# tokens desconhecidos/inativos (cache negativo, com TTL menor)
+cache_tokens = CacheTTL(
+    "tokens",
+    tamanho_maximo=settings.CACHE_TOKENS_TAMANHO_MAXIMO,
+    ttl_segundos=settings.CACHE_TOKENS_TTL_SEGUNDOS,
+)
+
+# Respostas serializadas do catálogo público, indexadas por
+# (nome do catálogo, parâmetro, versão do catálogo)
+cache_catalogo = CacheTTL(
+    "catalogo",
+    tamanho_maximo=256,
+    ttl_segundos=settings.CACHE_REFERENCIA_TTL_SEGUNDOS,
+)
+
+# Versão do catálogo público: muda a cada escrita em serviços ou profissionais
+_versao_catalogo = 0
+
+
+def versao_catalogo() -> int:
+    """Versão atual do catálogo público (serviços e profissionais)"""
+    return _versao_catalogo
+
+
+def obter_cache_referencia(colecao: str) -> Optional[CacheTTL]:
+    """Retorna o cache da coleção, se ela for de referência"""
+    return CACHES_REFERENCIA.get(colecao)
+
+
+def invalidar_referencia(colecao: str, documento_id: Any = None):
+    """
+    Invalida um documento de referência e todas as listagens da coleção.
+    Deve ser chamada após qualquer POST/PUT/DELETE em serviços ou profissionais.
+    Também avança a versão do catálogo público.
+    """
+    global _versao_catalogo
+    _versao_catalogo += 1
+
+    cache = CACHES_REFERENCIA.get(colecao)
+    if cache is not None:
+        if documento_id is None:
+            cache.limpar()
+        else:
+            cache.invalidar(str(documento_id))
+
+    cache_listagens.invalidar_prefixo(colecao)
+
+
+def estatisticas_caches() -> Dict[str, Dict[str, Any]]:
+    """Estatísticas de todos os caches de referência"""
+    caches = list(CACHES_REFERENCIA.values()) + [cache_listagens, cache_agendas, cache_catalogo, cache_tokens]
+    return {cache.nome: cache.estatisticas() for cache in caches}
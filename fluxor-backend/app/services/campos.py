@@ -0,0 +1,100 @@
+"""
+Campos esparsos nas listagens (?fields=)
+
+As tabelas do frontend mostram poucas colunas, mas as listagens buscavam e
+serializavam documentos inteiros. Com ?fields=nome,telefone a listagem:
+  - valida os campos contra a allowlist (as chaves do modelo de resposta);
+  - busca só esses campos no MongoDB (projeção), mais os que a ordenação e a
+    hidratação precisam;
+  - responde com um modelo montado só com esses campos (mais o _id).
+Sem fields, nada muda.
+"""
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ConfigDict, create_model
+
+from app.core.serializacao import campos_resposta
+
+Campos = Tuple[str, ...]
+
+# Identificadores sempre presentes na resposta
+CAMPOS_ID = ("_id", "id")
+
+DESCRICAO_FIELDS = "Campos da resposta separados por vírgula (o _id sempre é incluído)"
+
+# Campos calculados na hidratação -> campos gravados de que dependem
+DEPENDENCIAS_AGENDAMENTO: Dict[str, Campos] = {
+    "cliente_nome": ("cliente_id",),
+    "profissional_nome": ("profissional_id",),
+    "servico_nome": ("servico_id",),
+    "duracao": ("servico_id",),
+}
+DEPENDENCIAS_LISTA_ESPERA: Dict[str, Campos] = {
+    "cliente_nome": ("cliente_id",),
+    "cliente_telefone": ("cliente_id",),
+    "servico_nome": ("servico_id",),
+}
+
+
+def permitidos_do_modelo(modelo: Type[BaseModel]) -> Campos:
+    """Allowlist de um modelo: as chaves da resposta, sem os identificadores"""
+    return tuple(chave for chave, _, _ in campos_resposta(modelo) if chave not in CAMPOS_ID)
+
+
+def campos_solicitados(fields: Optional[str], permitidos: Sequence[str]) -> Optional[Campos]:
+    """
+    Converte ?fields= em uma tupla de campos na ordem da allowlist
+    (None = todos os campos). Campos fora da allowlist geram 400.
+    """
+    if not fields:
+        return None
+    pedidos = {campo.strip() for campo in fields.split(",") if campo.strip()} - set(CAMPOS_ID)
+    invalidos = pedidos - set(permitidos)
+    if invalidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos inválidos em fields: {', '.join(sorted(invalidos))}"
+        )
+    return tuple(campo for campo in permitidos if campo in pedidos)
+
+
+def projecao_mongo(
+    campos: Optional[Campos],
+    dependencias: Optional[Dict[str, Campos]] = None
+) -> Optional[dict]:
+    """Projeção do MongoDB para os campos pedidos e os campos de que eles dependem"""
+    if campos is None:
+        return None
+    projecao = {campo: 1 for campo in campos}
+    for campo in campos:
+        for dependencia in (dependencias or {}).get(campo, ()):
+            projecao[dependencia] = 1
+    return projecao
+
+
+@lru_cache(maxsize=256)
+def modelo_parcial(modelo: Type[BaseModel], campos: Optional[Campos]) -> Type[BaseModel]:
+    """Modelo de resposta com apenas o _id e os campos pedidos (cacheado por combinação)"""
+    if campos is None:
+        return modelo
+    incluidos = set(campos) | set(CAMPOS_ID)
+    definicoes = {
+        nome: (campo.annotation, campo)
+        for nome, campo in modelo.model_fields.items()
+        if (campo.alias or nome) in incluidos
+    }
+    return create_model(
+        f"{modelo.__name__}Parcial",
+        __config__=ConfigDict(populate_by_name=True),
+        **definicoes
+    )
+
+
+def recortar(documentos: Iterable[dict], campos: Optional[Campos]) -> List[dict]:
+    """Mantém nos documentos só os identificadores e os campos pedidos"""
+    if campos is None:
+        return list(documentos)
+    chaves = CAMPOS_ID + campos
+    return [{chave: documento.get(chave) for chave in chaves if chave in documento} for documento in documentos]
@@ -0,0 +1,105 @@
+"""
+Catálogo público do agendamento online (serviços e profissionais)
+
+As respostas são montadas uma vez por versão do catálogo e guardadas já
+serializadas em bytes no cache_catalogo, junto com o ETag. A versão avança a
+cada escrita em serviços ou profissionais (invalidar_referencia), então a
+próxima leitura remonta a resposta; o TTL do cache limita o atraso para
+escritas feitas por outros processos.
+
+O ETag é o hash do corpo: processos diferentes que servem o mesmo catálogo
+geram o mesmo ETag, e um cliente com If-None-Match atual recebe 304 sem corpo.
+"""
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, List, Optional
+
+from fastapi import Request, Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.services.cache import cache_catalogo, versao_catalogo
+from app.services.hidratacao import buscar_por_id, listar_ativos
+
+# O cliente sempre revalida, mas com ETag atual a resposta é um 304 vazio
+CACHE_CONTROL_CATALOGO = "public, max-age=0, must-revalidate"
+
+
+async def catalogo_servicos(db: AsyncIOMotorDatabase) -> List[dict]:
+    """Serviços ativos no formato esperado pela página de agendamento"""
+    servicos = await listar_ativos(db, "servicos")
+    return [
+        {
+            "_id": str(s["_id"]),
+            "nome": s["nome"],
+            "tipo": s["tipo"],
+            "duracao": s["duracao"],
+            "preco": s["valor"],  # Frontend espera "preco" não "valor"
+            "descricao": s.get("descricao"),
+            "profissionais_habilitados": [str(p) for p in s.get("profissionais_habilitados", [])]
+        }
+        for s in servicos
+    ]
+
+
+async def catalogo_profissionais(db: AsyncIOMotorDatabase, servico_id: Optional[str] = None) -> List[dict]:
+    """Profissionais ativos, opcionalmente só os habilitados para o serviço"""
+    profissionais = await listar_ativos(db, "profissionais")
+
+    if servico_id:
+        servico = await buscar_por_id(db, "servicos", servico_id)
+        if servico and servico.get("profissionais_habilitados"):
+            habilitados = {str(p) for p in servico["profissionais_habilitados"]}
+            profissionais = [p for p in profissionais if str(p["_id"]) in habilitados]
+
+    return [
+        {
+            "_id": str(p["_id"]),
+            "nome": p["nome"],
+            "especialidades": p.get("especialidades", []),
+            "registro_profissional": p.get("registro_profissional")
+        }
+        for p in profissionais
+    ]
+
+
+def serializar(dados: Any) -> bytes:
+    return json.dumps(dados, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def etag_corpo(corpo: bytes) -> str:
+    return '"' + hashlib.blake2b(corpo, digest_size=12).hexdigest() + '"'
+
+
+def etag_confere(if_none_match: Optional[str], etag: str) -> bool:
+    """Verifica se algum ETag do If-None-Match (fracos inclusive) corresponde ao atual"""
+    if not if_none_match:
+        return False
+    for candidato in if_none_match.split(","):
+        candidato = candidato.strip()
+        if candidato == "*" or candidato.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+async def resposta_catalogo(
+    request: Request,
+    nome: str,
+    parametro: Optional[str],
+    montar: Callable[[], Awaitable[Any]]
+) -> Response:
+    """
+    Resposta do catálogo `nome` (variação `parametro`) a partir do cache,
+    montando e serializando com `montar` quando a versão mudou.
+    """
+    chave = (nome, parametro, versao_catalogo())
+    encontrado, item = cache_catalogo.obter(chave)
+    if not encontrado:
+        corpo = serializar(await montar())
+        item = (corpo, etag_corpo(corpo))
+        cache_catalogo.definir(chave, item)
+
+    corpo, etag = item
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL_CATALOGO}
+    if etag_confere(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=corpo, media_type="application/json", headers=headers)
@@ -0,0 +1,162 @@
+"""
+Detecção de conflitos de horário por sobreposição de intervalos
+
+Um agendamento ocupa [data_hora, data_hora + duração) e conflita com qualquer
+outro do mesmo profissional cujo intervalo se sobreponha, não apenas com os que
+começam no mesmo minuto. A agenda de cada profissional em cada dia vira um
+IndiceIntervalos (inícios ordenados + máximo acumulado dos fins), montado a
+partir de uma única consulta no índice profissional_data_status e mantido por
+alguns segundos em cache_agendas. Uma verificação é uma busca binária seguida
+de uma varredura curta para trás, sem consultar o banco quando o dia está em cache.
+
+O cache é local ao processo e invalidado nas escritas deste processo; a
+exclusão mútua entre processos continua garantida pelas reservas de horário.
+"""
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import get_settings
+from app.core.timezone import to_local_naive
+from app.services.cache import cache_agendas
+from app.services.disponibilidade import (
+    STATUS_OCUPAM_HORARIO, Ocupacao, agendamentos_ocupados, ocupacoes_por_dia
+)
+
+settings = get_settings()
+
+
+class IndiceIntervalos:
+    """
+    Intervalos ocupados de um profissional em um dia, em minutos desde a
+    meia-noite (podem ser negativos ou passar de 1440 nos que cruzam o dia).
+    """
+
+    __slots__ = ("inicios", "fins", "ids", "maximo_fim")
+
+    def __init__(self, dia: date, ocupados: List[Ocupacao]):
+        meia_noite = datetime.combine(dia, time())
+        intervalos = sorted(
+            ((o.inicio - meia_noite).total_seconds() / 60,
+             (o.fim - meia_noite).total_seconds() / 60,
+             o.agendamento_id)
+            for o in ocupados
+        ) if ocupados else []
+        self.inicios = [i for i, _, _ in intervalos]
+        self.fins = [f for _, f, _ in intervalos]
+        self.ids = [a for _, _, a in intervalos]
+        # maximo_fim[k] = maior fim entre os intervalos 0..k: permite parar a
+        # varredura assim que nenhum intervalo anterior alcança o início pedido
+        self.maximo_fim = []
+        maior = float("-inf")
+        for fim in self.fins:
+            maior = max(maior, fim)
+            self.maximo_fim.append(maior)
+
+    def __len__(self) -> int:
+        return len(self.inicios)
+
+    def sobrepostos(self, inicio: float, fim: float, ignorar: Any = None) -> List[Any]:
+        """Ids dos intervalos que se sobrepõem a [inicio, fim), exceto `ignorar`"""
+        resultado = []
+        k = bisect_left(self.inicios, fim) - 1
+        while k >= 0 and self.maximo_fim[k] > inicio:
+            if self.fins[k] > inicio and str(self.ids[k]) != ignorar:
+                resultado.append(self.ids[k])
+            k -= 1
+        return resultado
+
+
+def _dias(inicio: datetime, fim: datetime) -> List[date]:
+    """Dias tocados pelo intervalo [inicio, fim)"""
+    ultimo = (fim - timedelta(microseconds=1)).date()
+    return [inicio.date() + timedelta(days=n) for n in range((ultimo - inicio.date()).days + 1)]
+
+
+async def indices_agenda(
+    db: AsyncIOMotorDatabase,
+    profissional_id: Any,
+    dias: List[date]
+) -> Dict[date, IndiceIntervalos]:
+    """Índices dos dias pedidos; os que não estão em cache vêm de uma única consulta"""
+    profissional_id = str(profissional_id)
+    indices: Dict[date, IndiceIntervalos] = {}
+    faltantes = []
+    for dia in dias:
+        encontrado, indice = cache_agendas.obter((profissional_id, dia))
+        if encontrado:
+            indices[dia] = indice
+        else:
+            faltantes.append(dia)
+
+    if faltantes:
+        ocupados = await agendamentos_ocupados(
+            db,
+            [profissional_id],
+            datetime.combine(min(faltantes), time()),
+            datetime.combine(max(faltantes), time()) + timedelta(days=1)
+        )
+        por_dia = ocupacoes_por_dia(ocupados.get(profissional_id, []))
+        for dia in faltantes:
+            indices[dia] = IndiceIntervalos(dia, por_dia.get(dia, []))
+            cache_agendas.definir((profissional_id, dia), indices[dia])
+    return indices
+
+
+async def verificar_conflito(
+    db: AsyncIOMotorDatabase,
+    profissional_id: Any,
+    inicio: datetime,
+    duracao: Optional[int],
+    ignorar_id: Any = None
+) -> Optional[Any]:
+    """
+    Retorna o id de um agendamento ativo do profissional que se sobrepõe a
+    [inicio, inicio + duracao), ou None se o horário está livre.
+    ignorar_id exclui o próprio agendamento numa remarcação.
+    """
+    # As agendas guardam o horário local sem timezone
+    inicio = to_local_naive(inicio)
+    fim = inicio + timedelta(minutes=max(duracao or settings.DISPONIBILIDADE_PASSO_MINUTOS, 1))
+    ignorar = str(ignorar_id) if ignorar_id is not None else None
+    for dia, indice in (await indices_agenda(db, profissional_id, _dias(inicio, fim))).items():
+        meia_noite = datetime.combine(dia, time())
+        conflitos = indice.sobrepostos(
+            (inicio - meia_noite).total_seconds() / 60,
+            (fim - meia_noite).total_seconds() / 60,
+            ignorar
+        )
+        if conflitos:
+            return conflitos[0]
+    return None
+
+
+async def verificar_conflito_agendamento(
+    db: AsyncIOMotorDatabase,
+    agendamento: dict,
+    ignorar_id: Any = None
+) -> Optional[Any]:
+    """verificar_conflito para um documento de agendamento; os que não ocupam horário nunca conflitam"""
+    if agendamento.get("status", "agendado") not in STATUS_OCUPAM_HORARIO:
+        return None
+    data_hora = agendamento.get("data_hora")
+    if not isinstance(data_hora, datetime) or not agendamento.get("profissional_id"):
+        return None
+    return await verificar_conflito(
+        db, agendamento["profissional_id"], data_hora, agendamento.get("duracao"), ignorar_id
+    )
+
+
+def invalidar_agenda(*agendamentos: Optional[dict]):
+    """Descarta do cache os dias tocados pelos agendamentos (versões antes/depois de uma escrita)"""
+    for agendamento in agendamentos:
+        if not agendamento or not agendamento.get("profissional_id"):
+            continue
+        data_hora = agendamento.get("data_hora")
+        if not isinstance(data_hora, datetime):
+            continue
+        duracao = agendamento.get("duracao") or settings.DISPONIBILIDADE_PASSO_MINUTOS
+        for dia in _dias(data_hora, data_hora + timedelta(minutes=max(duracao, 1))):
+            cache_agendas.invalidar((str(agendamento["profissional_id"]), dia))
@@ -0,0 +1,282 @@
+"""
+Motor de disponibilidade de horários
+
+Cada dia de um profissional é representado por um bitmap de 1440 bits (um por
+minuto, bit i = minuto i do dia) guardado em um int do Python:
+  1. os bits do horário de trabalho (horario_trabalho) são ligados;
+  2. os intervalos ocupados pelos agendamentos (data_hora + duração real) são desligados;
+  3. um início s é válido se os bits [s, s + duração do serviço) estão todos ligados,
+     o que é calculado para todos os minutos de uma vez com operações de bits.
+
+Formato aceito em horario_trabalho (todas as chaves são opcionais):
+    {"segunda": {"inicio": "08:00", "fim": "18:00",
+                 "pausas": [{"inicio": "12:00", "fim": "13:00"}]},
+     "sabado": ["08:00-12:00"],
+     "domingo": None}
+Os dias podem ser nomeados por extenso, abreviados (seg, ter, ...) ou por
+número (0 = segunda). Um dia ausente ou nulo é folga. Sem horario_trabalho,
+ou com apenas {"inicio", "fim"} no topo, o mesmo horário vale para todos os dias.
+"""
+import unicodedata
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import get_settings
+from app.core.timezone import now_local
+from app.services.hidratacao import buscar_por_ids, obter_relacionado, variantes_id
+
+settings = get_settings()
+
+MINUTOS_DIA = 24 * 60
+STATUS_OCUPAM_HORARIO = ["agendado", "confirmado", "em_atendimento"]
+HORARIO_PADRAO = [(8 * 60, 18 * 60)]
+DIAS_SEMANA = ["seg", "ter", "qua", "qui", "sex", "sab", "dom"]
+
+# Agendamentos do dia anterior podem invadir o início do dia consultado
+MARGEM_AGENDAMENTO_ANTERIOR = timedelta(hours=12)
+
+Intervalo = Tuple[int, int]
+
+
+class Ocupacao(NamedTuple):
+    """Intervalo [inicio, fim) ocupado por um agendamento"""
+    inicio: datetime
+    fim: datetime
+    agendamento_id: Any
+
+
+def _minutos(texto: str) -> int:
+    """Converte "HH:MM" em minutos desde a meia-noite ("24:00" = fim do dia)"""
+    horas, minutos = str(texto).strip().split(":")[:2]
+    return min(MINUTOS_DIA, int(horas) * 60 + int(minutos))
+
+
+def _indice_dia(chave: Any) -> Optional[int]:
+    """Índice do dia da semana (0 = segunda) para chaves como "Terça", "ter" ou "1" """
+    texto = unicodedata.normalize("NFKD", str(chave)).encode("ascii", "ignore").decode().strip().lower()
+    if texto.isdigit():
+        return int(texto) if int(texto) < 7 else None
+    return DIAS_SEMANA.index(texto[:3]) if texto[:3] in DIAS_SEMANA else None
+
+
+def _intervalos(valor: Any) -> List[Intervalo]:
+    """Normaliza a configuração de um dia para uma lista de intervalos em minutos"""
+    if not valor:
+        return []
+    if isinstance(valor, str):
+        inicio, fim = valor.split("-")
+        return [(_minutos(inicio), _minutos(fim))]
+    if isinstance(valor, (list, tuple)):
+        return [intervalo for item in valor for intervalo in _intervalos(item)]
+    if isinstance(valor, dict):
+        if valor.get("ativo") is False or not valor.get("inicio") or not valor.get("fim"):
+            return []
+        intervalos = [(_minutos(valor["inicio"]), _minutos(valor["fim"]))]
+        pausas = list(valor.get("pausas") or [])
+        if valor.get("intervalo_inicio") and valor.get("intervalo_fim"):
+            pausas.append({"inicio": valor["intervalo_inicio"], "fim": valor["intervalo_fim"]})
+        for pausa in pausas:
+            intervalos = subtrair(intervalos, _intervalos(pausa))
+        return intervalos
+    return []
+
+
+def subtrair(intervalos: List[Intervalo], remover: List[Intervalo]) -> List[Intervalo]:
+    """Diferença de conjuntos entre listas de intervalos semiabertos [inicio, fim)"""
+    resultado = intervalos
+    for r_inicio, r_fim in remover:
+        proximo = []
+        for inicio, fim in resultado:
+            if r_fim <= inicio or r_inicio >= fim:
+                proximo.append((inicio, fim))
+                continue
+            if inicio < r_inicio:
+                proximo.append((inicio, r_inicio))
+            if r_fim < fim:
+                proximo.append((r_fim, fim))
+        resultado = proximo
+    return resultado
+
+
+def intervalos_trabalho(horario_trabalho: Optional[dict], dia: date) -> List[Intervalo]:
+    """Intervalos de trabalho do profissional no dia informado"""
+    if not horario_trabalho:
+        return list(HORARIO_PADRAO)
+    if "inicio" in horario_trabalho and "fim" in horario_trabalho:
+        return _intervalos(horario_trabalho)
+
+    por_dia = {_indice_dia(chave): valor for chave, valor in horario_trabalho.items()}
+    por_dia.pop(None, None)
+    if not por_dia:
+        return list(HORARIO_PADRAO)
+    return _intervalos(por_dia.get(dia.weekday()))
+
+
+def mascara(inicio: int, fim: int) -> int:
+    """Bits ligados de inicio (inclusivo) a fim (exclusivo), limitados ao dia"""
+    inicio, fim = max(0, inicio), min(MINUTOS_DIA, fim)
+    if fim <= inicio:
+        return 0
+    return ((1 << (fim - inicio)) - 1) << inicio
+
+
+def bitmap(intervalos: Iterable[Intervalo]) -> int:
+    livres = 0
+    for inicio, fim in intervalos:
+        livres |= mascara(inicio, fim)
+    return livres
+
+
+def inicios_validos(livres: int, duracao: int) -> int:
+    """
+    Bit s ligado no resultado <=> os minutos [s, s + duracao) estão livres.
+    Faz AND do bitmap com ele mesmo deslocado, dobrando o alcance a cada passo
+    (O(log duracao) operações sobre o dia inteiro).
+    """
+    validos = livres
+    alcance = 1
+    while alcance < duracao:
+        deslocamento = min(alcance, duracao - alcance)
+        validos &= validos >> deslocamento
+        alcance += deslocamento
+    return validos
+
+
+def horarios_do_bitmap(validos: int, passo: int, a_partir_de: int = 0) -> List[str]:
+    """Lista os inícios válidos alinhados ao passo, no formato HH:MM"""
+    primeiro = -(-a_partir_de // passo) * passo
+    return [
+        f"{minuto // 60:02d}:{minuto % 60:02d}"
+        for minuto in range(primeiro, MINUTOS_DIA, passo)
+        if validos >> minuto & 1
+    ]
+
+
+async def agendamentos_ocupados(
+    db: AsyncIOMotorDatabase,
+    profissional_ids: List[str],
+    inicio: datetime,
+    fim: datetime
+) -> Dict[str, List[Ocupacao]]:
+    """
+    Intervalos ocupados por profissional em [inicio, fim), com uma
+    única consulta no índice profissional_data_status. A duração é a gravada no
+    agendamento; para documentos antigos, a do serviço.
+    """
+    ids = [variante for profissional_id in profissional_ids for variante in variantes_id(profissional_id)]
+    agendamentos = await db.agendamentos.find(
+        {
+            "profissional_id": {"$in": ids},
+            "data_hora": {"$gte": inicio - MARGEM_AGENDAMENTO_ANTERIOR, "$lt": fim},
+            "status": {"$in": STATUS_OCUPAM_HORARIO},
+        },
+        {"profissional_id": 1, "data_hora": 1, "duracao": 1, "servico_id": 1}
+    ).to_list(length=None)
+
+    servicos = await buscar_por_ids(db, "servicos", (
+        a.get("servico_id") for a in agendamentos if a.get("duracao") is None
+    ))
+
+    ocupados: Dict[str, List[Ocupacao]] = {}
+    for agendamento in agendamentos:
+        data_hora = agendamento.get("data_hora")
+        if not isinstance(data_hora, datetime):
+            continue
+        duracao = agendamento.get("duracao")
+        if duracao is None:
+            servico = obter_relacionado(servicos, agendamento.get("servico_id")) or {}
+            duracao = servico.get("duracao") or settings.DISPONIBILIDADE_PASSO_MINUTOS
+        ocupados.setdefault(str(agendamento["profissional_id"]), []).append(
+            Ocupacao(data_hora, data_hora + timedelta(minutes=duracao), agendamento["_id"])
+        )
+    return ocupados
+
+
+def livres_no_dia(
+    horario_trabalho: Optional[dict],
+    dia: date,
+    ocupados: List[Ocupacao]
+) -> int:
+    """Bitmap dos minutos livres do profissional no dia"""
+    meia_noite = datetime.combine(dia, time())
+    livres = bitmap(intervalos_trabalho(horario_trabalho, dia))
+    for inicio, fim, _ in ocupados:
+        inicio_min = int((inicio - meia_noite).total_seconds() // 60)
+        fim_min = -int(-(fim - meia_noite).total_seconds() // 60)
+        livres &= ~mascara(inicio_min, fim_min)
+    return livres
+
+
+def minuto_minimo(dia: date) -> int:
+    """Primeiro minuto agendável do dia: horários que já passaram não são oferecidos"""
+    agora = now_local().replace(tzinfo=None)
+    if dia < agora.date():
+        return MINUTOS_DIA
+    if dia == agora.date():
+        return agora.hour * 60 + agora.minute + 1
+    return 0
+
+
+def ocupacoes_por_dia(ocupados: List[Ocupacao]) -> Dict[date, List[Ocupacao]]:
+    """Distribui os intervalos ocupados pelos dias que eles tocam"""
+    dias: Dict[date, List[Ocupacao]] = {}
+    for ocupacao in ocupados:
+        dia = ocupacao.inicio.date()
+        while datetime.combine(dia, time()) < ocupacao.fim:
+            dias.setdefault(dia, []).append(ocupacao)
+            dia += timedelta(days=1)
+    return dias
+
+
+async def disponibilidade_periodo(
+    db: AsyncIOMotorDatabase,
+    profissionais: List[dict],
+    primeiro_dia: date,
+    ultimo_dia: date,
+    duracao: int,
+    passo: Optional[int] = None
+) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Horários disponíveis de vários profissionais em vários dias:
+    {profissional_id: {"AAAA-MM-DD": ["HH:MM", ...]}}.
+    Todos os agendamentos do período vêm de uma única consulta e cada dia de
+    cada profissional é resolvido com operações sobre o bitmap do dia inteiro.
+    """
+    passo = passo or settings.DISPONIBILIDADE_PASSO_MINUTOS
+    inicio = datetime.combine(primeiro_dia, time())
+    fim = datetime.combine(ultimo_dia, time()) + timedelta(days=1)
+    dias = [primeiro_dia + timedelta(days=n) for n in range((ultimo_dia - primeiro_dia).days + 1)]
+    minimos = {dia: minuto_minimo(dia) for dia in dias}
+
+    ocupados = await agendamentos_ocupados(db, [str(p["_id"]) for p in profissionais], inicio, fim)
+
+    resultado: Dict[str, Dict[str, List[str]]] = {}
+    for profissional in profissionais:
+        profissional_id = str(profissional["_id"])
+        ocupados_por_dia = ocupacoes_por_dia(ocupados.get(profissional_id, []))
+        resultado[profissional_id] = {
+            dia.isoformat(): horarios_do_bitmap(
+                inicios_validos(
+                    livres_no_dia(profissional.get("horario_trabalho"), dia, ocupados_por_dia.get(dia, [])),
+                    duracao
+                ),
+                passo,
+                minimos[dia]
+            )
+            for dia in dias
+        }
+    return resultado
+
+
+async def horarios_disponiveis(
+    db: AsyncIOMotorDatabase,
+    profissional: dict,
+    dia: date,
+    duracao: int,
+    passo: Optional[int] = None
+) -> List[str]:
+    """Horários (HH:MM) em que um serviço de `duracao` minutos cabe na agenda do profissional"""
+    disponibilidade = await disponibilidade_periodo(db, [profissional], dia, dia, duracao, passo)
+    return disponibilidade[str(profissional["_id"])][dia.isoformat()]
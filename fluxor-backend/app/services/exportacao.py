@@ -0,0 +1,123 @@
+"""
+Exportação em streaming (NDJSON ou CSV)
+
+As linhas são produzidas por geradores assíncronos a partir de um cursor do
+MongoDB e enviadas em blocos pelo StreamingResponse: a memória fica limitada
+ao tamanho do lote, independente do total exportado, e o primeiro byte sai
+assim que o primeiro lote é lido.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from bson import ObjectId
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.services.hidratacao import hidratar_agendamentos
+
+FORMATOS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+CAMPOS_AGENDAMENTO = [
+    "id", "data_hora", "status",
+    "cliente_id", "cliente_nome",
+    "profissional_id", "profissional_nome",
+    "servico_id", "servico_nome",
+    "valor", "duracao", "origem", "observacoes",
+    "criado_em", "atualizado_em",
+]
+
+TAMANHO_LOTE = 500
+
+
+def _valor_exportado(valor: Any) -> Any:
+    """Converte valores do MongoDB para tipos serializáveis"""
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    return valor
+
+
+def linha_agendamento(agendamento: dict) -> Dict[str, Any]:
+    agendamento["id"] = agendamento["_id"]
+    return {campo: _valor_exportado(agendamento.get(campo)) for campo in CAMPOS_AGENDAMENTO}
+
+
+async def linhas_agendamentos(
+    db: AsyncIOMotorDatabase,
+    filtro: dict,
+    tamanho_lote: int = TAMANHO_LOTE
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Percorre os agendamentos em ordem de data_hora e produz lotes de linhas já
+    hidratadas (nomes do snapshot ou buscados em lote para documentos antigos).
+    """
+    cursor = db.agendamentos.find(filtro).sort([("data_hora", 1), ("_id", 1)]).batch_size(tamanho_lote)
+    lote: List[dict] = []
+    async for agendamento in cursor:
+        lote.append(agendamento)
+        if len(lote) >= tamanho_lote:
+            await hidratar_agendamentos(db, lote)
+            yield [linha_agendamento(a) for a in lote]
+            lote = []
+    if lote:
+        await hidratar_agendamentos(db, lote)
+        yield [linha_agendamento(a) for a in lote]
+
+
+async def gerar_ndjson(lotes: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[str]:
+    async for lote in lotes:
+        yield "".join(json.dumps(linha, ensure_ascii=False) + "\n" for linha in lote)
+
+
+async def gerar_csv(lotes: AsyncIterator[List[Dict[str, Any]]], campos: List[str]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=campos, extrasaction="ignore")
+    escritor.writeheader()
+    # Cabeçalho enviado imediatamente, antes da primeira consulta terminar
+    yield buffer.getvalue()
+
+    async for lote in lotes:
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows(lote)
+        yield buffer.getvalue()
+
+
+def resposta_exportacao(
+    lotes: AsyncIterator[List[Dict[str, Any]]],
+    formato: str,
+    campos: List[str],
+    nome_arquivo: str
+) -> StreamingResponse:
+    """Monta o StreamingResponse no formato solicitado (ndjson ou csv)"""
+    conteudo = gerar_csv(lotes, campos) if formato == "csv" else gerar_ndjson(lotes)
+    return StreamingResponse(
+        conteudo,
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}.{formato}"'}
+    )
+
+
+async def lotes_de(linhas: List[Dict[str, Any]]) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Adapta uma lista já calculada (ex: buckets diários) para resposta_exportacao"""
+    for inicio in range(0, len(linhas), TAMANHO_LOTE):
+        yield linhas[inicio:inicio + TAMANHO_LOTE]
+
+
+def filtro_periodo(data_inicio: Optional[datetime], data_fim: Optional[datetime]) -> dict:
+    """Filtro de data_hora para o período informado (limites opcionais)"""
+    if not data_inicio and not data_fim:
+        return {}
+    periodo = {}
+    if data_inicio:
+        periodo["$gte"] = data_inicio
+    if data_fim:
+        periodo["$lte"] = data_fim
+    return {"data_hora": periodo}
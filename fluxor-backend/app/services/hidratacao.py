@@ -0,0 +1,203 @@
+"""
+Hidratação em lote dos relacionamentos (cliente, profissional, serviço)
+
+Em vez de um find_one por documento, reúne os IDs referenciados por uma
+página inteira, busca cada coleção uma única vez com $in e faz o join em
+memória. O número de consultas é constante, independente do tamanho da página.
+"""
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.services.cache import cache_listagens, obter_cache_referencia
+
+
+def normalizar_id(valor: Any) -> Any:
+    """Converte para ObjectId quando válido; caso contrário mantém o valor original"""
+    if isinstance(valor, str) and ObjectId.is_valid(valor):
+        return ObjectId(valor)
+    return valor
+
+
+def variantes_id(valor: Any) -> List[Any]:
+    """
+    Retorna as formas possíveis de um ID armazenado.
+    Os documentos antigos guardam IDs ora como string, ora como ObjectId.
+    """
+    if valor is None or valor == "":
+        return []
+    variantes = [valor]
+    if isinstance(valor, ObjectId):
+        variantes.append(str(valor))
+    elif isinstance(valor, str) and ObjectId.is_valid(valor):
+        variantes.append(ObjectId(valor))
+    return variantes
+
+
+async def buscar_por_ids(
+    db: AsyncIOMotorDatabase,
+    colecao: str,
+    ids: Iterable[Any],
+    projecao: Optional[dict] = None
+) -> Dict[str, dict]:
+    """
+    Busca todos os documentos de uma coleção com uma única consulta $in.
+    Retorna um dicionário indexado pelo _id em string.
+    Serviços e profissionais são servidos pelo cache de referência quando possível.
+    """
+    cache = obter_cache_referencia(colecao) if projecao is None else None
+    encontrados: Dict[str, dict] = {}
+
+    valores = []
+    vistos = set()
+    for valor in ids:
+        if valor is None or valor == "":
+            continue
+        chave = str(valor)
+        if chave in vistos:
+            continue
+        vistos.add(chave)
+
+        if cache is not None:
+            encontrado, documento = cache.obter(chave)
+            if encontrado:
+                encontrados[chave] = documento
+                continue
+
+        valores.extend(variantes_id(valor))
+
+    if valores:
+        documentos = await db[colecao].find({"_id": {"$in": valores}}, projecao).to_list(length=None)
+        for documento in documentos:
+            chave = str(documento["_id"])
+            encontrados[chave] = documento
+            if cache is not None:
+                cache.definir(chave, documento)
+
+    return encontrados
+
+
+async def buscar_por_id(db: AsyncIOMotorDatabase, colecao: str, valor: Any) -> Optional[dict]:
+    """
+    Busca um único documento aceitando ID em string ou ObjectId.
+    Retorna uma cópia, para que o chamador possa alterá-la sem afetar o cache.
+    """
+    documentos = await buscar_por_ids(db, colecao, [valor])
+    documento = documentos.get(str(valor)) if valor is not None else None
+    return dict(documento) if documento is not None else None
+
+
+async def listar_ativos(db: AsyncIOMotorDatabase, colecao: str) -> List[dict]:
+    """Lista os documentos ativos de uma coleção de referência, usando o cache de listagens"""
+    chave = (colecao, "ativos")
+    encontrado, documentos = cache_listagens.obter(chave)
+    if not encontrado:
+        documentos = await db[colecao].find({"ativo": True}).to_list(length=100)
+        cache_listagens.definir(chave, documentos)
+    return documentos
+
+
+async def carregar_relacionados(
+    db: AsyncIOMotorDatabase,
+    documentos: List[dict],
+    campos: Dict[str, str]
+) -> Dict[str, Dict[str, dict]]:
+    """
+    Carrega os relacionamentos de uma página de documentos.
+    `campos` mapeia o campo de referência para a coleção, ex: {"cliente_id": "clientes"}.
+    As coleções são consultadas em paralelo, uma consulta por coleção.
+    """
+    campos_lista = list(campos.items())
+    resultados = await asyncio.gather(*[
+        buscar_por_ids(db, colecao, (doc.get(campo) for doc in documentos))
+        for campo, colecao in campos_lista
+    ])
+    return {campo: resultado for (campo, _), resultado in zip(campos_lista, resultados)}
+
+
+def obter_relacionado(relacionados: Dict[str, dict], valor: Any) -> Optional[dict]:
+    """Obtém o documento relacionado a partir do ID armazenado (string ou ObjectId)"""
+    if valor is None:
+        return None
+    return relacionados.get(str(valor))
+
+
+async def hidratar_agendamentos(
+    db: AsyncIOMotorDatabase,
+    agendamentos: List[dict],
+    campos: Optional[Iterable[str]] = None
+) -> List[dict]:
+    """
+    Adiciona cliente_nome, profissional_nome, servico_nome e duracao aos agendamentos.
+    Os campos já gravados no agendamento (snapshot) são usados diretamente; só os
+    agendamentos sem snapshot precisam buscar os documentos relacionados.
+    Com `campos`, só os campos pedidos são preenchidos (e só as coleções deles consultadas).
+    """
+    pedidos = None if campos is None else set(campos)
+
+    def faltando(campo: str, agendamento: dict) -> bool:
+        return (pedidos is None or campo in pedidos) and agendamento.get(campo) is None
+
+    def sem(campo: str) -> List[dict]:
+        return [a for a in agendamentos if faltando(campo, a)]
+
+    clientes, profissionais, servicos = await asyncio.gather(
+        buscar_por_ids(db, "clientes", (a.get("cliente_id") for a in sem("cliente_nome"))),
+        buscar_por_ids(db, "profissionais", (a.get("profissional_id") for a in sem("profissional_nome"))),
+        buscar_por_ids(db, "servicos", (
+            a.get("servico_id") for a in agendamentos
+            if faltando("servico_nome", a) or faltando("duracao", a)
+        )),
+    )
+
+    for agendamento in agendamentos:
+        if faltando("cliente_nome", agendamento):
+            cliente = obter_relacionado(clientes, agendamento.get("cliente_id"))
+            agendamento["cliente_nome"] = cliente["nome"] if cliente else "Cliente não informado"
+        if faltando("profissional_nome", agendamento):
+            profissional = obter_relacionado(profissionais, agendamento.get("profissional_id"))
+            agendamento["profissional_nome"] = profissional["nome"] if profissional else "Profissional não encontrado"
+        if faltando("servico_nome", agendamento) or faltando("duracao", agendamento):
+            servico = obter_relacionado(servicos, agendamento.get("servico_id"))
+            if faltando("servico_nome", agendamento):
+                agendamento["servico_nome"] = servico["nome"] if servico else "Serviço não encontrado"
+            if faltando("duracao", agendamento):
+                agendamento["duracao"] = servico["duracao"] if servico else 0
+
+    return agendamentos
+
+
+async def hidratar_lista_espera(
+    db: AsyncIOMotorDatabase,
+    itens: List[dict],
+    campos: Optional[Iterable[str]] = None
+) -> List[dict]:
+    """
+    Adiciona cliente_nome, cliente_telefone e servico_nome aos itens da lista de espera.
+    Com `campos`, só as coleções dos campos pedidos são consultadas.
+    """
+    pedidos = None if campos is None else set(campos)
+    com_cliente = pedidos is None or bool(pedidos & {"cliente_nome", "cliente_telefone"})
+    com_servico = pedidos is None or "servico_nome" in pedidos
+
+    juncoes = {}
+    if com_cliente:
+        juncoes["cliente_id"] = "clientes"
+    if com_servico:
+        juncoes["servico_id"] = "servicos"
+    relacionados = await carregar_relacionados(db, itens, juncoes)
+
+    for item in itens:
+        if com_cliente:
+            cliente = obter_relacionado(relacionados["cliente_id"], item.get("cliente_id"))
+            item["cliente_nome"] = cliente["nome"] if cliente else "Cliente não encontrado"
+            item["cliente_telefone"] = cliente["telefone"] if cliente else ""
+        if com_servico:
+            servico = obter_relacionado(relacionados["servico_id"], item.get("servico_id"))
+            item["servico_nome"] = servico["nome"] if servico else "Serviço não encontrado"
+        item["profissional_id"] = None
+        item["profissional_nome"] = None
+
+    return itens
@@ -0,0 +1,63 @@
+"""
+Validação dos tokens de links de agendamento
+
+As rotas públicas validam o token a cada requisição, várias vezes por página.
+O resultado fica em cache_tokens: token -> cliente_id do link ativo, ou None
+para tokens desconhecidos ou inativos, guardados por menos tempo para que
+tokens inventados não cheguem ao banco a cada tentativa.
+As rotas que criam, trocam ou desativam links chamam invalidar_tokens, que
+também avisa os outros workers (com o atraso da sincronização); por isso o
+agendamento, que não pode aceitar um link desativado, consulta o banco.
+"""
+from typing import Any, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import get_settings
+from app.services.cache import cache_tokens
+from app.services.sincronizacao import TOKENS, avisar_workers
+
+settings = get_settings()
+
+# Token usado pela página pública sem link de cliente
+TOKEN_PUBLICO = "publico"
+
+# Marca um token validado que não pertence a nenhum link ativo
+_TOKEN_INVALIDO = None
+
+
+async def cliente_do_token(
+    db: AsyncIOMotorDatabase,
+    token: Optional[str],
+    usar_cache: bool = True
+) -> Optional[Any]:
+    """
+    cliente_id do link ativo com este token, ou None se o token não é válido.
+    Com usar_cache=False o link é sempre conferido no banco (e o cache atualizado).
+    """
+    if not token or token == TOKEN_PUBLICO:
+        return None
+
+    if usar_cache:
+        encontrado, cliente_id = cache_tokens.obter(token)
+        if encontrado:
+            return cliente_id
+
+    link = await db.links_agendamento.find_one(
+        {"token": token, "ativo": True},
+        {"cliente_id": 1}
+    )
+    if link is None:
+        cache_tokens.definir(token, _TOKEN_INVALIDO, settings.CACHE_TOKENS_TTL_NEGATIVO_SEGUNDOS)
+        return None
+
+    cache_tokens.definir(token, link["cliente_id"])
+    return link["cliente_id"]
+
+
+async def invalidar_tokens(*tokens: Optional[str]):
+    """Remove tokens do cache (link criado, trocado ou desativado), também nos outros workers"""
+    for token in tokens:
+        if token:
+            cache_tokens.invalidar(token)
+    await avisar_workers(TOKENS)
@@ -0,0 +1,135 @@
+"""
+Métricas diárias de agendamentos calculadas no MongoDB
+
+Os relatórios trabalham com "buckets" diários no formato:
+    {"total": n, "por_status": {status: n}, "receita": {status: valor}, "minutos": {status: min}}
+
+buckets_agendamentos calcula esses buckets com uma agregação sobre os
+agendamentos: agrupa por dia/status/serviço, junta o preço do serviço uma vez
+por grupo (e não por agendamento) e devolve no máximo um documento por
+dia e status, independente do tamanho do período.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.services.hidratacao import variantes_id
+
+
+def bucket_vazio() -> Dict[str, Any]:
+    return {"total": 0, "por_status": {}, "receita": {}, "minutos": {}}
+
+
+def somar_bucket(destino: Dict[str, Any], origem: Dict[str, Any]) -> Dict[str, Any]:
+    """Acumula as métricas de um bucket em outro"""
+    destino["total"] += origem.get("total", 0)
+    for campo in ("por_status", "receita", "minutos"):
+        for status, valor in (origem.get(campo) or {}).items():
+            destino[campo][status] = destino[campo].get(status, 0) + valor
+    return destino
+
+
+def totalizar(buckets: Dict[datetime, Dict[str, Any]]) -> Dict[str, Any]:
+    """Soma todos os buckets diários em um único bucket"""
+    total = bucket_vazio()
+    for bucket in buckets.values():
+        somar_bucket(total, bucket)
+    return total
+
+
+def filtro_profissional(profissional_id: Optional[str]) -> dict:
+    """Filtro por profissional aceitando o ID armazenado como string ou ObjectId"""
+    if not profissional_id:
+        return {}
+    return {"profissional_id": {"$in": variantes_id(profissional_id)}}
+
+
+def chave_status(status: Optional[str]) -> str:
+    """Nome do status seguro para uso como campo de documento"""
+    return (status or "agendado").replace(".", "_").replace("$", "_")
+
+
+def expressao_object_id(campo: str) -> dict:
+    """Converte o campo para ObjectId quando possível (IDs antigos podem ser strings)"""
+    return {"$convert": {"input": campo, "to": "objectId", "onError": campo}}
+
+
+def _ausente(campo: str) -> dict:
+    """1 quando o campo está ausente ou nulo, 0 caso contrário"""
+    return {"$cond": [{"$eq": [{"$ifNull": [campo, None]}, None]}, 1, 0]}
+
+
+def pipeline_metricas_diarias(filtro: dict) -> List[Dict]:
+    """
+    Agregação das métricas por dia e status.
+
+    data_hora é armazenado como horário local sem timezone, então o $dateTrunc
+    é feito sem conversão de fuso: o dia truncado já é o dia local.
+    """
+    return [
+        {"$match": filtro},
+        {
+            "$group": {
+                "_id": {
+                    "dia": {"$dateTrunc": {"date": "$data_hora", "unit": "day"}},
+                    "status": {"$ifNull": ["$status", "agendado"]},
+                    "servico_id": "$servico_id",
+                },
+                "total": {"$sum": 1},
+                # Valores gravados no próprio agendamento têm precedência sobre o serviço
+                "valor_gravado": {"$sum": {"$ifNull": ["$valor", 0]}},
+                "duracao_gravada": {"$sum": {"$ifNull": ["$duracao", 0]}},
+                "sem_valor": {"$sum": _ausente("$valor")},
+                "sem_duracao": {"$sum": _ausente("$duracao")},
+            }
+        },
+        # Um lookup por (dia, status, serviço), não por agendamento
+        {"$addFields": {"servico_object_id": expressao_object_id("$_id.servico_id")}},
+        {
+            "$lookup": {
+                "from": "servicos",
+                "localField": "servico_object_id",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"valor": 1, "duracao": 1}}],
+                "as": "servico_info"
+            }
+        },
+        {"$unwind": {"path": "$servico_info", "preserveNullAndEmptyArrays": True}},
+        {
+            "$group": {
+                "_id": {"dia": "$_id.dia", "status": "$_id.status"},
+                "total": {"$sum": "$total"},
+                "receita": {"$sum": {"$add": [
+                    "$valor_gravado",
+                    {"$multiply": ["$sem_valor", {"$ifNull": ["$servico_info.valor", 0]}]}
+                ]}},
+                "minutos": {"$sum": {"$add": [
+                    "$duracao_gravada",
+                    {"$multiply": ["$sem_duracao", {"$ifNull": ["$servico_info.duracao", 0]}]}
+                ]}},
+            }
+        },
+    ]
+
+
+async def buckets_agendamentos(
+    db: AsyncIOMotorDatabase,
+    inicio: datetime,
+    fim_exclusivo: datetime,
+    profissional_id: Optional[str] = None
+) -> Dict[datetime, Dict[str, Any]]:
+    """Buckets diários calculados diretamente dos agendamentos em [inicio, fim_exclusivo)"""
+    filtro = {"data_hora": {"$gte": inicio, "$lt": fim_exclusivo}, **filtro_profissional(profissional_id)}
+    cursor = db.agendamentos.aggregate(pipeline_metricas_diarias(filtro), allowDiskUse=True)
+
+    buckets: Dict[datetime, Dict[str, Any]] = {}
+    async for linha in cursor:
+        status = chave_status(linha["_id"]["status"])
+        somar_bucket(buckets.setdefault(linha["_id"]["dia"], bucket_vazio()), {
+            "total": linha["total"],
+            "por_status": {status: linha["total"]},
+            "receita": {status: linha["receita"]},
+            "minutos": {status: linha["minutos"]},
+        })
+    return buckets
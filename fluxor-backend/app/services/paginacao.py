@@ -0,0 +1,148 @@
+"""
+Paginação por cursor (keyset) para as listagens
+
+Em vez de skip/limit, cada página termina com um cursor opaco contendo os
+valores da chave de ordenação do último documento (sempre terminando em _id).
+A próxima página filtra "depois desses valores" e usa o índice da ordenação,
+então uma página profunda custa o mesmo que a primeira e inserções
+concorrentes não deslocam os resultados.
+
+O cursor da próxima página é devolvido no header X-Proximo-Cursor e, quando
+solicitado, o total estimado no header X-Total-Estimado.
+"""
+import base64
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from bson import ObjectId, json_util
+from bson.errors import BSONError
+from fastapi import HTTPException, Response
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+HEADER_PROXIMO_CURSOR = "X-Proximo-Cursor"
+HEADER_TOTAL_ESTIMADO = "X-Total-Estimado"
+
+Ordenacao = List[Tuple[str, int]]
+
+# Ordenações das listagens (sempre terminando em _id para desempate)
+ORDENACAO_AGENDAMENTOS: Ordenacao = [("data_hora", 1), ("_id", 1)]
+ORDENACAO_LISTA_ESPERA: Ordenacao = [("prioridade", -1), ("criado_em", 1), ("_id", 1)]
+ORDENACAO_CADASTRO: Ordenacao = [("_id", 1)]
+
+# Tipos aceitos nos valores do cursor: vão direto para os filtros, então um
+# documento ({"$ne": null}, {"$where": ...}) viraria um operador
+TIPOS_VALOR_CURSOR = (type(None), bool, int, float, str, datetime, ObjectId)
+
+
+def codificar_cursor(valores: List[Any]) -> str:
+    """Serializa os valores da chave de ordenação em um token opaco"""
+    return base64.urlsafe_b64encode(json_util.dumps(valores).encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, ordenacao: Ordenacao) -> List[Any]:
+    """Recupera os valores da chave de ordenação a partir do token"""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json_util.loads(bruto)
+    except (ValueError, TypeError, BSONError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(valores, list) or len(valores) != len(ordenacao):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not all(isinstance(valor, TIPOS_VALOR_CURSOR) for valor in valores):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return valores
+
+
+def _depois(campo: str, direcao: int, valor: Any) -> Optional[dict]:
+    """
+    Condição "campo vem depois de valor" na ordem informada.
+    No MongoDB nulos/ausentes ordenam antes de qualquer valor.
+    """
+    if direcao == 1:
+        return {campo: {"$ne": None}} if valor is None else {campo: {"$gt": valor}}
+    if valor is None:
+        return None
+    return {"$or": [{campo: {"$lt": valor}}, {campo: None}]}
+
+
+def filtro_apos_cursor(ordenacao: Ordenacao, valores: List[Any]) -> dict:
+    """
+    Filtro dos documentos posteriores ao cursor:
+    (k1 > v1) OU (k1 = v1 E k2 > v2) OU ... (para cada campo da ordenação)
+    """
+    alternativas = []
+    for i, (campo, direcao) in enumerate(ordenacao):
+        condicao = _depois(campo, direcao, valores[i])
+        if condicao is None:
+            continue
+        iguais = [{c: v} for (c, _), v in zip(ordenacao[:i], valores[:i])]
+        alternativas.append({"$and": iguais + [condicao]} if iguais else condicao)
+    return {"$or": alternativas} if alternativas else {"_id": {"$in": []}}
+
+
+async def buscar_pagina(
+    colecao: AsyncIOMotorCollection,
+    filtro: dict,
+    ordenacao: Ordenacao,
+    limite: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    projecao: Optional[dict] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Retorna (documentos, cursor da próxima página ou None se for a última).
+    `skip` só é aplicado sem cursor, por compatibilidade. Com `projecao`, os
+    campos da ordenação são incluídos para montar o cursor.
+    """
+    if cursor:
+        filtro = {"$and": [filtro, filtro_apos_cursor(ordenacao, decodificar_cursor(cursor, ordenacao))]}
+        skip = 0
+    if projecao is not None:
+        projecao = {**projecao, **{campo: 1 for campo, _ in ordenacao}}
+
+    consulta = colecao.find(filtro, projecao).sort(ordenacao)
+    if skip:
+        consulta = consulta.skip(skip)
+    # Um documento a mais indica se existe próxima página
+    documentos = await consulta.limit(limite + 1).to_list(length=limite + 1)
+
+    proximo = None
+    if len(documentos) > limite:
+        documentos = documentos[:limite]
+        ultimo = documentos[-1]
+        proximo = codificar_cursor([ultimo.get(campo) for campo, _ in ordenacao])
+    return documentos, proximo
+
+
+async def total_estimado(colecao: AsyncIOMotorCollection, filtro: dict) -> int:
+    """
+    Total aproximado de documentos: metadados da coleção quando não há filtro,
+    senão uma contagem limitada a PAGINACAO_LIMITE_CONTAGEM.
+    """
+    if not filtro:
+        return await colecao.estimated_document_count()
+    return await colecao.count_documents(filtro, limit=settings.PAGINACAO_LIMITE_CONTAGEM)
+
+
+async def paginar(
+    response: Response,
+    colecao: AsyncIOMotorCollection,
+    filtro: dict,
+    ordenacao: Ordenacao,
+    limite: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    incluir_total: bool = False,
+    projecao: Optional[dict] = None
+) -> List[dict]:
+    """Busca a página e preenche os headers de paginação da resposta"""
+    documentos, proximo = await buscar_pagina(colecao, filtro, ordenacao, limite, cursor, skip, projecao)
+    if proximo:
+        response.headers[HEADER_PROXIMO_CURSOR] = proximo
+    if incluir_total:
+        response.headers[HEADER_TOTAL_ESTIMADO] = str(await total_estimado(colecao, filtro))
+    return documentos
@@ -0,0 +1,196 @@
+"""
+Reserva atômica de horários
+
+Cada agendamento ativo ocupa, na coleção reservas_horario, um documento por
+grânulo de tempo coberto (profissional_id + início do grânulo). O índice único
+(profissional_id, inicio) faz o MongoDB aceitar apenas um dono por grânulo:
+duas marcações concorrentes para o mesmo horário disputam os mesmos
+documentos e só uma consegue inserir todos. A perdedora remove o que chegou a
+inserir, sem bloquear marcações de outros horários ou profissionais.
+
+As reservas nascem pendentes (campo pendente_ate, com índice TTL) e só são
+confirmadas depois que o agendamento é gravado (reservar_horario). Se a
+gravação falhar, as reservas novas são removidas na hora; se o processo cair
+no meio do caminho, o MongoDB as remove quando pendente_ate passa, e o
+horário não fica bloqueado para sempre.
+
+As reservas dos agendamentos já existentes são recriadas com:
+    python -m app.services.reservas
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.core.config import get_settings
+from app.core.timezone import now_local
+from app.services.disponibilidade import STATUS_OCUPAM_HORARIO
+
+settings = get_settings()
+
+COLECAO_RESERVAS = "reservas_horario"
+
+# Campos do agendamento que mudam os horários reservados
+CAMPOS_RESERVA = {"profissional_id", "data_hora", "duracao", "status"}
+
+Granulo = Tuple[str, datetime]
+
+
+class HorarioIndisponivel(Exception):
+    """O horário já está reservado por outro agendamento"""
+
+
+def granulos(profissional_id: Any, inicio: datetime, duracao: int) -> List[Granulo]:
+    """
+    Grânulos (profissional_id, início) cobertos por [inicio, inicio + duracao).
+    As pontas são arredondadas para fora, então um horário fora da grade
+    reserva o grânulo inteiro.
+    """
+    passo = settings.RESERVA_GRANULO_MINUTOS
+    fim = inicio + timedelta(minutes=max(duracao or 0, 1))
+    atual = inicio.replace(second=0, microsecond=0) - timedelta(minutes=inicio.minute % passo)
+    resultado = []
+    while atual < fim:
+        resultado.append((str(profissional_id), atual))
+        atual += timedelta(minutes=passo)
+    return resultado
+
+
+def granulos_agendamento(agendamento: Optional[dict]) -> Set[Granulo]:
+    """Grânulos ocupados por um agendamento (vazio se ele não ocupa horário)"""
+    if not agendamento or agendamento.get("status", "agendado") not in STATUS_OCUPAM_HORARIO:
+        return set()
+    data_hora = agendamento.get("data_hora")
+    if not isinstance(data_hora, datetime) or not agendamento.get("profissional_id"):
+        return set()
+    duracao = agendamento.get("duracao") or settings.DISPONIBILIDADE_PASSO_MINUTOS
+    return set(granulos(agendamento["profissional_id"], data_hora, duracao))
+
+
+async def _reservar(db: AsyncIOMotorDatabase, agendamento_id: ObjectId, novos: Set[Granulo]):
+    """
+    Insere os grânulos como pendentes. Se a inserção falhar por qualquer
+    motivo remove os inseridos; em caso de conflito levanta HorarioIndisponivel.
+    """
+    if not novos:
+        return
+    # O TTL do MongoDB compara com o horário UTC
+    pendente_ate = datetime.utcnow() + timedelta(seconds=settings.RESERVA_PENDENTE_SEGUNDOS)
+    documentos = [
+        {"profissional_id": profissional_id, "inicio": inicio,
+         "agendamento_id": agendamento_id, "pendente_ate": pendente_ate}
+        for profissional_id, inicio in sorted(novos, key=lambda g: g[1])
+    ]
+    try:
+        await db[COLECAO_RESERVAS].insert_many(documentos, ordered=True)
+    except BaseException as e:
+        await _desfazer(db, agendamento_id, novos)
+        if isinstance(e, (BulkWriteError, DuplicateKeyError)):
+            raise HorarioIndisponivel() from e
+        raise
+
+
+async def _liberar(db: AsyncIOMotorDatabase, agendamento_id: ObjectId, removidos: Set[Granulo]):
+    if removidos:
+        await db[COLECAO_RESERVAS].delete_many({
+            "agendamento_id": agendamento_id,
+            "$or": [{"profissional_id": p, "inicio": i} for p, i in removidos],
+        })
+
+
+async def _desfazer(db: AsyncIOMotorDatabase, agendamento_id: ObjectId, novos: Set[Granulo]):
+    """Remove as reservas pendentes; se nem isso funcionar, o TTL as remove"""
+    try:
+        await _liberar(db, agendamento_id, novos)
+    except Exception as e:
+        print(f"✗ Erro ao desfazer reservas do agendamento {agendamento_id} (expiram pelo TTL): {e}")
+
+
+@asynccontextmanager
+async def reservar_horario(db: AsyncIOMotorDatabase, antes: Optional[dict], depois: Optional[dict]):
+    """
+    Reserva os horários de um agendamento novo (antes=None) ou remarcado,
+    cancelado ou reativado, em volta da escrita do agendamento:
+
+        async with reservar_horario(db, atual, {**atual, **alteracoes}):
+            await db.agendamentos.update_one(...)
+
+    Os grânulos novos são reservados como pendentes antes do bloco (falhando
+    com HorarioIndisponivel, sem efeitos, se algum estiver ocupado). Se o
+    bloco levantar qualquer exceção, eles são removidos e os antigos ficam
+    como estavam; se o bloco concluir, são confirmados e os grânulos que
+    deixaram de ser usados são liberados.
+    """
+    atuais = granulos_agendamento(antes)
+    novos = granulos_agendamento(depois)
+    if not atuais and not novos:
+        yield
+        return
+
+    agendamento_id = (depois or antes)["_id"]
+    await _reservar(db, agendamento_id, novos - atuais)
+    try:
+        yield
+    except BaseException:
+        await _desfazer(db, agendamento_id, novos - atuais)
+        raise
+
+    if novos - atuais:
+        await db[COLECAO_RESERVAS].update_many(
+            {"agendamento_id": agendamento_id, "pendente_ate": {"$exists": True}},
+            {"$unset": {"pendente_ate": ""}}
+        )
+    await _liberar(db, agendamento_id, atuais - novos)
+
+
+async def reservar_agendamento(db: AsyncIOMotorDatabase, agendamento: dict):
+    """Reserva (já confirmada) os horários de um agendamento gravado, que deve ter _id"""
+    async with reservar_horario(db, None, agendamento):
+        pass
+
+
+async def liberar_agendamento(db: AsyncIOMotorDatabase, agendamento_id: Any):
+    """Remove todas as reservas de um agendamento"""
+    await db[COLECAO_RESERVAS].delete_many({"agendamento_id": agendamento_id})
+
+
+async def reconstruir_reservas(db: AsyncIOMotorDatabase) -> Tuple[int, int]:
+    """
+    Recria as reservas dos agendamentos futuros ativos.
+    Retorna (agendamentos reservados, agendamentos em conflito).
+    """
+    agora = now_local().replace(tzinfo=None)
+    await db[COLECAO_RESERVAS].delete_many({})
+
+    reservados = conflitos = 0
+    cursor = db.agendamentos.find(
+        {"data_hora": {"$gte": agora}, "status": {"$in": STATUS_OCUPAM_HORARIO}},
+        {"profissional_id": 1, "data_hora": 1, "duracao": 1, "status": 1}
+    ).sort("data_hora", 1)
+    async for agendamento in cursor:
+        try:
+            await reservar_agendamento(db, agendamento)
+            reservados += 1
+        except HorarioIndisponivel:
+            conflitos += 1
+            print(f"✗ Agendamento {agendamento['_id']} sobrepõe outro agendamento")
+    return reservados, conflitos
+
+
+async def _main():
+    from app.database.mongodb import connect_to_mongo, close_mongo_connection, get_database
+
+    await connect_to_mongo(aplicar=False)
+    try:
+        reservados, conflitos = await reconstruir_reservas(get_database())
+        print(f"✓ Reservas recriadas para {reservados} agendamentos ({conflitos} em conflito)")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,267 @@
+"""
+Rollups diários de agendamentos para os relatórios
+
+A coleção rollups_diarios guarda, por (dia, profissional_id, servico_id),
+a contagem, a receita e os minutos de agendamentos por status. Ela é mantida
+incrementalmente com $inc a cada criação, alteração ou remoção de agendamento,
+e pode ser reconstruída do zero com:
+
+    python -m app.services.rollups
+
+O dia é o dia local de data_hora (armazenado sem timezone, no fuso da aplicação).
+
+Valor e duração somados são os gravados no agendamento. Para que a remoção
+de uma contribuição desconte exatamente o que foi somado, mesmo depois de o
+preço do serviço mudar, a reconstrução preenche antes o snapshot dos
+agendamentos antigos, e um agendamento contado com os valores do serviço
+recebe esses valores gravados.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.timezone import inicio_do_dia
+from app.services.hidratacao import buscar_por_ids, obter_relacionado
+from app.services.metricas import (
+    bucket_vazio, buckets_agendamentos, chave_status, expressao_object_id, somar_bucket
+)
+from app.services.snapshots import preencher_snapshots
+
+COLECAO_ROLLUPS = "rollups_diarios"
+
+
+async def _contribuicoes(db: AsyncIOMotorDatabase, agendamentos: List[dict]) -> List[dict]:
+    """
+    Calcula a contribuição de cada agendamento para os rollups.
+    Valor e duração vêm do próprio agendamento quando presentes; senão do
+    serviço, e nesse caso ficam em "preenchidos" para serem gravados.
+    """
+    validos = [a for a in agendamentos if a and isinstance(a.get("data_hora"), datetime)]
+    sem_valores = [a for a in validos if a.get("valor") is None or a.get("duracao") is None]
+    servicos = await buscar_por_ids(db, "servicos", (a.get("servico_id") for a in sem_valores))
+
+    contribuicoes = []
+    for agendamento in validos:
+        servico = obter_relacionado(servicos, agendamento.get("servico_id")) or {}
+        profissional_id = agendamento.get("profissional_id")
+        servico_id = agendamento.get("servico_id")
+        # Só o que veio de um serviço existente é gravado (nunca um 0 por omissão)
+        preenchidos = {
+            campo: servico[campo] for campo in ("valor", "duracao")
+            if agendamento.get(campo) is None and servico.get(campo) is not None
+        }
+        valores = {**agendamento, **preenchidos}
+
+        contribuicoes.append({
+            "dia": inicio_do_dia(agendamento["data_hora"]),
+            "profissional_id": str(profissional_id) if profissional_id is not None else None,
+            "servico_id": str(servico_id) if servico_id is not None else None,
+            "status": chave_status(agendamento.get("status")),
+            "valor": valores.get("valor") or 0,
+            "duracao": valores.get("duracao") or 0,
+            "preenchidos": preenchidos,
+        })
+    return contribuicoes
+
+
+async def _gravar_preenchidos(db: AsyncIOMotorDatabase, agendamento: dict, preenchidos: Dict[str, Any]):
+    """
+    Grava no agendamento o valor e a duração somados a partir do serviço, se
+    ele ainda não os tiver e o serviço não tiver mudado nesse meio tempo.
+    """
+    if not preenchidos or "_id" not in agendamento:
+        return
+    await db.agendamentos.update_one(
+        {
+            "_id": agendamento["_id"],
+            "servico_id": agendamento.get("servico_id"),
+            **{campo: None for campo in preenchidos},
+        },
+        {"$set": preenchidos}
+    )
+
+
+async def registrar_alteracao(
+    db: AsyncIOMotorDatabase,
+    antes: Optional[dict],
+    depois: Optional[dict]
+):
+    """
+    Atualiza os rollups após uma alteração de agendamento.
+    `antes` é o documento anterior (None na criação) e `depois` o novo (None na remoção).
+    """
+    deltas: Dict[Tuple, Dict[str, float]] = {}
+    for documento, sinal in ((antes, -1), (depois, 1)):
+        if not documento:
+            continue
+        for c in await _contribuicoes(db, [documento]):
+            if sinal > 0:
+                await _gravar_preenchidos(db, documento, c["preenchidos"])
+            chave = (c["dia"], c["profissional_id"], c["servico_id"])
+            inc = deltas.setdefault(chave, {})
+            for campo, valor in (
+                ("total", 1),
+                (f"por_status.{c['status']}", 1),
+                (f"receita.{c['status']}", c["valor"]),
+                (f"minutos.{c['status']}", c["duracao"]),
+            ):
+                inc[campo] = inc.get(campo, 0) + sinal * valor
+
+    for (dia, profissional_id, servico_id), inc in deltas.items():
+        inc = {campo: valor for campo, valor in inc.items() if valor}
+        if not inc:
+            continue
+        await db[COLECAO_ROLLUPS].update_one(
+            {"dia": dia, "profissional_id": profissional_id, "servico_id": servico_id},
+            {"$inc": inc},
+            upsert=True
+        )
+
+
+async def _buckets_rollup(
+    db: AsyncIOMotorDatabase,
+    primeiro_dia: datetime,
+    fim_exclusivo: datetime,
+    profissional_id: Optional[str]
+) -> Dict[datetime, Dict[str, Any]]:
+    """Soma os rollups dos dias completos, um bucket por dia"""
+    filtro = {"dia": {"$gte": primeiro_dia, "$lt": fim_exclusivo}}
+    if profissional_id:
+        filtro["profissional_id"] = str(profissional_id)
+
+    buckets: Dict[datetime, Dict[str, Any]] = {}
+    async for rollup in db[COLECAO_ROLLUPS].find(filtro, {"_id": 0, "profissional_id": 0, "servico_id": 0}):
+        somar_bucket(buckets.setdefault(rollup["dia"], bucket_vazio()), rollup)
+    return buckets
+
+
+async def buckets_por_dia(
+    db: AsyncIOMotorDatabase,
+    inicio: datetime,
+    fim: datetime,
+    profissional_id: Optional[str] = None
+) -> Dict[datetime, Dict[str, Any]]:
+    """
+    Métricas por dia local no intervalo [inicio, fim] (fim inclusivo, sem timezone).
+    Os dias totalmente cobertos vêm dos rollups; as pontas parciais são
+    calculadas a partir dos agendamentos.
+    """
+    fim_exclusivo = fim + timedelta(microseconds=1)
+    primeiro_completo = inicio if inicio == inicio_do_dia(inicio) else inicio_do_dia(inicio) + timedelta(days=1)
+    ultimo_completo = inicio_do_dia(fim_exclusivo)
+
+    if primeiro_completo >= ultimo_completo:
+        return await buckets_agendamentos(db, inicio, fim_exclusivo, profissional_id)
+
+    consultas = [_buckets_rollup(db, primeiro_completo, ultimo_completo, profissional_id)]
+    if inicio < primeiro_completo:
+        consultas.append(buckets_agendamentos(db, inicio, primeiro_completo, profissional_id))
+    if ultimo_completo < fim_exclusivo:
+        consultas.append(buckets_agendamentos(db, ultimo_completo, fim_exclusivo, profissional_id))
+
+    buckets: Dict[datetime, Dict[str, Any]] = {}
+    for parcial in await asyncio.gather(*consultas):
+        for dia, bucket in parcial.items():
+            somar_bucket(buckets.setdefault(dia, bucket_vazio()), bucket)
+    return buckets
+
+
+async def totais_por_status(db: AsyncIOMotorDatabase) -> Dict[str, int]:
+    """Contagem de agendamentos por status em todo o histórico"""
+    pipeline = [
+        {"$project": {"status": {"$objectToArray": "$por_status"}}},
+        {"$unwind": "$status"},
+        {"$group": {"_id": "$status.k", "total": {"$sum": "$status.v"}}},
+    ]
+    resultado = await db[COLECAO_ROLLUPS].aggregate(pipeline).to_list(length=None)
+    return {item["_id"]: item["total"] for item in resultado}
+
+
+def _expressao_chave_status() -> dict:
+    status = {"$ifNull": ["$status", "agendado"]}
+    sem_ponto = {"$replaceAll": {"input": status, "find": ".", "replacement": "_"}}
+    return {"$replaceAll": {"input": sem_ponto, "find": {"$literal": "$"}, "replacement": "_"}}
+
+
+async def reconstruir_rollups(db: AsyncIOMotorDatabase):
+    """
+    Recalcula rollups_diarios do zero a partir de todos os agendamentos.
+    O $out substitui a coleção atomicamente e preserva seus índices.
+    O snapshot dos agendamentos antigos é preenchido antes, para que os
+    valores somados sejam os gravados em cada agendamento.
+    """
+    await preencher_snapshots(db)
+    pipeline = [
+        {"$match": {"data_hora": {"$type": "date"}}},
+        {
+            "$addFields": {"servico_object_id": expressao_object_id("$servico_id")}
+        },
+        {
+            "$lookup": {
+                "from": "servicos",
+                "localField": "servico_object_id",
+                "foreignField": "_id",
+                "as": "servico_info"
+            }
+        },
+        {"$unwind": {"path": "$servico_info", "preserveNullAndEmptyArrays": True}},
+        {
+            "$group": {
+                "_id": {
+                    "dia": {"$dateTrunc": {"date": "$data_hora", "unit": "day"}},
+                    "profissional_id": {"$toString": "$profissional_id"},
+                    "servico_id": {"$toString": "$servico_id"},
+                    "status": _expressao_chave_status(),
+                },
+                "total": {"$sum": 1},
+                "receita": {"$sum": {"$ifNull": ["$valor", {"$ifNull": ["$servico_info.valor", 0]}]}},
+                "minutos": {"$sum": {"$ifNull": ["$duracao", {"$ifNull": ["$servico_info.duracao", 0]}]}},
+            }
+        },
+        {
+            "$group": {
+                "_id": {
+                    "dia": "$_id.dia",
+                    "profissional_id": "$_id.profissional_id",
+                    "servico_id": "$_id.servico_id",
+                },
+                "total": {"$sum": "$total"},
+                "por_status": {"$push": {"k": "$_id.status", "v": "$total"}},
+                "receita": {"$push": {"k": "$_id.status", "v": "$receita"}},
+                "minutos": {"$push": {"k": "$_id.status", "v": "$minutos"}},
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "dia": "$_id.dia",
+                "profissional_id": "$_id.profissional_id",
+                "servico_id": "$_id.servico_id",
+                "total": 1,
+                "por_status": {"$arrayToObject": "$por_status"},
+                "receita": {"$arrayToObject": "$receita"},
+                "minutos": {"$arrayToObject": "$minutos"},
+            }
+        },
+        {"$out": COLECAO_ROLLUPS},
+    ]
+    await db.agendamentos.aggregate(pipeline).to_list(length=None)
+
+
+async def _main():
+    from app.database.mongodb import connect_to_mongo, close_mongo_connection, get_database
+
+    await connect_to_mongo(aplicar=False)
+    try:
+        db = get_database()
+        await reconstruir_rollups(db)
+        total = await db[COLECAO_ROLLUPS].count_documents({})
+        print(f"✓ Rollups reconstruídos: {total} documentos")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,105 @@
+"""
+Invalidações de cache entre workers
+
+Com vários workers (run.py), cada processo tem os seus próprios caches em
+memória. O worker que faz a escrita invalida os seus caches na hora e avança
+a versão do tipo de invalidação na coleção controle_caches; os demais
+consultam essas versões a cada SINCRONIZACAO_INTERVALO_SEGUNDOS (uma única
+consulta por worker) e, ao ver uma versão nova:
+  - referencias: limpam serviços/profissionais e avançam a versão do catálogo;
+  - tokens: limpam o cache de tokens dos links;
+  - revogacoes: recarregam as revogações de tokens gravadas nos usuários.
+O atraso máximo nos outros workers é, então, o intervalo de sincronização.
+Onde isso não basta (agendar por um link desativado), a rota consulta o banco.
+"""
+import asyncio
+import time
+from typing import Dict, Optional
+
+from app.core.config import get_settings
+from app.core.security import carregar_revogacoes
+from app.database.mongodb import get_database
+from app.services.cache import cache_tokens, invalidar_referencia
+
+settings = get_settings()
+
+REFERENCIAS = "referencias"
+TOKENS = "tokens"
+REVOGACOES = "revogacoes"
+
+# tipo -> última versão vista por este worker
+_versoes: Dict[str, int] = {}
+
+_tarefa_sincronizacao: Optional[asyncio.Task] = None
+
+
+async def avisar_workers(tipo: str):
+    """Avança a versão do tipo de invalidação para os outros workers"""
+    if settings.SINCRONIZACAO_INTERVALO_SEGUNDOS <= 0:
+        return
+    try:
+        await get_database().controle_caches.update_one(
+            {"_id": tipo},
+            {"$inc": {"versao": 1}},
+            upsert=True
+        )
+    except Exception as e:
+        print(f"✗ Erro ao avisar workers ({tipo}): {e}")
+
+
+async def _recarregar_revogacoes():
+    limite = time.time() - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    cursor = get_database().usuarios.find(
+        {"tokens_revogados_em": {"$gt": limite}},
+        {"tokens_revogados_em": 1}
+    )
+    carregar_revogacoes({str(u["_id"]): u["tokens_revogados_em"] async for u in cursor})
+
+
+async def sincronizar():
+    """Aplica neste worker as invalidações feitas pelos outros desde a última consulta"""
+    versoes = {
+        documento["_id"]: documento.get("versao", 0)
+        async for documento in get_database().controle_caches.find({})
+    }
+    # Na primeira consulta _versoes está vazio: as revogações são carregadas
+    for tipo in (REFERENCIAS, TOKENS, REVOGACOES):
+        versao = versoes.get(tipo, 0)
+        if _versoes.get(tipo) == versao:
+            continue
+        if tipo == REFERENCIAS:
+            invalidar_referencia("servicos")
+            invalidar_referencia("profissionais")
+        elif tipo == TOKENS:
+            cache_tokens.limpar()
+        else:
+            await _recarregar_revogacoes()
+        _versoes[tipo] = versao
+
+
+async def _sincronizar_periodicamente():
+    while True:
+        try:
+            await sincronizar()
+        except Exception as e:
+            print(f"✗ Erro ao sincronizar caches: {e}")
+        await asyncio.sleep(settings.SINCRONIZACAO_INTERVALO_SEGUNDOS)
+
+
+def iniciar_sincronizacao():
+    """Inicia a consulta periódica das invalidações (chamado no startup da aplicação)"""
+    global _tarefa_sincronizacao
+    if settings.SINCRONIZACAO_INTERVALO_SEGUNDOS > 0 and _tarefa_sincronizacao is None:
+        _tarefa_sincronizacao = asyncio.create_task(_sincronizar_periodicamente())
+
+
+async def encerrar_sincronizacao():
+    """Para a consulta periódica (chamado no shutdown, antes de fechar o MongoDB)"""
+    global _tarefa_sincronizacao
+    if _tarefa_sincronizacao is not None:
+        _tarefa_sincronizacao.cancel()
+        try:
+            await _tarefa_sincronizacao
+        except asyncio.CancelledError:
+            pass
+        _tarefa_sincronizacao = None
@@ -0,0 +1,157 @@
+"""
+Snapshot dos dados relacionados gravado em cada agendamento
+
+No momento da escrita o agendamento recebe uma cópia de:
+    cliente_nome, profissional_nome, servico_nome, valor, duracao
+
+Assim listagens e relatórios não precisam de join. Valor e duração são
+históricos (o preço cobrado na época) e não mudam quando o serviço muda;
+os nomes são atualizados em segundo plano por propagar_nome quando um
+cliente, profissional ou serviço é renomeado.
+
+Agendamentos antigos são preenchidos com:
+    python -m app.services.snapshots
+"""
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from app.services.hidratacao import carregar_relacionados, obter_relacionado, variantes_id
+
+# Campo de referência -> (coleção, campo do nome no agendamento)
+RELACIONAMENTOS = {
+    "cliente_id": ("clientes", "cliente_nome"),
+    "profissional_id": ("profissionais", "profissional_nome"),
+    "servico_id": ("servicos", "servico_nome"),
+}
+
+# Mensagem de erro para uma referência inexistente (as mesmas da criação do agendamento)
+REFERENCIA_NAO_ENCONTRADA = {
+    "cliente_id": "Cliente não encontrado",
+    "profissional_id": "Profissional não encontrado",
+    "servico_id": "Serviço não encontrado",
+}
+
+CAMPOS_SNAPSHOT = ["cliente_nome", "profissional_nome", "servico_nome", "valor", "duracao"]
+
+
+def montar_snapshot(
+    cliente: Optional[dict] = None,
+    profissional: Optional[dict] = None,
+    servico: Optional[dict] = None
+) -> Dict[str, Any]:
+    """
+    Campos de snapshot a partir dos documentos relacionados informados.
+    Valor e duração ausentes no serviço não são gravados: uma duração 0
+    deixaria o horário do agendamento livre para outra reserva.
+    """
+    snapshot: Dict[str, Any] = {}
+    if cliente is not None:
+        snapshot["cliente_nome"] = cliente.get("nome")
+    if profissional is not None:
+        snapshot["profissional_nome"] = profissional.get("nome")
+    if servico is not None:
+        snapshot["servico_nome"] = servico.get("nome")
+        for campo in ("valor", "duracao"):
+            if servico.get(campo) is not None:
+                snapshot[campo] = servico[campo]
+    return snapshot
+
+
+async def snapshot_referencias(db: AsyncIOMotorDatabase, referencias: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Snapshot para as referências alteradas de um agendamento,
+    ex: {"servico_id": "..."} -> servico_nome, valor e duracao.
+    Uma referência inexistente gera 404, sem gravar um snapshot vazio.
+    """
+    campos = {campo: RELACIONAMENTOS[campo][0] for campo in referencias if campo in RELACIONAMENTOS}
+    relacionados = await carregar_relacionados(db, [referencias], campos)
+    documentos = {
+        campo: obter_relacionado(relacionados[campo], referencias[campo])
+        for campo in campos
+    }
+    for campo, documento in documentos.items():
+        if documento is None:
+            raise HTTPException(status_code=404, detail=REFERENCIA_NAO_ENCONTRADA[campo])
+    return montar_snapshot(
+        documentos.get("cliente_id"),
+        documentos.get("profissional_id"),
+        documentos.get("servico_id"),
+    )
+
+
+async def propagar_nome(db: AsyncIOMotorDatabase, campo_referencia: str, documento_id: Any, nome: str) -> int:
+    """
+    Atualiza o nome gravado nos agendamentos que referenciam o documento.
+    Executada em segundo plano após renomear um cliente, profissional ou serviço.
+    """
+    _, campo_nome = RELACIONAMENTOS[campo_referencia]
+    try:
+        result = await db.agendamentos.update_many(
+            {campo_referencia: {"$in": variantes_id(documento_id)}, campo_nome: {"$ne": nome}},
+            {"$set": {campo_nome: nome}}
+        )
+        return result.modified_count
+    except Exception as e:
+        print(f"✗ Erro ao propagar {campo_nome} para os agendamentos: {e}")
+        return 0
+
+
+async def _preencher_lote(db: AsyncIOMotorDatabase, agendamentos: List[dict]) -> int:
+    """Preenche os campos de snapshot ausentes de um lote de agendamentos"""
+    relacionados = await carregar_relacionados(db, agendamentos, {
+        campo: colecao for campo, (colecao, _) in RELACIONAMENTOS.items()
+    })
+
+    operacoes = []
+    for agendamento in agendamentos:
+        # Referência inexistente: None, e nenhum campo dela é gravado
+        snapshot = montar_snapshot(*[
+            obter_relacionado(relacionados[campo], agendamento.get(campo))
+            for campo in RELACIONAMENTOS
+        ])
+        # Não sobrescreve o que já foi gravado (ex: valor cobrado no agendamento online)
+        faltando = {campo: valor for campo, valor in snapshot.items() if campo not in agendamento}
+        if faltando:
+            operacoes.append(UpdateOne({"_id": agendamento["_id"]}, {"$set": faltando}))
+
+    if operacoes:
+        await db.agendamentos.bulk_write(operacoes, ordered=False)
+    return len(operacoes)
+
+
+async def preencher_snapshots(db: AsyncIOMotorDatabase, tamanho_lote: int = 500) -> int:
+    """Migração: grava o snapshot nos agendamentos que ainda não o possuem"""
+    filtro = {"$or": [{campo: {"$exists": False}} for campo in CAMPOS_SNAPSHOT]}
+    projecao = {campo: 1 for campo in list(RELACIONAMENTOS) + CAMPOS_SNAPSHOT}
+
+    atualizados = 0
+    lote: List[dict] = []
+    async for agendamento in db.agendamentos.find(filtro, projecao).sort("_id", 1).batch_size(tamanho_lote):
+        lote.append(agendamento)
+        if len(lote) >= tamanho_lote:
+            atualizados += await _preencher_lote(db, lote)
+            lote = []
+    if lote:
+        atualizados += await _preencher_lote(db, lote)
+    return atualizados
+
+
+async def _main():
+    from app.database.mongodb import connect_to_mongo, close_mongo_connection, get_database
+
+    await connect_to_mongo(aplicar=False)
+    try:
+        atualizados = await preencher_snapshots(get_database())
+        print(f"✓ Snapshot gravado em {atualizados} agendamentos")
+        if atualizados:
+            print("  Reconstrua os rollups para refletir os valores gravados: python -m app.services.rollups")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
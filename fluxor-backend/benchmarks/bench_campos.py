@@ -0,0 +1,80 @@
+"""
+Benchmark: página de serviços completa vs com campos esparsos (?fields=)
+
+Uso:
+    python -m benchmarks.bench_campos [--itens 1000]
+
+Mede, para uma página de serviços com descrições e listas de profissionais
+habilitados longas, o tempo de busca + serialização e o tamanho da resposta
+sem fields e com fields=nome,duracao,valor (projeção no MongoDB + modelo parcial).
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi import Response
+
+from app.core.serializacao import resposta_lista
+from app.routes.servicos import CAMPOS_SERVICOS
+from app.schemas import Servico
+from app.services.campos import campos_solicitados, modelo_parcial, projecao_mongo
+from app.services.paginacao import ORDENACAO_CADASTRO, paginar
+from benchmarks.comum import banco_temporario, cronometrar, resumir
+
+REPETICOES = 30
+FIELDS = "nome,duracao,valor"
+
+
+async def popular(db, total: int):
+    agora = datetime.now()
+    await db.servicos.insert_many([
+        {
+            "nome": f"Serviço {i}", "tipo": "Consulta", "descricao": "Descrição detalhada. " * 40,
+            "duracao": 30, "valor": 150.0, "ativo": True,
+            "profissionais_habilitados": [str(ObjectId()) for _ in range(30)],
+            "observacoes": "Observações internas. " * 20,
+            "criado_em": agora, "atualizado_em": agora,
+        }
+        for i in range(total)
+    ])
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--itens", type=int, default=1000)
+    args = parser.parse_args()
+
+    async with banco_temporario() as db:
+        await popular(db, args.itens)
+
+        async def pagina(fields):
+            campos = campos_solicitados(fields, CAMPOS_SERVICOS)
+            servicos = await paginar(
+                Response(), db.servicos, {}, ORDENACAO_CADASTRO, args.itens,
+                projecao=projecao_mongo(campos)
+            )
+            for servico in servicos:
+                servico["_id"] = str(servico["_id"])
+            return resposta_lista(servicos, modelo_parcial(Servico, campos)).body
+
+        async def completa():
+            await pagina(None)
+
+        async def esparsa():
+            await pagina(FIELDS)
+
+        resultados = {
+            "itens": args.itens,
+            "fields": FIELDS,
+            "bytes_completa": len(await pagina(None)),
+            "bytes_esparsa": len(await pagina(FIELDS)),
+            "completa": resumir(await cronometrar(completa, REPETICOES)),
+            "esparsa": resumir(await cronometrar(esparsa, REPETICOES)),
+        }
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+"""
+Benchmark: verificação de conflito por sobreposição de intervalos
+
+Uso:
+    python -m benchmarks.bench_conflitos [--agendamentos 300] [--verificacoes 2000]
+
+Monta a agenda de um dia com centenas de agendamentos de durações variadas e
+mede:
+  - indice: consulta direta ao IndiceIntervalos (busca binária + varredura);
+  - forca_bruta: comparação com todos os intervalos do dia, para conferência;
+  - cache_quente: verificar_conflito com o dia já em cache_agendas;
+  - cache_frio: verificar_conflito com o cache limpo (uma consulta ao MongoDB).
+Os resultados do índice são conferidos contra a força bruta.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time as relogio
+from datetime import date, datetime, time, timedelta
+
+from bson import ObjectId
+
+from app.services.cache import cache_agendas
+from app.services.conflitos import IndiceIntervalos, verificar_conflito
+from app.services.disponibilidade import Ocupacao
+from benchmarks.comum import banco_temporario, cronometrar, resumir
+
+REPETICOES = 50
+
+
+def agenda(dia: date, total: int, profissional_id: str) -> list:
+    inicio_dia = datetime.combine(dia, time(6))
+    return [
+        {
+            "_id": ObjectId(),
+            "profissional_id": profissional_id,
+            "data_hora": inicio_dia + timedelta(minutes=random.randrange(0, 16 * 60, 5)),
+            "duracao": random.choice([15, 30, 45, 60, 90]),
+            "status": "agendado",
+        }
+        for _ in range(total)
+    ]
+
+
+def forca_bruta(ocupados, inicio: datetime, fim: datetime) -> set:
+    return {o.agendamento_id for o in ocupados if o.inicio < fim and o.fim > inicio}
+
+
+def medir_us(funcao, consultas) -> dict:
+    duracoes = []
+    for inicio, fim in consultas:
+        t0 = relogio.perf_counter()
+        funcao(inicio, fim)
+        duracoes.append((relogio.perf_counter() - t0) * 1_000_000)
+    duracoes.sort()
+    return {
+        "media_us": round(sum(duracoes) / len(duracoes), 2),
+        "p99_us": round(duracoes[int(len(duracoes) * 0.99) - 1], 2),
+        "max_us": round(duracoes[-1], 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agendamentos", type=int, default=300)
+    parser.add_argument("--verificacoes", type=int, default=2000)
+    args = parser.parse_args()
+
+    dia = date.today() + timedelta(days=1)
+    meia_noite = datetime.combine(dia, time())
+    profissional_id = str(ObjectId())
+    documentos = agenda(dia, args.agendamentos, profissional_id)
+    ocupados = [
+        Ocupacao(a["data_hora"], a["data_hora"] + timedelta(minutes=a["duracao"]), a["_id"])
+        for a in documentos
+    ]
+    consultas = []
+    for _ in range(args.verificacoes):
+        inicio = meia_noite + timedelta(minutes=random.randrange(5 * 60, 23 * 60))
+        consultas.append((inicio, inicio + timedelta(minutes=random.choice([15, 30, 60]))))
+
+    indice = IndiceIntervalos(dia, ocupados)
+
+    def consultar_indice(inicio, fim):
+        return indice.sobrepostos(
+            (inicio - meia_noite).total_seconds() / 60, (fim - meia_noite).total_seconds() / 60
+        )
+
+    divergencias = sum(
+        set(consultar_indice(inicio, fim)) != forca_bruta(ocupados, inicio, fim)
+        for inicio, fim in consultas
+    )
+
+    resultados = {
+        "agendamentos_no_dia": args.agendamentos,
+        "verificacoes": args.verificacoes,
+        "divergencias": divergencias,
+        "indice": medir_us(consultar_indice, consultas),
+        "forca_bruta": medir_us(lambda i, f: forca_bruta(ocupados, i, f), consultas),
+    }
+
+    async with banco_temporario() as db:
+        await db.agendamentos.insert_many(documentos)
+        await db.agendamentos.create_index([("profissional_id", 1), ("data_hora", 1), ("status", 1)])
+        inicio, fim = consultas[0]
+
+        async def verificar():
+            await verificar_conflito(db, profissional_id, inicio, 30)
+
+        async def verificar_sem_cache():
+            cache_agendas.limpar()
+            await verificar_conflito(db, profissional_id, inicio, 30)
+
+        resultados["cache_frio"] = resumir(await cronometrar(verificar_sem_cache, REPETICOES))
+        await verificar()
+        resultados["cache_quente"] = resumir(await cronometrar(verificar, REPETICOES * 20))
+
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""
+Benchmark: disponibilidade dia a dia vs período inteiro em uma passada
+
+Uso:
+    python -m benchmarks.bench_disponibilidade [--profissionais 5] [--dias 7]
+
+Compara o custo de montar uma visão semanal chamando horarios_disponiveis uma
+vez por profissional por dia (o que a página pública fazia, uma requisição e uma
+consulta cada) com uma única chamada de disponibilidade_periodo.
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import date, datetime, time, timedelta
+
+from bson import ObjectId
+
+from app.services.disponibilidade import disponibilidade_periodo, horarios_disponiveis
+from benchmarks.comum import banco_temporario, cronometrar, resumir
+
+REPETICOES = 20
+
+
+async def popular(db, total_profissionais: int, dias: int, primeiro_dia: date):
+    profissionais = [
+        {"_id": ObjectId(), "nome": f"Profissional {i}", "ativo": True,
+         "horario_trabalho": {"inicio": "08:00", "fim": "18:00"}}
+        for i in range(total_profissionais)
+    ]
+    await db.profissionais.insert_many(profissionais)
+
+    agendamentos = []
+    for profissional in profissionais:
+        for n in range(dias):
+            inicio_dia = datetime.combine(primeiro_dia + timedelta(days=n), time(8))
+            for slot in random.sample(range(20), 10):
+                agendamentos.append({
+                    "profissional_id": str(profissional["_id"]),
+                    "data_hora": inicio_dia + timedelta(minutes=30 * slot),
+                    "duracao": random.choice([30, 60]),
+                    "status": "agendado",
+                })
+    await db.agendamentos.insert_many(agendamentos)
+    await db.agendamentos.create_index([("profissional_id", 1), ("data_hora", 1), ("status", 1)])
+    return profissionais
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profissionais", type=int, default=5)
+    parser.add_argument("--dias", type=int, default=7)
+    args = parser.parse_args()
+
+    primeiro_dia = date.today() + timedelta(days=1)
+    ultimo_dia = primeiro_dia + timedelta(days=args.dias - 1)
+
+    async with banco_temporario() as db:
+        profissionais = await popular(db, args.profissionais, args.dias, primeiro_dia)
+
+        async def dia_a_dia():
+            for profissional in profissionais:
+                for n in range(args.dias):
+                    await horarios_disponiveis(db, profissional, primeiro_dia + timedelta(days=n), 30)
+
+        async def periodo():
+            await disponibilidade_periodo(db, profissionais, primeiro_dia, ultimo_dia, 30)
+
+        resultados = {
+            "consultas_dia_a_dia": len(profissionais) * args.dias,
+            "consultas_periodo": 1,
+            "dia_a_dia": resumir(await cronometrar(dia_a_dia, REPETICOES)),
+            "periodo": resumir(await cronometrar(periodo, REPETICOES)),
+        }
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
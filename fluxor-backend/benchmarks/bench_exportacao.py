@@ -0,0 +1,80 @@
+"""
+Benchmark: exportação em streaming vs lista materializada
+
+Uso:
+    python -m benchmarks.bench_exportacao [--tamanhos 1000 20000 100000]
+
+Para cada volume mede o tempo até o primeiro bloco, o tempo total e o pico de
+memória (tracemalloc) de:
+  - materializado: to_list + serialização de tudo em memória (como paginar o GET)
+  - streaming: os geradores usados por GET /agendamentos/exportar
+No streaming o pico de memória deve ficar constante entre os volumes.
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app.services.exportacao import CAMPOS_AGENDAMENTO, gerar_csv, linha_agendamento, linhas_agendamentos
+from benchmarks.comum import banco_temporario
+
+
+async def popular(db, total: int):
+    base = datetime(2020, 1, 1, 8, 0)
+    for inicio in range(0, total, 10000):
+        await db.agendamentos.insert_many([
+            {
+                "cliente_id": "c", "cliente_nome": f"Cliente {i}",
+                "profissional_id": "p", "profissional_nome": "Profissional",
+                "servico_id": "s", "servico_nome": "Serviço", "valor": 100.0, "duracao": 30,
+                "data_hora": base + timedelta(minutes=30 * i), "status": "finalizado",
+            }
+            for i in range(inicio, min(total, inicio + 10000))
+        ])
+
+
+async def materializado(db):
+    agendamentos = await db.agendamentos.find({}).sort("data_hora", 1).to_list(length=None)
+    yield "".join(json.dumps(linha_agendamento(a), ensure_ascii=False) + "\n" for a in agendamentos)
+
+
+async def medir(gerador) -> dict:
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    primeiro_bloco = None
+    total_bytes = 0
+    async for bloco in gerador:
+        if primeiro_bloco is None:
+            primeiro_bloco = time.perf_counter() - inicio
+        total_bytes += len(bloco)
+    duracao = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "primeiro_bloco_ms": round((primeiro_bloco or 0) * 1000, 1),
+        "total_ms": round(duracao * 1000, 1),
+        "pico_memoria_mb": round(pico / 1024 / 1024, 2),
+        "bytes": total_bytes,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 20000, 100000])
+    args = parser.parse_args()
+
+    resultados = {}
+    for total in args.tamanhos:
+        async with banco_temporario() as db:
+            await popular(db, total)
+            resultados[total] = {
+                "materializado": await medir(materializado(db)),
+                "streaming_csv": await medir(gerar_csv(linhas_agendamentos(db, {}), CAMPOS_AGENDAMENTO)),
+            }
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+Benchmark: hidratação por linha (find_one por agendamento) vs hidratação em lote
+
+Uso:
+    python -m benchmarks.bench_hidratacao
+
+Mede a latência de uma página de agendamentos expandidos para vários
+tamanhos de página. Com a hidratação em lote a latência deve ficar
+praticamente constante, enquanto a versão por linha cresce com a página.
+"""
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.services.hidratacao import hidratar_agendamentos, normalizar_id
+from benchmarks.comum import banco_temporario, cronometrar, resumir
+
+TAMANHOS_PAGINA = [10, 50, 100, 250, 500]
+REPETICOES = 20
+
+
+async def popular(db, total_agendamentos: int = 1000):
+    clientes = [{"_id": ObjectId(), "nome": f"Cliente {i}", "telefone": "0000"} for i in range(300)]
+    profissionais = [{"_id": ObjectId(), "nome": f"Profissional {i}"} for i in range(10)]
+    servicos = [{"_id": ObjectId(), "nome": f"Serviço {i}", "duracao": 30, "valor": 100.0} for i in range(20)]
+    await db.clientes.insert_many(clientes)
+    await db.profissionais.insert_many(profissionais)
+    await db.servicos.insert_many(servicos)
+
+    base = datetime(2025, 1, 1, 8, 0)
+    agendamentos = []
+    for i in range(total_agendamentos):
+        # IDs misturados (string e ObjectId), como nos dados reais
+        cliente_id = random.choice(clientes)["_id"]
+        agendamentos.append({
+            "cliente_id": str(cliente_id) if i % 2 else cliente_id,
+            "profissional_id": str(random.choice(profissionais)["_id"]),
+            "servico_id": str(random.choice(servicos)["_id"]),
+            "data_hora": base + timedelta(minutes=30 * i),
+            "status": "agendado",
+        })
+    await db.agendamentos.insert_many(agendamentos)
+
+
+async def hidratar_por_linha(db, agendamentos):
+    """Comportamento anterior: três find_one por agendamento"""
+    for agendamento in agendamentos:
+        cliente = await db.clientes.find_one({"_id": normalizar_id(agendamento["cliente_id"])})
+        profissional = await db.profissionais.find_one({"_id": normalizar_id(agendamento["profissional_id"])})
+        servico = await db.servicos.find_one({"_id": normalizar_id(agendamento["servico_id"])})
+        agendamento["cliente_nome"] = cliente["nome"] if cliente else None
+        agendamento["profissional_nome"] = profissional["nome"] if profissional else None
+        agendamento["servico_nome"] = servico["nome"] if servico else None
+
+
+async def main():
+    resultados = {}
+    async with banco_temporario() as db:
+        await popular(db, max(TAMANHOS_PAGINA))
+
+        for tamanho in TAMANHOS_PAGINA:
+            async def pagina_por_linha():
+                agendamentos = await db.agendamentos.find({}).limit(tamanho).to_list(length=tamanho)
+                await hidratar_por_linha(db, agendamentos)
+
+            async def pagina_em_lote():
+                agendamentos = await db.agendamentos.find({}).limit(tamanho).to_list(length=tamanho)
+                await hidratar_agendamentos(db, agendamentos)
+
+            resultados[tamanho] = {
+                "por_linha": resumir(await cronometrar(pagina_por_linha, REPETICOES)),
+                "em_lote": resumir(await cronometrar(pagina_em_lote, REPETICOES)),
+            }
+
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+Benchmark: verificação de senha (bcrypt) no event loop vs no pool de hash
+
+Uso:
+    python -m benchmarks.bench_login [--logins 200] [--concorrencia 32]
+
+Dispara logins concorrentes (verificação bcrypt) e, ao mesmo tempo, mede a
+latência de uma requisição "não relacionada" ao /health da aplicação, feita
+pelo mesmo event loop. Com o bcrypt síncrono o event loop congela e o p99
+do /health acompanha o custo do hash; com o pool ele fica próximo de zero.
+
+Não precisa de MongoDB: apenas a verificação de senha do login é exercitada.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from starlette.types import Message
+
+from app.core.security import get_password_hash, verify_password, verify_and_update_password
+from app.main import app
+from benchmarks.comum import resumir
+
+
+async def chamar_health() -> None:
+    """Executa GET /health diretamente na aplicação ASGI, no event loop atual"""
+    escopo = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/health", "raw_path": b"/health",
+        "query_string": b"", "headers": [], "server": ("bench", 80), "client": ("bench", 1),
+    }
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        pass
+
+    await app(escopo, receive, send)
+
+
+async def sondar_health(parar: asyncio.Event, latencias: list, intervalo: float = 0.005):
+    """
+    Simula requisições chegando a cada `intervalo` segundos. A latência é medida
+    a partir do instante de chegada, incluindo a espera pelo event loop.
+    """
+    while not parar.is_set():
+        chegada = time.perf_counter() + intervalo
+        await asyncio.sleep(intervalo)
+        await chamar_health()
+        latencias.append(time.perf_counter() - chegada)
+
+
+async def executar(modo: str, senha_hash: str, total: int, concorrencia: int) -> dict:
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def login():
+        async with semaforo:
+            if modo == "sincrono":
+                # Comportamento anterior: bcrypt dentro da corrotina
+                verify_password("senha123", senha_hash)
+                await asyncio.sleep(0)
+            else:
+                await verify_and_update_password("senha123", senha_hash)
+
+    parar = asyncio.Event()
+    latencias_health: list = []
+    sonda = asyncio.create_task(sondar_health(parar, latencias_health))
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*[login() for _ in range(total)])
+    duracao = time.perf_counter() - inicio
+
+    parar.set()
+    await sonda
+
+    return {
+        "logins_por_segundo": round(total / duracao, 1),
+        "health_durante_logins": resumir(latencias_health),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concorrencia", type=int, default=32)
+    args = parser.parse_args()
+
+    senha_hash = get_password_hash("senha123")
+    resultados = {
+        modo: await executar(modo, senha_hash, args.logins, args.concorrencia)
+        for modo in ("sincrono", "pool")
+    }
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
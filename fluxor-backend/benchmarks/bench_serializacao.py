@@ -0,0 +1,140 @@
+"""
+Benchmark: serialização de uma página de listagem (antes/depois do caminho rápido)
+
+Uso:
+    python -m benchmarks.bench_serializacao [--itens 1000]
+
+Não usa o MongoDB. Para uma página de clientes e uma de agendamentos mede:
+  - antes: um modelo Pydantic por documento, revalidado contra o
+    response_model e codificado pelo FastAPI (serialize_response + JSONResponse);
+    nos agendamentos, a conversão manual das datas para ISO;
+  - depois: resposta_lista (projeção nos campos do modelo + orjson);
+  - validacao: resposta_lista com RESPOSTAS_VALIDAR_MODELOS (TypeAdapter da lista).
+Confere que antes e depois produzem o mesmo JSON.
+"""
+import argparse
+import asyncio
+import copy
+import json
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.core.config import get_settings
+from app.core.serializacao import resposta_lista
+from app.schemas import Cliente
+from benchmarks.comum import cronometrar, resumir
+
+REPETICOES = 30
+
+
+def clientes(total: int) -> List[dict]:
+    agora = datetime(2030, 1, 1, 9, 30, 15, 123000)
+    return [
+        {
+            "_id": str(ObjectId()), "nome": f"Cliente {i}", "email": f"cliente{i}@exemplo.com",
+            "telefone": "(92) 99999-0000", "cpf": f"{i:011d}", "endereco": "Rua A, 100",
+            "ativo": True, "criado_em": agora, "atualizado_em": agora + timedelta(days=i),
+        }
+        for i in range(total)
+    ]
+
+
+def agendamentos(total: int) -> List[dict]:
+    inicio = datetime(2030, 1, 1, 8, 0)
+    return [
+        {
+            "_id": ObjectId(), "cliente_id": str(ObjectId()), "profissional_id": str(ObjectId()),
+            "servico_id": str(ObjectId()), "data_hora": inicio + timedelta(minutes=30 * i),
+            "status": "agendado", "observacoes": None, "cliente_nome": f"Cliente {i}",
+            "profissional_nome": "Profissional", "servico_nome": "Consulta",
+            "duracao": 30, "valor": 150.0, "criado_em": inicio, "atualizado_em": inicio,
+        }
+        for i in range(total)
+    ]
+
+
+async def clientes_antes(documentos: List[dict]) -> bytes:
+    campo = create_response_field(name="resposta", type_=List[Cliente], mode="serialization")
+    modelos = [Cliente(**c) for c in documentos]
+    conteudo = await serialize_response(field=campo, response_content=modelos)
+    return JSONResponse(conteudo).body
+
+
+def agendamentos_antes(documentos: List[dict]) -> bytes:
+    resultado = []
+    for agendamento in documentos:
+        agendamento["_id"] = str(agendamento["_id"])
+        agendamento["id"] = agendamento["_id"]
+        for campo in ("data_hora", "criado_em", "atualizado_em"):
+            if isinstance(agendamento.get(campo), datetime):
+                agendamento[campo] = agendamento[campo].isoformat()
+        resultado.append(agendamento)
+    return JSONResponse(resultado).body
+
+
+def agendamentos_depois(documentos: List[dict]) -> bytes:
+    for agendamento in documentos:
+        agendamento["_id"] = str(agendamento["_id"])
+        agendamento["id"] = agendamento["_id"]
+    return resposta_lista(documentos).body
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--itens", type=int, default=1000)
+    args = parser.parse_args()
+    settings = get_settings()
+
+    pagina_clientes = clientes(args.itens)
+    pagina_agendamentos = agendamentos(args.itens)
+    copias = lambda: copy.deepcopy(pagina_agendamentos)
+
+    async def c_antes():
+        await clientes_antes(pagina_clientes)
+
+    async def c_depois():
+        resposta_lista(pagina_clientes, Cliente)
+
+    async def c_validacao():
+        settings.RESPOSTAS_VALIDAR_MODELOS = True
+        try:
+            resposta_lista(pagina_clientes, Cliente)
+        finally:
+            settings.RESPOSTAS_VALIDAR_MODELOS = False
+
+    # As versões de agendamentos alteram os documentos: cada repetição usa uma cópia
+    lotes_antes = [copias() for _ in range(REPETICOES)]
+    lotes_depois = [copias() for _ in range(REPETICOES)]
+
+    async def a_antes():
+        agendamentos_antes(lotes_antes.pop())
+
+    async def a_depois():
+        agendamentos_depois(lotes_depois.pop())
+
+    resultados = {
+        "itens": args.itens,
+        "clientes_mesmo_json": json.loads(await clientes_antes(pagina_clientes))
+        == json.loads(resposta_lista(pagina_clientes, Cliente).body),
+        "agendamentos_mesmo_json": json.loads(agendamentos_antes(copias()))
+        == json.loads(agendamentos_depois(copias())),
+        "clientes": {
+            "antes": resumir(await cronometrar(c_antes, REPETICOES)),
+            "depois": resumir(await cronometrar(c_depois, REPETICOES)),
+            "validacao": resumir(await cronometrar(c_validacao, REPETICOES)),
+        },
+        "agendamentos": {
+            "antes": resumir(await cronometrar(a_antes, REPETICOES)),
+            "depois": resumir(await cronometrar(a_depois, REPETICOES)),
+        },
+    }
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
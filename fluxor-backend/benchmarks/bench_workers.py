@@ -0,0 +1,108 @@
+"""
+Benchmark: requisições/s por número de workers (run.py)
+
+Uso:
+    python -m benchmarks.bench_workers [--workers 1 2 4] [--duracao 10] [--conexoes 64]
+
+Popula o banco descartável, sobe `python run.py` com SERVIDOR_WORKERS = N para
+cada N pedido e dispara carga mista nos endpoints de agendamento online
+(catálogo e disponibilidade) e de listagem (clientes e agendamentos).
+Mostra req/s e percentis por endpoint para cada número de workers. O ganho só
+aparece em máquinas com mais de uma CPU livre para o servidor (o gerador de
+carga também consome CPU: use --processos-carga para distribuí-lo).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+from datetime import date, datetime, timedelta
+
+from bson import ObjectId
+
+from app.core.config import get_settings
+from app.core.security import claims_usuario, create_access_token
+from benchmarks.cliente_http import gerar_carga, resumir_carga, servidor_local
+from benchmarks.comum import BENCH_DATABASE, banco_temporario, resumir
+
+
+async def popular(db) -> dict:
+    agora = datetime.now().replace(microsecond=0)
+    usuario = {"_id": ObjectId(), "nome": "Bench", "email": "bench@fluxor.com", "tipo": "admin",
+               "ativo": True, "criado_em": agora, "atualizado_em": agora}
+    await db.usuarios.insert_one(usuario)
+
+    profissionais = [{"_id": ObjectId(), "nome": f"Profissional {i}", "especialidade": "Geral",
+                      "telefone": "0000", "ativo": True, "criado_em": agora, "atualizado_em": agora,
+                      "horario_trabalho": {"inicio": "08:00", "fim": "18:00"}} for i in range(5)]
+    servicos = [{"_id": ObjectId(), "nome": f"Serviço {i}", "tipo": "Consulta", "duracao": 30,
+                 "valor": 100.0, "ativo": True, "criado_em": agora, "atualizado_em": agora,
+                 "profissionais_habilitados": [str(p["_id"]) for p in profissionais]} for i in range(10)]
+    clientes = [{"_id": ObjectId(), "nome": f"Cliente {i}", "telefone": "0000", "ativo": True,
+                 "criado_em": agora, "atualizado_em": agora} for i in range(2000)]
+    await db.profissionais.insert_many(profissionais)
+    await db.servicos.insert_many(servicos)
+    await db.clientes.insert_many(clientes)
+
+    inicio = datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=8)
+    await db.agendamentos.insert_many([
+        {
+            "cliente_id": str(random.choice(clientes)["_id"]),
+            "profissional_id": str(random.choice(profissionais)["_id"]),
+            "servico_id": str(random.choice(servicos)["_id"]),
+            "cliente_nome": "Cliente", "profissional_nome": "Profissional", "servico_nome": "Serviço",
+            "duracao": 30, "valor": 100.0, "status": "agendado",
+            "data_hora": inicio + timedelta(days=random.randrange(30), minutes=30 * random.randrange(20)),
+            "criado_em": agora, "atualizado_em": agora,
+        }
+        for _ in range(5000)
+    ])
+    return {"usuario": usuario, "servico": servicos[0]}
+
+
+def requisicoes(dados: dict) -> list:
+    token = create_access_token(claims_usuario(dados["usuario"]))
+    auth = {"Authorization": f"Bearer {token}"}
+    hoje = date.today()
+    periodo = (f"/agendamento-online/disponibilidade-periodo/publico?data_inicio={hoje}"
+               f"&data_fim={hoje + timedelta(days=6)}&servico_id={dados['servico']['_id']}")
+    return [
+        ("catalogo_servicos", "GET", "/agendamento-online/servicos-disponiveis/publico", None, {}),
+        ("disponibilidade_semana", "GET", periodo, None, {}),
+        ("listar_clientes", "GET", "/clientes/?limit=50", None, auth),
+        ("listar_agendamentos", "GET", "/agendamentos/?limit=50", None, auth),
+    ]
+
+
+def medir(workers: int, porta: int, carga: list, args) -> dict:
+    ambiente = {
+        "SERVIDOR_WORKERS": str(workers),
+        "DATABASE_NAME": BENCH_DATABASE,
+        "MONGODB_URL": os.environ.get("BENCH_MONGODB_URL", get_settings().MONGODB_URL),
+    }
+    with servidor_local(porta, ambiente):
+        # Aquecimento: caches e conexões de cada worker
+        gerar_carga("127.0.0.1", porta, carga, args.conexoes, 2.0, args.processos_carga)
+        resultados = gerar_carga("127.0.0.1", porta, carga, args.conexoes, args.duracao, args.processos_carga)
+        return resumir_carga(resultados, args.duracao, resumir)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duracao", type=float, default=10.0)
+    parser.add_argument("--conexoes", type=int, default=64)
+    parser.add_argument("--processos-carga", type=int, default=2)
+    parser.add_argument("--porta", type=int, default=8099)
+    args = parser.parse_args()
+
+    async with banco_temporario() as db:
+        carga = requisicoes(await popular(db))
+        resultados = {"cpus": os.cpu_count()}
+        for workers in args.workers:
+            resultados[f"workers_{workers}"] = await asyncio.to_thread(medir, workers, args.porta, carga, args)
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
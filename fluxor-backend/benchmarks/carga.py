@@ -0,0 +1,269 @@
+"""
+Teste de carga da API inteira contra um MongoDB local
+
+Uso:
+    python -m benchmarks.carga [--clientes 5000] [--agendamentos 200000]
+                               [--duracao 30] [--conexoes 64] [--workers 1]
+                               [--saida resultado.json]
+
+1. Popula um banco descartável com uma base realista: usuários da equipe,
+   profissionais, serviços, clientes com link de agendamento e agendamentos
+   sem sobreposição (passados e futuros, com reservas de horário).
+2. Sobe a aplicação (`python run.py`) apontando para esse banco.
+3. Dispara uma mistura fixa de cenários, com pesos em PESOS: login da equipe,
+   agenda do dia, dashboard, catálogo e disponibilidade públicos e
+   agendamentos pelo link (/agendamento-online/agendar/{token}), cada um em
+   um horário livre diferente.
+4. Imprime (e grava em --saida) um JSON com req/s, p50/p95/p99 e respostas
+   por status de cada cenário, com o commit e os parâmetros, para comparar
+   execuções entre commits.
+
+O MongoDB vem de --mongodb-url (padrão: BENCH_MONGODB_URL ou um mongod local
+em localhost:27017). A mistura é sempre a mesma (semente fixa).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+from datetime import date, datetime, time, timedelta
+from functools import partial
+
+from bson import ObjectId
+
+from app.core.config import get_settings
+from app.core.security import claims_usuario, create_access_token, get_password_hash
+from app.database.indices import aplicar_indices
+from app.services.reservas import reconstruir_reservas
+from benchmarks.cliente_http import DIRETORIO_BACKEND, gerar_carga, resumir_carga, servidor_local
+from benchmarks.comum import BENCH_DATABASE, banco_temporario, resumir
+
+SEMENTE = 42
+SENHA = "carga123"
+
+PROFISSIONAIS = 20
+SERVICOS = 15
+USUARIOS = 10
+# Grade dos agendamentos semeados e dos agendados durante a carga
+INICIO_EXPEDIENTE = 8
+HORARIOS_POR_DIA = 20
+DURACAO_MINUTOS = 30
+# Fração da grade ocupada pelos agendamentos semeados
+OCUPACAO = 0.8
+DIAS_FUTUROS = 60
+
+STATUS_PASSADOS = ["concluido"] * 7 + ["cancelado", "faltou"]
+STATUS_FUTUROS = ["agendado"] * 3 + ["confirmado"]
+
+# Cenário -> peso na mistura de requisições
+PESOS = {
+    "login": 1,
+    "agenda_dia": 4,
+    "dashboard": 1,
+    "catalogo_servicos": 2,
+    "disponibilidade_dia": 3,
+    "disponibilidade_semana": 1,
+    "agendar_link": 2,
+}
+
+
+def _horario(dia: date, indice: int) -> datetime:
+    return datetime.combine(dia, time(INICIO_EXPEDIENTE)) + timedelta(minutes=DURACAO_MINUTOS * indice)
+
+
+async def popular(db, total_clientes: int, total_agendamentos: int) -> dict:
+    """Semeia a base e retorna o que os cenários precisam (IDs, tokens, período)"""
+    rnd = random.Random(SEMENTE)
+    agora = datetime.now().replace(microsecond=0)
+    await aplicar_indices(db)
+
+    senha = get_password_hash(SENHA)
+    usuarios = [{"_id": ObjectId(), "nome": f"Equipe {i}", "email": f"equipe{i}@fluxor.com", "senha": senha,
+                 "tipo": "admin" if i == 0 else "atendente", "ativo": True,
+                 "criado_em": agora, "atualizado_em": agora} for i in range(USUARIOS)]
+    profissionais = [{"_id": ObjectId(), "nome": f"Profissional {i}", "especialidade": "Geral",
+                      "telefone": "0000", "ativo": True, "criado_em": agora, "atualizado_em": agora,
+                      "horario_trabalho": {"inicio": f"{INICIO_EXPEDIENTE:02d}:00", "fim": "18:00"}}
+                     for i in range(PROFISSIONAIS)]
+    servicos = [{"_id": ObjectId(), "nome": f"Serviço {i}", "tipo": "Consulta", "duracao": DURACAO_MINUTOS,
+                 "valor": float(50 + 10 * i), "ativo": True, "criado_em": agora, "atualizado_em": agora,
+                 "profissionais_habilitados": [str(p["_id"]) for p in profissionais]} for i in range(SERVICOS)]
+    clientes = [{"_id": ObjectId(), "nome": f"Cliente {i}", "telefone": f"9{i:08d}",
+                 "email": f"cliente{i}@exemplo.com", "ativo": True,
+                 "criado_em": agora - timedelta(days=rnd.randrange(720)), "atualizado_em": agora}
+                for i in range(total_clientes)]
+    await db.usuarios.insert_many(usuarios)
+    await db.profissionais.insert_many(profissionais)
+    await db.servicos.insert_many(servicos)
+    for lote in range(0, len(clientes), 10_000):
+        await db.clientes.insert_many(clientes[lote:lote + 10_000])
+    tokens = [f"carga-{i}" for i in range(len(clientes))]
+    await db.links_agendamento.insert_many([
+        {"cliente_id": c["_id"], "token": token, "ativo": True, "criado_em": agora.isoformat(), "acessos": 0}
+        for c, token in zip(clientes, tokens)
+    ])
+
+    # Agendamentos em posições sorteadas da grade (dia, profissional, horário), sem sobreposição
+    por_dia = PROFISSIONAIS * HORARIOS_POR_DIA
+    dias = max(DIAS_FUTUROS + 1, int(total_agendamentos / (por_dia * OCUPACAO)) + 1)
+    primeiro_dia = date.today() - timedelta(days=dias - DIAS_FUTUROS)
+    posicoes = rnd.sample(range(dias * por_dia), min(total_agendamentos, dias * por_dia))
+    hoje = date.today()
+    lote = []
+    for posicao in posicoes:
+        dia = primeiro_dia + timedelta(days=posicao // por_dia)
+        profissional = profissionais[(posicao % por_dia) // HORARIOS_POR_DIA]
+        servico, cliente = rnd.choice(servicos), rnd.choice(clientes)
+        lote.append({
+            "cliente_id": str(cliente["_id"]), "profissional_id": str(profissional["_id"]),
+            "servico_id": str(servico["_id"]), "cliente_nome": cliente["nome"],
+            "profissional_nome": profissional["nome"], "servico_nome": servico["nome"],
+            "duracao": DURACAO_MINUTOS, "valor": servico["valor"],
+            "status": rnd.choice(STATUS_PASSADOS if dia < hoje else STATUS_FUTUROS),
+            "data_hora": _horario(dia, posicao % HORARIOS_POR_DIA),
+            "origem": rnd.choice(["sistema", "link_online"]),
+            "criado_em": agora, "atualizado_em": agora,
+        })
+        if len(lote) == 10_000:
+            await db.agendamentos.insert_many(lote)
+            lote = []
+    if lote:
+        await db.agendamentos.insert_many(lote)
+    await reconstruir_reservas(db)
+
+    return {
+        "usuarios": usuarios, "profissionais": profissionais, "servicos": servicos, "tokens": tokens,
+        "primeiro_dia_livre": primeiro_dia + timedelta(days=dias),
+    }
+
+
+def corpo_agendamento(profissionais: list, servico_id: str, primeiro_dia: date, sequencial: int) -> dict:
+    """Agendamento público em um horário livre único: a grade após os dias semeados"""
+    dia = primeiro_dia + timedelta(days=sequencial // (len(profissionais) * HORARIOS_POR_DIA))
+    resto = sequencial % (len(profissionais) * HORARIOS_POR_DIA)
+    return {
+        "servico_id": servico_id,
+        "profissional_id": profissionais[resto // HORARIOS_POR_DIA],
+        "data_hora": _horario(dia, resto % HORARIOS_POR_DIA).isoformat(),
+        "observacoes": "teste de carga",
+    }
+
+
+def cenarios(dados: dict) -> list:
+    """Mistura de requisições, com cada cenário repetido conforme o peso"""
+    rnd = random.Random(SEMENTE)
+    auth = {"Authorization": f"Bearer {create_access_token(claims_usuario(dados['usuarios'][0]))}"}
+    profissionais = [str(p["_id"]) for p in dados["profissionais"]]
+    servicos = [str(s["_id"]) for s in dados["servicos"]]
+    hoje = date.today()
+
+    def login():
+        usuario = rnd.choice(dados["usuarios"])
+        return ("login", "POST", "/auth/login", {"email": usuario["email"], "senha": SENHA}, {})
+
+    def agenda_dia():
+        dia = hoje + timedelta(days=rnd.randrange(-3, 4))
+        return ("agenda_dia", "GET", f"/agendamentos/?data_inicio={dia}T00:00:00"
+                f"&data_fim={dia}T23:59:59&limit=100", None, auth)
+
+    def dashboard():
+        return ("dashboard", "GET", "/relatorios/dashboard", None, auth)
+
+    def catalogo_servicos():
+        return ("catalogo_servicos", "GET", f"/agendamento-online/servicos-disponiveis/{rnd.choice(dados['tokens'])}",
+                None, {})
+
+    def disponibilidade_dia():
+        dia = hoje + timedelta(days=rnd.randrange(1, 15))
+        return ("disponibilidade_dia", "GET",
+                f"/agendamento-online/disponibilidade/{rnd.choice(dados['tokens'])}"
+                f"?profissional_id={rnd.choice(profissionais)}&data={dia}&servico_id={rnd.choice(servicos)}",
+                None, {})
+
+    def disponibilidade_semana():
+        inicio = hoje + timedelta(days=rnd.randrange(1, 15))
+        return ("disponibilidade_semana", "GET",
+                f"/agendamento-online/disponibilidade-periodo/{rnd.choice(dados['tokens'])}"
+                f"?data_inicio={inicio}&data_fim={inicio + timedelta(days=6)}&servico_id={rnd.choice(servicos)}",
+                None, {})
+
+    def agendar_link():
+        corpo = partial(corpo_agendamento, profissionais, rnd.choice(servicos), dados["primeiro_dia_livre"])
+        return ("agendar_link", "POST", f"/agendamento-online/agendar/{rnd.choice(dados['tokens'])}", corpo, {})
+
+    geradores = {
+        "login": login, "agenda_dia": agenda_dia, "dashboard": dashboard,
+        "catalogo_servicos": catalogo_servicos, "disponibilidade_dia": disponibilidade_dia,
+        "disponibilidade_semana": disponibilidade_semana, "agendar_link": agendar_link,
+    }
+    requisicoes = [geradores[nome]() for _ in range(10) for nome, peso in PESOS.items() for _ in range(peso)]
+    rnd.shuffle(requisicoes)
+    return requisicoes
+
+
+def commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=DIRETORIO_BACKEND,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def medir(args, url: str, carga: list) -> dict:
+    ambiente = {
+        "SERVIDOR_WORKERS": str(args.workers),
+        "DATABASE_NAME": BENCH_DATABASE,
+        "MONGODB_URL": url,
+    }
+    with servidor_local(args.porta, ambiente):
+        # Aquecimento: caches, pools de conexão e JIT do MongoDB
+        gerar_carga("127.0.0.1", args.porta, carga, args.conexoes, args.aquecimento, args.processos_carga)
+        resultados = gerar_carga("127.0.0.1", args.porta, carga, args.conexoes, args.duracao, args.processos_carga)
+    return resumir_carga(resultados, args.duracao, resumir)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clientes", type=int, default=5000)
+    parser.add_argument("--agendamentos", type=int, default=200_000)
+    parser.add_argument("--duracao", type=float, default=30.0)
+    parser.add_argument("--aquecimento", type=float, default=5.0)
+    parser.add_argument("--conexoes", type=int, default=64)
+    parser.add_argument("--processos-carga", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--porta", type=int, default=8098)
+    parser.add_argument("--mongodb-url", default=os.environ.get("BENCH_MONGODB_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--saida", help="Arquivo para gravar o JSON do resultado")
+    args = parser.parse_args()
+
+    # banco_temporario usa BENCH_MONGODB_URL
+    os.environ["BENCH_MONGODB_URL"] = args.mongodb_url
+
+    async with banco_temporario() as db:
+        inicio = datetime.now()
+        dados = await popular(db, args.clientes, args.agendamentos)
+        carga = cenarios(dados)
+        resultado = {
+            "commit": commit_atual(),
+            "data": inicio.isoformat(timespec="seconds"),
+            "parametros": {
+                "clientes": args.clientes, "agendamentos": args.agendamentos, "duracao_s": args.duracao,
+                "conexoes": args.conexoes, "workers": args.workers, "pesos": PESOS,
+                "bcrypt_rounds": get_settings().BCRYPT_ROUNDS,
+            },
+            "populacao_s": round((datetime.now() - inicio).total_seconds(), 1),
+            "cenarios": await asyncio.to_thread(medir, args, args.mongodb_url, carga),
+        }
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto + "\n")
+    print(texto)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,223 @@
+"""
+Cliente HTTP/1.1 mínimo e gerador de carga para os benchmarks de servidor
+
+Usa apenas asyncio (sem dependências extras): conexões keep-alive, respostas
+com Content-Length ou chunked. A carga pode ser gerada por vários processos
+para que o próprio gerador não limite o throughput medido.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+DIRETORIO_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Corpo fixo, ou função (picklável) que recebe um número sequencial único em
+# toda a carga e monta o corpo (ex: um horário diferente por agendamento)
+Corpo = Union[None, dict, Callable[[int], dict]]
+
+# (nome, método, caminho, corpo, headers extras)
+Requisicao = Tuple[str, str, str, Corpo, Dict[str, str]]
+
+
+class ConexaoHTTP:
+    """Uma conexão keep-alive com o servidor"""
+
+    def __init__(self, host: str, porta: int):
+        self.host = host
+        self.porta = porta
+        self._leitor: Optional[asyncio.StreamReader] = None
+        self._escritor: Optional[asyncio.StreamWriter] = None
+
+    async def _conectar(self):
+        self._leitor, self._escritor = await asyncio.open_connection(self.host, self.porta)
+
+    async def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            self._escritor = None
+
+    async def requisitar(
+        self,
+        metodo: str,
+        caminho: str,
+        corpo: Optional[dict] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, bytes]:
+        """Envia a requisição e retorna (status, corpo); reconecta se o servidor fechou"""
+        if self._escritor is None:
+            await self._conectar()
+        dados = json.dumps(corpo).encode() if corpo is not None else b""
+        linhas = [f"{metodo} {caminho} HTTP/1.1", f"Host: {self.host}:{self.porta}",
+                  f"Content-Length: {len(dados)}"]
+        if corpo is not None:
+            linhas.append("Content-Type: application/json")
+        linhas += [f"{chave}: {valor}" for chave, valor in (headers or {}).items()]
+        self._escritor.write(("\r\n".join(linhas) + "\r\n\r\n").encode() + dados)
+        try:
+            await self._escritor.drain()
+            return await self._ler_resposta()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # Worker reciclado ou keep-alive expirado: nova conexão e nova tentativa
+            await self.fechar()
+            await self._conectar()
+            return await self.requisitar(metodo, caminho, corpo, headers)
+
+    async def _ler_resposta(self) -> Tuple[int, bytes]:
+        cabecalho = await self._leitor.readuntil(b"\r\n\r\n")
+        linhas = cabecalho.decode("latin-1").split("\r\n")
+        status = int(linhas[0].split(" ")[1])
+        campos = {}
+        for linha in linhas[1:]:
+            if ":" in linha:
+                chave, valor = linha.split(":", 1)
+                campos[chave.strip().lower()] = valor.strip()
+
+        if campos.get("transfer-encoding") == "chunked":
+            corpo = b""
+            while True:
+                tamanho = int((await self._leitor.readuntil(b"\r\n")).strip(), 16)
+                pedaco = await self._leitor.readexactly(tamanho + 2)
+                if tamanho == 0:
+                    break
+                corpo += pedaco[:-2]
+        else:
+            corpo = await self._leitor.readexactly(int(campos.get("content-length", 0)))
+
+        if campos.get("connection") == "close":
+            await self.fechar()
+        return status, corpo
+
+
+@contextmanager
+def servidor_local(porta: int, ambiente: Dict[str, str]):
+    """Sobe `python run.py` na porta com as variáveis extras e encerra ao sair"""
+    servidor = subprocess.Popen(
+        [sys.executable, "run.py"], cwd=DIRETORIO_BACKEND,
+        env={**os.environ, **ambiente, "PORT": str(porta)},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        aguardar_servidor(f"http://127.0.0.1:{porta}/health")
+        yield servidor
+    finally:
+        servidor.send_signal(signal.SIGTERM)
+        servidor.wait(timeout=60)
+
+
+def aguardar_servidor(url: str, tempo_maximo: float = 60.0):
+    """Espera o servidor responder em `url` (ex: /health)"""
+    limite = time.monotonic() + tempo_maximo
+    while time.monotonic() < limite:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Servidor não respondeu em {url}")
+
+
+async def _carga_processo(
+    host: str,
+    porta: int,
+    requisicoes: List[Requisicao],
+    conexoes: int,
+    duracao: float,
+    primeira_conexao: int = 0,
+    total_conexoes: int = 0
+) -> Dict[str, dict]:
+    """Cada conexão percorre a lista de requisições em ciclo até acabar o tempo"""
+    resultados: Dict[str, dict] = {
+        nome: {"latencias": [], "erros": 0, "status": Counter()} for nome, *_ in requisicoes
+    }
+    fim = time.monotonic() + duracao
+    total_conexoes = total_conexoes or conexoes
+
+    async def trabalhador(deslocamento: int):
+        conexao = ConexaoHTTP(host, porta)
+        i = deslocamento
+        enviadas = 0
+        try:
+            while time.monotonic() < fim:
+                nome, metodo, caminho, corpo, headers = requisicoes[i % len(requisicoes)]
+                i += 1
+                if callable(corpo):
+                    # Sequencial único entre conexões e processos
+                    corpo = corpo(primeira_conexao + deslocamento + total_conexoes * enviadas)
+                enviadas += 1
+                inicio = time.perf_counter()
+                try:
+                    status, _ = await conexao.requisitar(metodo, caminho, corpo, headers)
+                except OSError:
+                    resultados[nome]["erros"] += 1
+                    continue
+                resultados[nome]["latencias"].append(time.perf_counter() - inicio)
+                resultados[nome]["status"][status] += 1
+                if status >= 400:
+                    resultados[nome]["erros"] += 1
+        finally:
+            await conexao.fechar()
+
+    await asyncio.gather(*[trabalhador(n) for n in range(conexoes)])
+    return resultados
+
+
+def _executar_processo(argumentos) -> Dict[str, dict]:
+    return asyncio.run(_carga_processo(*argumentos))
+
+
+def gerar_carga(
+    host: str,
+    porta: int,
+    requisicoes: List[Requisicao],
+    conexoes: int = 32,
+    duracao: float = 10.0,
+    processos: int = 1
+) -> Dict[str, dict]:
+    """
+    Dispara a carga com `conexoes` conexões distribuídas em `processos`
+    processos e retorna, por nome, as latências (segundos) e os erros.
+    """
+    por_processo = max(1, conexoes // processos)
+    argumentos = [
+        (host, porta, requisicoes, por_processo, duracao, n * por_processo, por_processo * processos)
+        for n in range(processos)
+    ]
+    if processos == 1:
+        parciais = [_executar_processo(argumentos[0])]
+    else:
+        with multiprocessing.get_context("spawn").Pool(processos) as pool:
+            parciais = pool.map(_executar_processo, argumentos)
+
+    resultados: Dict[str, dict] = {}
+    for parcial in parciais:
+        for nome, dados in parcial.items():
+            destino = resultados.setdefault(nome, {"latencias": [], "erros": 0, "status": Counter()})
+            destino["latencias"].extend(dados["latencias"])
+            destino["erros"] += dados["erros"]
+            destino["status"].update(dados["status"])
+    return resultados
+
+
+def resumir_carga(resultados: Dict[str, dict], duracao: float, resumir: Callable) -> Dict[str, dict]:
+    """Throughput, percentis e respostas por status de cada endpoint, mais o total"""
+    resumo = {
+        nome: {
+            "req_s": round(len(d["latencias"]) / duracao, 1),
+            "erros": d["erros"],
+            "status": {str(status): vezes for status, vezes in sorted(d["status"].items())},
+            **resumir(d["latencias"]),
+        }
+        for nome, d in resultados.items()
+    }
+    total = sum(len(d["latencias"]) for d in resultados.values())
+    resumo["total"] = {"req_s": round(total / duracao, 1), "erros": sum(d["erros"] for d in resultados.values())}
+    return resumo
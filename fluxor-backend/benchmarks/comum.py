@@ -0,0 +1,61 @@
+"""
+Utilitários compartilhados pelos benchmarks
+
+Os benchmarks rodam contra um MongoDB real (BENCH_MONGODB_URL ou MONGODB_URL)
+usando um banco descartável, que é removido ao final.
+"""
+import os
+import statistics
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import get_settings
+
+BENCH_DATABASE = os.environ.get("BENCH_DATABASE", "fluxor_bench")
+
+
+@asynccontextmanager
+async def banco_temporario():
+    """Abre um banco descartável para o benchmark e remove ao final"""
+    url = os.environ.get("BENCH_MONGODB_URL", get_settings().MONGODB_URL)
+    client = AsyncIOMotorClient(url)
+    await client.drop_database(BENCH_DATABASE)
+    try:
+        yield client[BENCH_DATABASE]
+    finally:
+        await client.drop_database(BENCH_DATABASE)
+        client.close()
+
+
+def percentil(amostras: List[float], p: float) -> float:
+    """Percentil por interpolação do vizinho mais próximo"""
+    if not amostras:
+        return 0.0
+    ordenadas = sorted(amostras)
+    indice = min(len(ordenadas) - 1, max(0, int(round(p / 100 * len(ordenadas))) - 1))
+    return ordenadas[indice]
+
+
+def resumir(amostras: List[float]) -> Dict[str, float]:
+    """Resumo em milissegundos de uma lista de durações em segundos"""
+    ms = [a * 1000 for a in amostras]
+    return {
+        "n": len(ms),
+        "media_ms": round(statistics.fmean(ms), 3) if ms else 0.0,
+        "p50_ms": round(percentil(ms, 50), 3),
+        "p95_ms": round(percentil(ms, 95), 3),
+        "p99_ms": round(percentil(ms, 99), 3),
+    }
+
+
+async def cronometrar(funcao: Callable[[], Awaitable], repeticoes: int) -> List[float]:
+    """Executa a corrotina N vezes e retorna as durações em segundos"""
+    duracoes = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        await funcao()
+        duracoes.append(time.perf_counter() - inicio)
+    return duracoes
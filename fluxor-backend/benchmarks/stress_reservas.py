@@ -0,0 +1,128 @@
+"""
+Teste de estresse: marcações concorrentes para o mesmo horário
+
+Uso:
+    python -m benchmarks.stress_reservas [--concorrentes 300] [--horarios-distintos 300]
+
+1. Dispara N marcações simultâneas para o mesmo profissional e horário e
+   verifica que exatamente uma vence e que as perdedoras não deixam reservas
+   órfãs. Repete com inícios e durações variados, todos sobrepostos, em que
+   no máximo uma pode vencer.
+2. Dispara N marcações simultâneas para horários distintos e verifica que todas
+   vencem, comparando com o tempo das mesmas marcações em sequência (não há
+   trava global serializando as marcações).
+
+Termina com código 1 se alguma verificação falhar.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.database.indices import INDICES
+from app.services.reservas import COLECAO_RESERVAS, HorarioIndisponivel, reservar_agendamento
+from benchmarks.comum import banco_temporario
+
+
+async def marcar(db, agendamento: dict) -> bool:
+    try:
+        await reservar_agendamento(db, agendamento)
+        return True
+    except HorarioIndisponivel:
+        return False
+
+
+def agendamento(profissional_id: str, data_hora: datetime, duracao: int) -> dict:
+    return {
+        "_id": ObjectId(), "profissional_id": profissional_id,
+        "data_hora": data_hora, "duracao": duracao, "status": "agendado",
+    }
+
+
+async def disputar(db, tentativas: list) -> dict:
+    """Dispara as tentativas ao mesmo tempo e confere vencedores e reservas órfãs"""
+    resultados = await asyncio.gather(*[marcar(db, a) for a in tentativas])
+    vencedores = [a["_id"] for a, ok in zip(tentativas, resultados) if ok]
+    donos = await db[COLECAO_RESERVAS].distinct(
+        "agendamento_id", {"agendamento_id": {"$in": [a["_id"] for a in tentativas]}}
+    )
+    return {"tentativas": len(tentativas), "vencedores": len(vencedores),
+            "sem_orfas": sorted(donos) == sorted(vencedores)}
+
+
+async def mesmo_horario(db, concorrentes: int) -> dict:
+    """Todas as tentativas no mesmo horário: exatamente uma vence"""
+    profissional_id = str(ObjectId())
+    inicio = datetime(2030, 1, 7, 9, 0)
+    resultado = await disputar(db, [agendamento(profissional_id, inicio, 60) for _ in range(concorrentes)])
+    resultado["ok"] = resultado["vencedores"] == 1 and resultado["sem_orfas"]
+    return resultado
+
+
+async def horarios_sobrepostos(db, concorrentes: int) -> dict:
+    """Inícios e durações diferentes, todos cobrindo 09:15-09:30: no máximo uma vence"""
+    profissional_id = str(ObjectId())
+    base = datetime(2030, 1, 8, 9, 0)
+    resultado = await disputar(db, [
+        agendamento(profissional_id, base + timedelta(minutes=random.choice([0, 5, 15])), random.choice([30, 60]))
+        for _ in range(concorrentes)
+    ])
+    resultado["ok"] = resultado["vencedores"] <= 1 and resultado["sem_orfas"]
+    return resultado
+
+
+async def horarios_distintos(db, total: int) -> dict:
+    base = datetime(2030, 2, 1, 8, 0)
+    profissionais = [str(ObjectId()) for _ in range(10)]
+
+    def lote():
+        return [
+            agendamento(profissionais[i % 10], base + timedelta(minutes=30 * (i // 10)), 30)
+            for i in range(total)
+        ]
+
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*[marcar(db, a) for a in lote()])
+    concorrente = time.perf_counter() - inicio
+
+    await db[COLECAO_RESERVAS].delete_many({})
+    inicio = time.perf_counter()
+    for a in lote():
+        await marcar(db, a)
+    sequencial = time.perf_counter() - inicio
+
+    return {
+        "marcacoes": total,
+        "vencedores": sum(resultados),
+        "concorrente_ms": round(concorrente * 1000, 1),
+        "sequencial_ms": round(sequencial * 1000, 1),
+        "ok": all(resultados),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concorrentes", type=int, default=300)
+    parser.add_argument("--horarios-distintos", type=int, default=300)
+    args = parser.parse_args()
+
+    async with banco_temporario() as db:
+        await db[COLECAO_RESERVAS].create_indexes(INDICES[COLECAO_RESERVAS])
+        resultados = {
+            "mesmo_horario": await mesmo_horario(db, args.concorrentes),
+            "horarios_sobrepostos": await horarios_sobrepostos(db, args.concorrentes),
+            "horarios_distintos": await horarios_distintos(db, args.horarios_distintos),
+        }
+
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+    if not all(r["ok"] for r in resultados.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
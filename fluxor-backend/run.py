@@ -1,6 +1,96 @@
+"""
+Inicialização do servidor da API
+
+Com SERVIDOR_WORKERS=1, roda um único processo uvicorn (como antes).
+Caso contrário, o gunicorn supervisiona N workers uvicorn (N = SERVIDOR_WORKERS,
+ou o número de CPUs disponíveis quando 0):
+  - os índices são aplicados uma única vez, no processo principal, antes dos
+    workers iniciarem (não a cada worker reciclado);
+  - cada worker importa a aplicação depois do fork e, no lifespan, abre o seu
+    próprio cliente Motor (e o fecha ao encerrar);
+  - os caches em memória são por worker; as invalidações chegam aos outros
+    workers em até SINCRONIZACAO_INTERVALO_SEGUNDOS (app/services/sincronizacao.py);
+  - os workers usam uvloop e httptools quando instalados;
+  - cada worker é reciclado depois de SERVIDOR_MAXIMO_REQUISICOES requisições
+    (com variação aleatória para não reiniciarem todos juntos), terminando as
+    requisições em andamento antes de sair.
+"""
+import asyncio
+import importlib.util
 import os
-import uvicorn
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+def numero_workers() -> int:
+    """Workers configurados ou, com 0, as CPUs disponíveis para o processo"""
+    if settings.SERVIDOR_WORKERS > 0:
+        return settings.SERVIDOR_WORKERS
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+def implementacoes() -> dict:
+    """Event loop e parser HTTP mais rápidos disponíveis"""
+    return {
+        "loop": "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+    }
+
+
+def iniciar_uvicorn(porta: int):
+    import uvicorn
+
+    uvicorn.run("app.main:app", host="0.0.0.0", port=porta, **implementacoes())
+
+
+def preparar_banco(servidor):
+    """Hook on_starting do gunicorn: aplica os índices uma vez, no processo principal"""
+    from app.database.mongodb import preparar_indices
+
+    asyncio.run(preparar_indices())
+    # Os workers herdam as configurações do processo principal e não reaplicam
+    settings.MONGODB_CRIAR_INDICES = False
+
+
+def iniciar_gunicorn(porta: int, workers: int):
+    from gunicorn.app.base import BaseApplication
+
+    class ServidorFluxor(BaseApplication):
+        def load_config(self):
+            opcoes = {
+                "bind": f"0.0.0.0:{porta}",
+                "workers": workers,
+                "worker_class": "uvicorn.workers.UvicornWorker",
+                "max_requests": settings.SERVIDOR_MAXIMO_REQUISICOES,
+                "max_requests_jitter": settings.SERVIDOR_MAXIMO_REQUISICOES_VARIACAO,
+                "graceful_timeout": settings.SERVIDOR_TIMEOUT_ENCERRAMENTO,
+                "timeout": settings.SERVIDOR_TIMEOUT_WORKER,
+                "keepalive": 5,
+                # A aplicação é importada em cada worker, depois do fork
+                "preload_app": False,
+                "accesslog": "-" if settings.DEBUG else None,
+                "on_starting": preparar_banco,
+            }
+            for chave, valor in opcoes.items():
+                self.cfg.set(chave, valor)
+
+        def load(self):
+            from app.main import app
+            return app
+
+    print(f"✓ Iniciando {workers} workers ({implementacoes()['loop']}/{implementacoes()['http']})")
+    ServidorFluxor().run()
+
 
 if __name__ == "__main__":
-    port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("app.main:app", host="0.0.0.0", port=port)
+    porta = int(os.environ.get("PORT", 8000))
+    workers = numero_workers()
+    if workers == 1:
+        iniciar_uvicorn(porta)
+    else:
+        iniciar_gunicorn(porta, workers)
@@ -0,0 +1,169 @@
+"""
+Garantia de não haver dois agendamentos no mesmo horário (reservas_horario)
+
+Roda contra um MongoDB real (TEST_MONGODB_URL ou MONGODB_URL) em um banco
+descartável; os testes são pulados quando não há MongoDB acessível.
+
+    python -m pytest tests
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+from app.core.config import get_settings
+from app.database.indices import INDICES
+from app.services.reservas import (
+    COLECAO_RESERVAS, HorarioIndisponivel, granulos_agendamento, reservar_agendamento, reservar_horario
+)
+
+URL = os.environ.get("TEST_MONGODB_URL", get_settings().MONGODB_URL)
+BANCO = os.environ.get("TEST_DATABASE", "fluxor_teste_reservas")
+
+
+def executar(teste):
+    """Executa o teste com um banco vazio, com os índices de reservas_horario"""
+    async def principal():
+        client = AsyncIOMotorClient(URL, serverSelectionTimeoutMS=1000)
+        try:
+            await client.drop_database(BANCO)
+        except ServerSelectionTimeoutError:
+            client.close()
+            pytest.skip(f"MongoDB indisponível em {URL}")
+        db = client[BANCO]
+        try:
+            await db[COLECAO_RESERVAS].create_indexes(INDICES[COLECAO_RESERVAS])
+            await teste(db)
+        finally:
+            await client.drop_database(BANCO)
+            client.close()
+
+    asyncio.run(principal())
+
+
+def agendamento(profissional_id: str, data_hora: datetime, duracao: int = 60) -> dict:
+    return {
+        "_id": ObjectId(), "profissional_id": profissional_id,
+        "data_hora": data_hora, "duracao": duracao, "status": "agendado",
+    }
+
+
+async def marcar(db, dados: dict) -> bool:
+    try:
+        async with reservar_horario(db, None, dados):
+            await db.agendamentos.insert_one(dados)
+        return True
+    except HorarioIndisponivel:
+        return False
+
+
+async def donos(db) -> list:
+    return sorted(await db[COLECAO_RESERVAS].distinct("agendamento_id"))
+
+
+def test_marcacoes_concorrentes_no_mesmo_horario_so_uma_vence():
+    async def teste(db):
+        profissional_id = str(ObjectId())
+        inicio = datetime(2030, 1, 7, 9, 0)
+        tentativas = [
+            agendamento(profissional_id, inicio + timedelta(minutes=5 * (i % 4)), 30 + 15 * (i % 3))
+            for i in range(50)
+        ]
+        resultados = await asyncio.gather(*[marcar(db, a) for a in tentativas])
+        vencedores = [a["_id"] for a, ok in zip(tentativas, resultados) if ok]
+
+        assert len(vencedores) == 1
+        assert await donos(db) == vencedores
+        assert await db.agendamentos.count_documents({}) == 1
+        # Confirmada: não expira pelo TTL
+        assert await db[COLECAO_RESERVAS].count_documents({"pendente_ate": {"$exists": True}}) == 0
+
+    executar(teste)
+
+
+def test_horarios_distintos_nao_se_bloqueiam():
+    async def teste(db):
+        profissional_id = str(ObjectId())
+        base = datetime(2030, 1, 7, 8, 0)
+        tentativas = [agendamento(profissional_id, base + timedelta(minutes=30 * i), 30) for i in range(20)]
+
+        assert all(await asyncio.gather(*[marcar(db, a) for a in tentativas]))
+
+    executar(teste)
+
+
+def test_falha_ao_gravar_libera_as_reservas():
+    async def teste(db):
+        dados = agendamento(str(ObjectId()), datetime(2030, 1, 7, 9, 0))
+
+        with pytest.raises(RuntimeError):
+            async with reservar_horario(db, None, dados):
+                raise RuntimeError("falha ao gravar o agendamento")
+
+        assert await db[COLECAO_RESERVAS].count_documents({}) == 0
+        assert await marcar(db, agendamento(dados["profissional_id"], dados["data_hora"]))
+
+    executar(teste)
+
+
+def test_reserva_pendente_expira_pelo_ttl():
+    async def teste(db):
+        dados = agendamento(str(ObjectId()), datetime(2030, 1, 7, 9, 0))
+        antes = datetime.utcnow()
+
+        async with reservar_horario(db, None, dados):
+            pendentes = await db[COLECAO_RESERVAS].find({"agendamento_id": dados["_id"]}).to_list(None)
+            assert len(pendentes) == len(granulos_agendamento(dados))
+            assert all(r["pendente_ate"] > antes for r in pendentes)
+
+        indices = await db[COLECAO_RESERVAS].index_information()
+        assert indices["pendente_ate_ttl"]["expireAfterSeconds"] == 0
+
+    executar(teste)
+
+
+def test_remarcacao_que_falha_mantem_o_horario_anterior():
+    async def teste(db):
+        profissional_id = str(ObjectId())
+        atual = agendamento(profissional_id, datetime(2030, 1, 7, 9, 0))
+        await reservar_agendamento(db, atual)
+        remarcado = {**atual, "data_hora": datetime(2030, 1, 7, 14, 0)}
+
+        with pytest.raises(LookupError):
+            async with reservar_horario(db, atual, remarcado):
+                # ex: o agendamento foi removido e o update não encontrou nada
+                raise LookupError("agendamento não encontrado")
+
+        reservados = {
+            (r["profissional_id"], r["inicio"])
+            async for r in db[COLECAO_RESERVAS].find({"agendamento_id": atual["_id"]})
+        }
+        assert reservados == granulos_agendamento(atual)
+        assert await marcar(db, agendamento(profissional_id, remarcado["data_hora"]))
+        assert not await marcar(db, agendamento(profissional_id, atual["data_hora"]))
+
+    executar(teste)
+
+
+def test_remarcacao_libera_o_horario_anterior():
+    async def teste(db):
+        profissional_id = str(ObjectId())
+        atual = agendamento(profissional_id, datetime(2030, 1, 7, 9, 0))
+        await reservar_agendamento(db, atual)
+        remarcado = {**atual, "data_hora": datetime(2030, 1, 7, 9, 30)}
+
+        async with reservar_horario(db, atual, remarcado):
+            pass
+
+        reservados = {
+            (r["profissional_id"], r["inicio"])
+            async for r in db[COLECAO_RESERVAS].find({"agendamento_id": atual["_id"]})
+        }
+        assert reservados == granulos_agendamento(remarcado)
+        assert await marcar(db, agendamento(profissional_id, atual["data_hora"], 30))
+
+    executar(teste)
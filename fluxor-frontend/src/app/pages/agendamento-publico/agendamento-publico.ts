@@ -237,7 +237,7 @@ export class AgendamentoPublico implements OnInit {
     
     const tokenParaUsar = this.token || 'publico';
     
-    this.agendamentoService.obterDisponibilidade(tokenParaUsar, this.profissionalSelecionado, this.dataSelecionadaInput).subscribe({
+    this.agendamentoService.obterDisponibilidade(tokenParaUsar, this.profissionalSelecionado, this.dataSelecionadaInput, this.servicoSelecionado).subscribe({
       next: (response) => {
         this.horariosDisponiveis = response.horarios_disponiveis || [];
         this.loading = false;
@@ -261,7 +261,7 @@ export class AgendamentoPublico implements OnInit {
     const dataFormatada = this.formatarData(this.dataSelecionada);
     const tokenParaUsar = this.token || 'publico';
     
-    this.agendamentoService.obterDisponibilidade(tokenParaUsar, this.profissionalSelecionado, dataFormatada).subscribe({
+    this.agendamentoService.obterDisponibilidade(tokenParaUsar, this.profissionalSelecionado, dataFormatada, this.servicoSelecionado).subscribe({
       next: (response) => {
         this.horariosDisponiveis = response.horarios_disponiveis || [];
         this.loading = false;
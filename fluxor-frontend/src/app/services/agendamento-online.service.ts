@@ -1,5 +1,5 @@
 import { Injectable } from '@angular/core';
-import { HttpClient } from '@angular/common/http';
+import { HttpClient, HttpParams } from '@angular/common/http';
 import { Observable } from 'rxjs';
 import { environment } from '../../environments/environment';
 
@@ -91,10 +91,27 @@ export class AgendamentoOnlineService {
     });
   }
 
-  obterDisponibilidade(token: string, profissionalId: string, data: string): Observable<any> {
-    return this.http.get<any>(`${this.apiUrl}/disponibilidade/${token}`, {
-      params: { profissional_id: profissionalId, data }
-    });
+  obterDisponibilidade(token: string, profissionalId: string, data: string, servicoId?: string | null): Observable<any> {
+    const params: any = { profissional_id: profissionalId, data };
+    if (servicoId) {
+      params.servico_id = servicoId;
+    }
+    return this.http.get<any>(`${this.apiUrl}/disponibilidade/${token}`, { params });
+  }
+
+  obterDisponibilidadePeriodo(
+    token: string,
+    dataInicio: string,
+    dataFim: string,
+    servicoId: string,
+    profissionalIds: string[] = []
+  ): Observable<any> {
+    let params = new HttpParams()
+      .set('data_inicio', dataInicio)
+      .set('data_fim', dataFim)
+      .set('servico_id', servicoId);
+    profissionalIds.forEach(id => params = params.append('profissional_id', id));
+    return this.http.get<any>(`${this.apiUrl}/disponibilidade-periodo/${token}`, { params });
   }
 
   desativarLink(clienteId: string): Observable<any> {